@@ -0,0 +1,126 @@
+"""
+Compare the size and the top-k recall of the float32, float16 and int8 storage of the numpy vector store.
+Recall is measured against the float32 results.
+
+Only the numpy store (DB_VECTOR_STORE = "numpy") quantizes its vectors, Chroma always stores float32.
+
+The hash vectors of DeterministicEmbeddings are spread uniformly, unlike the embeddings of real text, so their
+recall says little about the real one. With --db, the collection holds the chunks and embeddings stored in
+Chroma dbs (copied first, they are not modified), and the queries are the K10Query search texts and analyses
+embedded with the model of get_embeddings() (--embed-queries, needs an OpenAI key) or, without it, held-out chunks.
+
+    python -m benchmarks.quantization --db data/embeddings/*/10-K_items_1_1a_7_7a_8 -k 4
+    python -m benchmarks.quantization --chunks 300 --queries 200
+"""
+import os
+import time
+import shutil
+import random
+import argparse
+import tempfile
+import statistics
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from src.db.numpy_store import NumpyVectorStore, DTYPES
+from src.db.pool import get_directory_size
+from src.models.embeddings import DeterministicEmbeddings
+from src.models.utils import get_embeddings
+from src.queries.K10 import K10Query
+from .vector_stores import WORDS, build_documents
+
+
+class StoredEmbeddings(Embeddings):
+    """
+    Serves the vectors already computed for the texts of the collection.
+    """
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+
+def get_queries(num_queries):
+    queries = list(K10Query("AAPL", ["2021", "2022", "2023"]).get_all_queries().values())
+    return queries + [" ".join(random.Random(seed).sample(WORDS, 5)) for seed in range(num_queries)]
+
+
+def load_stored(directories):
+    """
+    Returns the documents of Chroma dbs, and the vectors stored for their texts.
+    """
+    documents, vectors = [], {}
+    with tempfile.TemporaryDirectory() as tmp_directory:
+        for index, directory in enumerate(directories):
+            copy = os.path.join(tmp_directory, str(index))
+            shutil.copytree(directory, copy)
+            stored = Chroma(persist_directory=copy).get(include=["documents", "metadatas", "embeddings"])
+            for text, metadata, vector in zip(stored["documents"], stored["metadatas"], stored["embeddings"]):
+                documents.append(Document(page_content=text, metadata=metadata))
+                vectors[text] = [float(value) for value in vector]
+    return documents, vectors
+
+
+def get_stored_collection(args):
+    # the stored chunks, and the vectors of the queries: the real queries embedded, or held-out chunks
+    documents, vectors = load_stored(args.db)
+    if args.embed_queries:
+        k10_query = K10Query("AAPL", ["2021", "2022", "2023"])
+        texts = list(k10_query.search_queries.values()) + list(k10_query.get_all_queries().values())
+        return documents, StoredEmbeddings(vectors), get_embeddings().embed_documents(texts)
+    held_out = documents[::args.holdout]
+    documents = [document for index, document in enumerate(documents) if index % args.holdout]
+    return documents, StoredEmbeddings(vectors), [vectors[document.page_content] for document in held_out]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the quantized storage of the numpy vector store.")
+    parser.add_argument("--chunks", type=int, default=300, help="chunks in the collection")
+    parser.add_argument("--queries", type=int, default=200, help="random queries, besides the K10Query analyses")
+    parser.add_argument("--dimensions", type=int, default=1536, help="size of the vectors")
+    parser.add_argument("-k", type=int, default=12, help="documents retrieved per query")
+    parser.add_argument("--db", nargs="+", help="Chroma dbs whose chunks and embeddings make the collection")
+    parser.add_argument("--embed-queries", action="store_true", help="embed the K10Query queries with get_embeddings()")
+    parser.add_argument("--holdout", type=int, default=4, help="without --embed-queries, every n-th stored chunk is a query")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        documents, embeddings, query_vectors = get_stored_collection(args)
+    else:
+        print("Hash vectors of DeterministicEmbeddings, not representative of real embeddings (see --db)")
+        embeddings = DeterministicEmbeddings(args.dimensions)
+        documents = build_documents(args.chunks)
+        query_vectors = embeddings.embed_documents(get_queries(args.queries))
+
+    print(f"{len(documents)} chunks, {len(query_vectors[0])} dimensions, {len(query_vectors)} queries, k={args.k}")
+    print(f"{'dtype':<9}{'vectors':>12}{'directory':>12}{'recall@k':>10}{'same top-k':>12}{'query p50':>12}")
+    with tempfile.TemporaryDirectory() as persist_directory:
+        reference = NumpyVectorStore(persist_directory, embeddings, "float32")
+        reference.add_documents(documents, ids=[str(i) for i in range(len(documents))])
+        expected = [[doc.id for doc in reference.similarity_search_by_vector(vector, k=args.k)] for vector in query_vectors]
+
+        for dtype in DTYPES:
+            # each dtype gets a collection of its own
+            store = NumpyVectorStore(persist_directory, embeddings, dtype, dtype=dtype)
+            if not store.ids:
+                store.add_documents(documents, ids=[str(i) for i in range(len(documents))])
+            recalls, same, times = [], 0, []
+            for vector, expected_ids in zip(query_vectors, expected):
+                start = time.perf_counter()
+                ids = [doc.id for doc in store.similarity_search_by_vector(vector, k=args.k)]
+                times.append(time.perf_counter() - start)
+                recalls.append(len(set(ids) & set(expected_ids)) / len(expected_ids))
+                same += set(ids) == set(expected_ids)
+            vectors_size = store.vectors.nbytes + (store.scales.nbytes if store.scales is not None else 0)
+            print(f"{dtype:<9}{vectors_size / 1024:>10.0f}KB{get_directory_size(store.directory) / 1024:>10.0f}KB"
+                  f"{statistics.mean(recalls):>10.4f}{same / len(query_vectors):>12.1%}"
+                  f"{statistics.median(times) * 1000:>10.3f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,91 @@
+"""
+Compare the cold start and query latency of the Chroma and numpy vector stores on a per-symbol sized corpus.
+
+    python -m benchmarks.vector_stores --chunks 300 --queries 200
+"""
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from chromadb.api.client import SharedSystemClient
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from src.db.numpy_store import NumpyVectorStore
+from src.models.embeddings import DeterministicEmbeddings
+
+WORDS = ("revenue sales margin risk cash debt growth cloud iphone services supply chain tax "
+         "dividend buyback segment competition regulation inflation interest currency").split()
+
+
+def build_documents(num_chunks, words_per_chunk=200, seed=0):
+    rng = random.Random(seed)
+    years = ["2021", "2022", "2023"]
+    types = ["item_1", "item_1a", "item_7", "item_7a", "item_8"]
+    return [
+        Document(page_content=" ".join(rng.choice(WORDS) for _ in range(words_per_chunk)),
+                 metadata={"year": years[index % len(years)], "type": types[index % len(types)], "chunk": index})
+        for index in range(num_chunks)
+    ]
+
+
+def open_store(name, persist_directory, embeddings):
+    if name == "chroma":
+        # drop the clients cached by chromadb, so every open is a cold start
+        SharedSystemClient.clear_system_cache()
+        return Chroma(persist_directory=persist_directory, embedding_function=embeddings)
+    return NumpyVectorStore(persist_directory, embeddings)
+
+
+def run(name, documents, query_vectors, embeddings, k, cold_starts):
+    with tempfile.TemporaryDirectory() as persist_directory:
+        start = time.perf_counter()
+        open_store(name, persist_directory, embeddings).add_documents(documents, ids=[str(i) for i in range(len(documents))])
+        build = time.perf_counter() - start
+
+        cold = []
+        for _ in range(cold_starts):
+            start = time.perf_counter()
+            store = open_store(name, persist_directory, embeddings)
+            store.similarity_search_by_vector(query_vectors[0], k=k)
+            cold.append(time.perf_counter() - start)
+
+        latencies = {}
+        for label, filter in (("query", None), ("filtered query", {"$and": [{"year": "2023"}, {"type": "item_7"}]})):
+            times = []
+            for vector in query_vectors:
+                start = time.perf_counter()
+                store.similarity_search_by_vector(vector, k=k, filter=filter)
+                times.append(time.perf_counter() - start)
+            latencies[label] = times
+    return build, cold, latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Chroma and numpy vector stores.")
+    parser.add_argument("--chunks", type=int, default=300, help="chunks in the collection")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dimensions", type=int, default=1536, help="size of the vectors")
+    parser.add_argument("-k", type=int, default=12, help="documents retrieved per query")
+    parser.add_argument("--cold-starts", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    embeddings = DeterministicEmbeddings(args.dimensions)
+    documents = build_documents(args.chunks)
+    query_vectors = embeddings.embed_documents(
+        [" ".join(random.Random(seed).sample(WORDS, 5)) for seed in range(args.queries)]
+    )
+
+    print(f"{args.chunks} chunks, {args.dimensions} dimensions, k={args.k}")
+    print(f"{'store':<8}{'build':>12}{'cold start':>14}{'query p50':>12}{'query p95':>12}{'filtered p50':>15}")
+    for name in ("chroma", "numpy"):
+        build, cold, latencies = run(name, documents, query_vectors, embeddings, args.k, args.cold_starts)
+        queries = sorted(latencies["query"])
+        print(f"{name:<8}{build * 1000:>10.1f}ms{statistics.median(cold) * 1000:>12.2f}ms"
+              f"{statistics.median(queries) * 1000:>10.3f}ms{queries[int(len(queries) * 0.95) - 1] * 1000:>10.3f}ms"
+              f"{statistics.median(latencies['filtered query']) * 1000:>13.3f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -54,6 +54,9 @@ def custom_key_builder(func, *args, **kwargs):
     if func_kwargs.get('quarterly', '') != '':
         cache_key += f":quarterly={func_kwargs.get('quarterly', '')}"
 
+    if func_kwargs.get('source', '') != '':
+        cache_key += f":source={func_kwargs.get('source', '')}"
+
     print("cache_key= ", cache_key)
     return cache_key
     return cache_key
\ No newline at end of file
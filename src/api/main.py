@@ -8,7 +8,11 @@ from typing import Optional
 from .routers import queries, auth, financials, prices, holders, stock, screener, industry, sector, health
 from .auth.database import init_db
 import os
+import asyncio
 from .cache.redis_client import RedisManager
+from ..sec.symbols import symbol_master
+from ..jobs.worker import job_workers
+from ..config import JOBS_ENABLED
 import json
 import sys
 from src.api.cache.config import CACHE_ENABLED
@@ -79,6 +83,15 @@ class CustomCoder(Coder):
 @app.on_event("startup")
 async def startup():
     """Startup event handler"""
+    if not os.getenv("TESTING"):
+        # ticker -> CIK lookups are served from memory, refreshed daily from SEC;
+        # the symbols on disk are read before serving, off the event loop, so lookups never read the file
+        await asyncio.to_thread(symbol_master.load, False)
+        symbol_master.start_refresh()
+        if JOBS_ENABLED:
+            # filings are ingested by worker processes, the query routes answer 202 meanwhile
+            job_workers.start()
+
     if CACHE_ENABLED:
         try:
             redis_client = await RedisManager.get_client()
@@ -104,6 +117,7 @@ async def startup():
 async def shutdown():
     """Shutdown event handler"""
     logger.info("Shutting down application")
+    job_workers.stop()
     await RedisManager.close()
 
 # Include routers
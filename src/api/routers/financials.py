@@ -3,11 +3,13 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi_cache.decorator import cache
 from redis.exceptions import RedisError
 from src.financials_data.gathering import Gathering
+from src.sec.xbrl import get_statement
 from ..auth.security import get_current_user
 from ..auth.models import User
 from ...utils.utils import validate_ticker
 from src.api.cache.config import CACHE_EXPIRATION_1DAY
 from src.api.cache.utils import custom_key_builder, use_cache
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,6 +19,16 @@ router = APIRouter(
     tags=["financials"]
 )
 
+# Statements come from Yahoo Finance, or from the inline XBRL facts of the downloaded SEC filings
+STATEMENT_SOURCES = ("yahoo", "sec")
+
+def validate_source(source: str):
+    if source not in STATEMENT_SOURCES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid source. Source should be one of: {', '.join(STATEMENT_SOURCES)}."
+        )
+
 @router.get("/info", response_model=Dict[str, Any])
 @use_cache(
     expire=CACHE_EXPIRATION_1DAY,
@@ -48,21 +60,27 @@ async def get_stock_info(symbol: str):
     expire=CACHE_EXPIRATION_1DAY,
     namespace="balance_sheet"
 )
-async def get_balance_sheet(symbol: str, quarterly: bool = False):
+async def get_balance_sheet(symbol: str, quarterly: bool = False, source: str = "yahoo"):
     """
     Get balance sheet data for a given ticker.
+    With source=sec, the data comes from the inline XBRL facts of the company's 10-K filings.
     """
     try:
         validate_ticker(symbol)
-        gathering = Gathering(symbol)
-        balance = gathering.get_balance_sheet(quarterly)
+        validate_source(source)
+        if source == "sec":
+            # parsing the filings and building the facts would block the event loop
+            balance = await asyncio.to_thread(get_statement, symbol, "balance", quarterly)
+        else:
+            gathering = Gathering(symbol)
+            balance = gathering.get_balance_sheet(quarterly)
         if not balance:
             raise HTTPException(status_code=404, detail="No balance sheet data found for this ticker")
         return balance
     except RedisError as e:
         logger.error(f"Cache error for {symbol}: {str(e)}")
         # Continue without cache
-        return await get_balance_sheet(symbol, quarterly)
+        return await get_balance_sheet(symbol, quarterly, source)
     except Exception as e:
         logger.error(f"Error fetching data for {symbol}: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Error fetching data: {str(e)}")
@@ -72,21 +90,26 @@ async def get_balance_sheet(symbol: str, quarterly: bool = False):
     expire=CACHE_EXPIRATION_1DAY,
     namespace="cash_flow"
 )
-async def get_cash_flow(symbol: str, quarterly: bool = False):
+async def get_cash_flow(symbol: str, quarterly: bool = False, source: str = "yahoo"):
     """
     Get cash flow data for a given ticker.
+    With source=sec, the data comes from the inline XBRL facts of the company's 10-K filings.
     """
     try:
         validate_ticker(symbol)
-        gathering = Gathering(symbol)
-        cashflow = gathering.get_cash_flow(quarterly)
+        validate_source(source)
+        if source == "sec":
+            cashflow = await asyncio.to_thread(get_statement, symbol, "cashflow", quarterly)
+        else:
+            gathering = Gathering(symbol)
+            cashflow = gathering.get_cash_flow(quarterly)
         if not cashflow:
             raise HTTPException(status_code=404, detail="No cash flow data found for this ticker")
         return cashflow
     except RedisError as e:
         logger.error(f"Cache error for {symbol}: {str(e)}")
         # Continue without cache
-        return await get_cash_flow(symbol, quarterly)
+        return await get_cash_flow(symbol, quarterly, source)
     except Exception as e:
         logger.error(f"Error fetching data for {symbol}: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Error fetching data: {str(e)}")
@@ -96,21 +119,26 @@ async def get_cash_flow(symbol: str, quarterly: bool = False):
     expire=CACHE_EXPIRATION_1DAY,
     namespace="income_statement"
 )
-async def get_income_statement(symbol: str, quarterly: bool = False):
+async def get_income_statement(symbol: str, quarterly: bool = False, source: str = "yahoo"):
     """
     Get income statement data for a given ticker.
+    With source=sec, the data comes from the inline XBRL facts of the company's 10-K filings.
     """ 
     try:
         validate_ticker(symbol)
-        gathering = Gathering(symbol)
-        income = gathering.get_income_statement(quarterly)
+        validate_source(source)
+        if source == "sec":
+            income = await asyncio.to_thread(get_statement, symbol, "income", quarterly)
+        else:
+            gathering = Gathering(symbol)
+            income = gathering.get_income_statement(quarterly)
         if not income:
             raise HTTPException(status_code=404, detail="No income statement data found for this ticker")
         return income
     except RedisError as e:
         logger.error(f"Cache error for {symbol}: {str(e)}")
         # Continue without cache
-        return await get_income_statement(symbol, quarterly)
+        return await get_income_statement(symbol, quarterly, source)
     except Exception as e:
         logger.error(f"Error fetching data for {symbol}: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Error fetching data: {str(e)}")
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from src.api.cache.redis_client import RedisManager
+from src.db.pool import db_pool
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,6 +22,10 @@ async def check_cache_health():
         raise HTTPException(
             status_code=503,
             detail="Cache service unhealthy"
-        ) 
-    
+        )
 
+
+@router.get("/pool/")
+async def get_pool_stats():
+    """Stats of the pool of open dbs and retriever chains"""
+    return db_pool.stats()
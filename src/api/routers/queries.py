@@ -1,4 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from typing import Optional, List, Dict, Any
 from ...queries.K10 import K10Query
 from ...queries.QueryEngine import QueryEngine
@@ -10,6 +12,10 @@ from jose import jwt, JWTError
 from ..auth.models import User
 from ..auth.security import get_current_user, SECRET_KEY, ALGORITHM
 from ..auth.database import get_user
+from ...utils.utils import validate_ticker
+from ...sec.symbols import symbol_master
+from ...jobs.queue import job_queue, DONE, FAILED
+from ...config import JOBS_ENABLED, JOBS_POLL_SECONDS
 
 WS_TIMEOUT_SECONDS = 300  # 5 minutes timeout
 
@@ -18,6 +24,47 @@ router = APIRouter(
     tags=["queries"]
 )
 
+
+async def is_ready(symbol: str, filing_type: str, num_years: int) -> bool:
+    """
+    Returns whether the db of a symbol holds the `num_years` years asked for.
+    A db not refreshed for a while is still served, while a job refreshes it in the background.
+    """
+    if not await asyncio.to_thread(QueryEngine.is_ready, symbol, filing_type, num_years):
+        return False
+    if await asyncio.to_thread(QueryEngine.is_stale, symbol, filing_type):
+        await asyncio.to_thread(job_queue.submit, symbol, filing_type, num_years)
+    return True
+
+
+async def get_pending_response(symbol: str, filing_type: str, num_years: int) -> Optional[JSONResponse]:
+    """
+    Returns a 202 response with the ingestion job of a symbol whose db doesn't hold the years asked for yet,
+    queueing the job if needed. None if the db is ready.
+    """
+    if not JOBS_ENABLED or await is_ready(symbol, filing_type, num_years):
+        return None
+    job = await asyncio.to_thread(job_queue.submit, symbol, filing_type, num_years)
+    return JSONResponse(status_code=202, content={
+        "status": "pending",
+        "message": f"The {filing_type} filings of {symbol} are being ingested, retry when the job is done",
+        "job": job,
+        "job_url": f"{router.prefix}/jobs/{job['id']}",
+    })
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    current_user: Annotated[User, Depends(get_current_user)],
+    job_id: str
+) -> Dict[str, Any]:
+    """Get the status of an ingestion job, and its progress by stage"""
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
 @router.get("/execute/")
 async def execute_query(
     current_user: Annotated[User, Depends(get_current_user)],
@@ -28,15 +75,19 @@ async def execute_query(
     num_years: int = 3
 ) -> Dict[str, Any]:
     """Execute a specific query for a company's filings"""
+    validate_ticker(symbol, check_sec=True)
+    pending = await get_pending_response(symbol, filing_type, num_years)
+    if pending is not None:
+        return pending
     try:
-        engine = QueryEngine(
+        engine = await QueryEngine.acreate(
             symbol=symbol,
             type=filing_type,
             key=key,
             save_to_txt_files=save_to_txt,
             num_years=num_years
         )
-        result = engine.query()
+        result = await engine.aquery()
         
         if not result:
             raise HTTPException(
@@ -65,8 +116,12 @@ async def get_available_queries(
     num_years: int = 3
 ) -> Dict[str, Any]:
     """Get all available queries for a company's filings"""
+    validate_ticker(symbol, check_sec=True)
+    pending = await get_pending_response(symbol, filing_type, num_years)
+    if pending is not None:
+        return pending
     try:
-        engine = QueryEngine(
+        engine = await QueryEngine.acreate(
             symbol=symbol,
             type=filing_type,
             key="dummy",
@@ -94,8 +149,12 @@ async def get_query_text(
     num_years: int = 3
 ) -> Dict[str, Any]:
     """Get the query text for a specific query key"""
+    validate_ticker(symbol, check_sec=True)
+    pending = await get_pending_response(symbol, filing_type, num_years)
+    if pending is not None:
+        return pending
     try:
-        engine = QueryEngine(
+        engine = await QueryEngine.acreate(
             symbol=symbol,
             type=filing_type,
             key=key,
@@ -142,7 +201,31 @@ async def websocket_execute_query(
                     "message": "symbol and key are required parameters"
                 })
                 return
+
+            if symbol_master.is_available() and symbol_master.lookup(symbol) is None:
+                await websocket.send_json({
+                    "status": "error",
+                    "message": f"Unknown ticker: {symbol}"
+                })
+                return
                 
+            # Filings not ingested yet: wait for the ingestion job, sending its progress
+            if JOBS_ENABLED and not await is_ready(symbol, filing_type, num_years):
+                job = await asyncio.to_thread(job_queue.submit, symbol, filing_type, num_years)
+                sent = None
+                while job["status"] not in (DONE, FAILED):
+                    if (job["status"], job["progress"]) != sent:
+                        await websocket.send_json({"status": "ingesting", "data": job})
+                        sent = (job["status"], job["progress"])
+                    await asyncio.sleep(JOBS_POLL_SECONDS)
+                    job = await asyncio.to_thread(job_queue.get, job["id"])
+                if job["status"] == FAILED:
+                    await websocket.send_json({
+                        "status": "error",
+                        "message": f"Ingestion of {symbol} failed: {job['error']}"
+                    })
+                    return
+
             # Send acknowledgment
             await websocket.send_json({
                 "status": "processing",
@@ -150,7 +233,7 @@ async def websocket_execute_query(
             })
             
             # Create query engine and execute query
-            engine = QueryEngine(
+            engine = await QueryEngine.acreate(
                 symbol=symbol,
                 type=filing_type,
                 key=key,
@@ -158,25 +241,38 @@ async def websocket_execute_query(
                 num_years=num_years
             )
             
-            # Execute query
-            result = engine.query()
-            
+            # Stream the query: the retrieved context, the tokens of the answer, then the final result
+            result = None
+            async for event, value in engine.astream_query():
+                if event == "context":
+                    await websocket.send_json({
+                        "status": "context",
+                        "data": [jsonable_encoder(doc.metadata) for doc in value]
+                    })
+                elif event == "token":
+                    await websocket.send_json({
+                        "status": "token",
+                        "data": value
+                    })
+                else:
+                    result = value
+
             if not result:
                 await websocket.send_json({
                     "status": "error",
                     "message": f"No results found for query '{key}' on {symbol}'s {filing_type} filings"
                 })
                 return
-                
+
             # Send final result
             await websocket.send_json({
                 "status": "complete",
-                "data": {
+                "data": jsonable_encoder({
                     "symbol": symbol,
                     "query_key": key,
                     "filing_type": filing_type,
                     "result": result
-                }
+                })
             })
             
     except WebSocketDisconnect:
@@ -6,19 +6,97 @@ DATA_DIRECTORY = f"{ROOT_DIRECTORY}/../data"
 # Define the folder for downloading the data
 SOURCE_SEC_DIRECTORY = f"{DATA_DIRECTORY}/sec-edgar-filings"
 
+# Define the SQLite catalog of the downloaded filings (see sec/catalog.py)
+CATALOG_PATH = f"{DATA_DIRECTORY}/filings.db"
+
+# Define the local copy of SEC's company_tickers.json (see sec/symbols.py), and how often it is refreshed
+SYMBOLS_PATH = f"{DATA_DIRECTORY}/company_tickers.json"
+SYMBOLS_REFRESH_SECONDS = 24 * 3600
+
+# Define the folder for the cache of 10-K items extracted from the filings, keyed by document hash (see sec/cache.py)
+EXTRACTED_DIRECTORY = f"{DATA_DIRECTORY}/extracted"
+
+# Define the folder for storing the inline XBRL facts extracted from the filings (see sec/xbrl.py)
+XBRL_DIRECTORY = f"{DATA_DIRECTORY}/xbrl"
+
 # Define the folder for storing the temporary files (ex.: text files created from the 10-k filings)
 # TMP_DIRECTORY = f"{DATA_DIRECTORY}/tmp"
 TMP_DIRECTORY = "/tmp"
 
+# Parser engine used to extract 10-K items: "bs4" (whole document tree) or "lxml" (streaming, bounded memory)
+PARSER_ENGINE = "lxml"
+# Pre-scan the raw bytes and only parse the byte ranges of the relevant items
+PARSER_PRESCAN = True
+
 # DB 
 #  Define the folders for storing database 
 DB_PERSIST_DIRECTORY = f"{DATA_DIRECTORY}/embeddings"
 DB_10K_DIR_NAME = "10K_items_1_1a_7_7a_8_9"
+# Layout of the dbs: "per_symbol" (a Chroma directory per symbol) or "shared" (one collection, partitioned by a symbol metadata field)
+DB_LAYOUT = "per_symbol"
+DB_SHARED_DIRECTORY = f"{DB_PERSIST_DIRECTORY}/shared/10-K"
+DB_SHARED_COLLECTION = "k10_items"
+# Vector store of the dbs: "chroma" or "numpy" (exact search over a memory-mapped matrix, see db/numpy_store.py)
+DB_VECTOR_STORE = "chroma"
+# Storage of the vectors of the numpy store: "float32", "float16" (half the size) or "int8" (a quarter, with a scale per vector).
+# Only the numpy store quantizes, Chroma (the default store) always stores float32 whatever this is set to.
+# On stored 10-K embeddings float16 kept the float32 top-k, int8 lost some of it (see benchmarks/quantization.py --db)
+DB_VECTOR_DTYPE = "float32"
+# Hybrid retrieval: a BM25 lexical index (see db/bm25.py) fused with the vector search by reciprocal rank fusion
+HYBRID_SEARCH = True
+HYBRID_RRF_K = 60
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Chunks of the 10-K items stored in the db (tokens), and number of chunks retrieved per item and year
+CHUNK_SIZE_TOKENS = 1000
+CHUNK_OVERLAP_TOKENS = 100
+CHUNKS_PER_ITEM = 4
+# Chunks retrieved for a free-form question, the standard analyses retrieve CHUNKS_PER_ITEM chunks per item and year they filter
+RETRIEVER_TOP_K = 8
+# Pool of the open dbs and retriever chains (see db/pool.py): entries, memory budget in MB, and seconds before an entry is refreshed
+DB_POOL_MAX_ENTRIES = 32
+DB_POOL_MAX_MB = 2048
+DB_POOL_TTL_SECONDS = 3600
+# Define the cache of the embedding vectors, keyed by (model, text hash) (see models/embeddings.py), and its size budget
+EMBEDDINGS_CACHE_PATH = f"{DATA_DIRECTORY}/embeddings_cache.db"
+EMBEDDINGS_CACHE_MAX_MB = 1024
+# Batches of the embedding requests (tokens and texts per request), embedded concurrently with retries
+EMBEDDINGS_BATCH_TOKENS = 100000
+EMBEDDINGS_BATCH_SIZE = 512
+EMBEDDINGS_MAX_CONCURRENCY = 4
+EMBEDDINGS_MAX_RETRIES = 3
 
 #  SEC
 COMPANY_NAME = "Personal Use"
 EMAIL = "user@example.com"
+# SEC requires a declared User-Agent: https://www.sec.gov/os/accessing-edgar-data
+SEC_USER_AGENT = f"{COMPANY_NAME} {EMAIL}"
+SEC_WWW_URL = "https://www.sec.gov"
+SEC_DATA_URL = "https://data.sec.gov"
+# SEC fair access policy: at most 10 requests per second
+SEC_REQUESTS_PER_SECOND = 10
+# Number of tickers downloaded concurrently
+SEC_MAX_CONCURRENT_TICKERS = 4
+# Only download the primary document of the filings, not the (much larger) full submission
+SEC_PRIMARY_ONLY = True
+# Retention of the prune job (see sec/prune.py): fiscal years kept per symbol, and disk budget of the filings in MB (None: no budget)
+SEC_RETENTION_YEARS = 3
+SEC_DISK_BUDGET_MB = None
 
 # MODEL 
 
 MODEL_OPENAI = "gpt-4o-mini"
+# Cache of the query results (see queries/cache.py), keyed by the corpus fingerprint, the model and PROMPT_VERSION
+RESULTS_CACHE_ENABLED = True
+RESULTS_CACHE_PATH = f"{DATA_DIRECTORY}/results_cache.db"
+RESULTS_CACHE_MAX_ENTRIES = 10000
+
+# Background ingestion jobs (see jobs/): queue db, worker processes, seconds between polls of the queue,
+# seconds without heartbeat before a running job is requeued, and seconds after which a db is refreshed
+# in the background to pick up new filings
+JOBS_ENABLED = True
+JOBS_PATH = f"{DATA_DIRECTORY}/jobs.db"
+JOBS_MAX_WORKERS = 2
+JOBS_POLL_SECONDS = 1.0
+JOBS_LEASE_SECONDS = 60
+JOBS_REFRESH_SECONDS = 24 * 3600
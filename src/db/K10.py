@@ -1,4 +1,5 @@
 import os
+import hashlib
 from langchain_openai import ChatOpenAI
 from langchain.chains.query_constructor.base import AttributeInfo
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -7,74 +8,337 @@ from langchain.chains.query_constructor.base import StructuredQueryOutputParser
 from langchain_chroma import Chroma
 from dotenv import load_dotenv
 from ..queries.K10 import get_query_constructor, allowed_comparators
-from ..sec.sec import get_recent_folders
-from ..sec.K10 import K10, RELEVANT_ITEMS
+from ..sec.catalog import catalog as filings_catalog
+from ..sec.sec import get_recent_folders, PRIMARY_DOCUMENT
+from ..sec.extract import extract_filing
+from ..sec.cache import ItemCache
+from ..models.utils import get_embeddings, get_embedding_model_name
+from ..models.embeddings import count_tokens
+from .pool import db_pool, get_directory_size
+from .numpy_store import NumpyVectorStore
+from .bm25 import BM25Index
+from .hybrid import HybridSelfQueryRetriever
+from .manifest import build_manifest, count_chunks, read_manifest, write_manifest
 from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain.schema.runnable import RunnablePassthrough, RunnableParallel
 from langchain_community.query_constructors.chroma import ChromaTranslator
-from ..config import MODEL_OPENAI, SOURCE_SEC_DIRECTORY
+from ..config import (MODEL_OPENAI, SOURCE_SEC_DIRECTORY, CHUNK_SIZE_TOKENS, CHUNK_OVERLAP_TOKENS, RETRIEVER_TOP_K,
+                      DB_PERSIST_DIRECTORY, DB_LAYOUT, DB_SHARED_DIRECTORY, DB_SHARED_COLLECTION, DB_VECTOR_STORE,
+                      DB_VECTOR_DTYPE, HYBRID_SEARCH)
 
 load_dotenv()
 
+LAYOUTS = ("per_symbol", "shared")
+VECTOR_STORES = ("chroma", "numpy")
+
+# Estimated memory of a chunk of a shared collection (vector, text and index)
+CHUNK_BYTES_ESTIMATE = 16 * 1024
+
+
+def get_persist_directory(symbol, filing_type="10-K", layout=DB_LAYOUT):
+    """
+    Returns the persist directory of the db of a symbol, the same for every symbol in the shared layout.
+    """
+    if layout == "shared":
+        return DB_SHARED_DIRECTORY
+    return f"{DB_PERSIST_DIRECTORY}/{symbol}/{filing_type}_items_1_1a_7_7a_8"
+
+
+def get_manifest_directory(persist_directory, symbol, layout=DB_LAYOUT):
+    """
+    Returns the directory of the manifest of the db of a symbol, the shared collection keeps one per symbol.
+    """
+    if layout == "shared":
+        return os.path.join(persist_directory, "manifests", symbol)
+    return persist_directory
+
+
+def remove_filings(symbol, accessions, filing_type="10-K"):
+    """
+    Remove filings from the db of a symbol, if it has one, and drop the db from the pool so engines open it again.
+
+    Returns:
+        list: accessions removed
+    """
+    persist_directory = get_persist_directory(symbol, filing_type)
+    if read_manifest(get_manifest_directory(persist_directory, symbol)) is None:
+        return []
+    db = K10_DB(persist_directory, symbol, get_embeddings(), save_to_txt_files=False)
+    removed = db.remove_filings(accessions)
+    db_pool.invalidate((symbol, filing_type))
+    return removed
+
+
+class ScopedChromaTranslator(ChromaTranslator):
+    """
+    Chroma translator adding a fixed filter (e.g. the symbol of a shared collection) to the filters of every query.
+    """
+    def __init__(self, scope=None):
+        super().__init__()
+        self.scope = scope
+
+    def visit_structured_query(self, structured_query):
+        query, kwargs = super().visit_structured_query(structured_query)
+        if self.scope:
+            kwargs["filter"] = {"$and": [self.scope, kwargs["filter"]]} if kwargs.get("filter") else dict(self.scope)
+        return query, kwargs
+
+
 class K10_DB:
-    def __init__(self, persist_directory, symbol, embeddings, save_to_txt_files=True, num_years=3):
+    def __init__(self, persist_directory, symbol, embeddings, save_to_txt_files=True, num_years=3, layout=DB_LAYOUT,
+                 vector_store=DB_VECTOR_STORE, vector_dtype=DB_VECTOR_DTYPE, progress=None):
+        if layout not in LAYOUTS:
+            raise ValueError(f"Invalid db layout: {layout}")
+        if vector_store not in VECTOR_STORES:
+            raise ValueError(f"Invalid vector store: {vector_store}")
         self.persist_directory = persist_directory
         self.symbol = symbol
         self.embeddings = embeddings
         self.num_years = num_years        
+        self.layout = layout
+        self.vector_store = vector_store
+        # only the numpy store quantizes its vectors
+        self.vector_dtype = vector_dtype
+        self.manifest_directory = get_manifest_directory(persist_directory, symbol, layout)
+        # called with the stage ("parse", "embed", "index") and the accession of the filing being indexed
+        self.progress = progress or (lambda stage, detail=None: None)
         self.docs = []
-        self.db = None
+        self._db = None
+        self._lexical_index = None
+        self.manifest = read_manifest(self.manifest_directory)
         self._initialize_items(save_to_txt_files)
 
-    def _chunck_data(data):
-        ''' Function to split documents in chunks'''
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=4000, chunk_overlap=100)
-        chunks = text_splitter.split_documents(data)
+    @property
+    def db(self):
+        # The collection is only opened when it is searched, metadata queries are served by the manifest
+        if self._db is None:
+            kwargs = {"collection_name": DB_SHARED_COLLECTION} if self.layout == "shared" else {}
+            if self.vector_store == "numpy":
+                self._db = NumpyVectorStore(persist_directory=self.persist_directory, embedding_function=self.embeddings,
+                                            dtype=self.vector_dtype, **kwargs)
+            else:
+                self._db = Chroma(persist_directory=self.persist_directory, embedding_function=self.embeddings, **kwargs)
+        return self._db
+
+    @property
+    def lexical_index(self):
+        # BM25 index of the chunks, kept next to the manifest; built from the stored chunks for dbs indexed without it
+        if self._lexical_index is None:
+            self._lexical_index = BM25Index(self.manifest_directory)
+            if not self._lexical_index.exists() and self.manifest is not None and self.manifest["chunks"]:
+                print(f"Building the lexical index of the db for {self.symbol}")
+                stored = self.db.get(where=self._get_scope(), include=["documents", "metadatas"])
+                self._lexical_index.add(stored["ids"], stored["documents"], stored["metadatas"])
+                self._lexical_index.save()
+        return self._lexical_index
+
+    def _get_scope(self):
+        # filter of the documents of this symbol, None when the collection only holds them
+        return {"symbol": self.symbol} if self.layout == "shared" else None
+
+    def _get_where(self, *conditions):
+        conditions = [condition for condition in (self._get_scope(), *conditions) if condition]
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"$and": conditions} if conditions else None
+
+    def get_size(self):
+        """
+        Returns the bytes used by the db, estimated from the number of chunks in the shared layout.
+        """
+        if self.layout == "shared":
+            return CHUNK_BYTES_ESTIMATE * sum(sum(year_chunks.values()) for year_chunks in self.manifest["chunks"].values())
+        return get_directory_size(self.persist_directory)
+
+    def _chunck_data(self, data):
+        ''' Function to split documents in chunks of CHUNK_SIZE_TOKENS tokens'''
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE_TOKENS,
+            chunk_overlap=CHUNK_OVERLAP_TOKENS,
+            length_function=count_tokens
+        )
+        chunks = []
+        for doc in data:
+            # chunk number within its item, and character offsets in the item content
+            # (chunks come in order and overlap, each one starts after the start of the previous one)
+            start = -1
+            for number, text in enumerate(text_splitter.split_text(doc.page_content)):
+                start = doc.page_content.find(text, start + 1)
+                chunks.append(Document(
+                    page_content=text,
+                    metadata={**doc.metadata, "chunk": number, "start": start, "end": start + len(text)}
+                ))
         return chunks
 
     def _initialize_items(self, save_to_txt_files):
-        # Check if persist directory exists and create db if not
-        if not os.path.exists(self.persist_directory):
-            print(f"Creating db for {self.symbol}")
-            print(f"Downloading 10-k filings files because {self.persist_directory} does not exist")
-
-            dir_path = os.path.join(SOURCE_SEC_DIRECTORY, self.symbol, "10-K")
-            recent_folders = get_recent_folders(self.symbol, num_years=self.num_years)
-
-            for year_folder in recent_folders:
-                year_folder_path = os.path.join(dir_path, year_folder)
-                print("year_folder_path = ", year_folder_path)
-                if not os.path.isdir(year_folder_path):
-                    raise(f"Directory {year_folder_path} does not exist")
-                doc_path = os.path.join(year_folder_path, "primary-document.html")                
-                extractor = K10(self.symbol, doc_path)
-                relevant_items = extractor.extract_item_contents(save_to_txt_files)
-
-                for item_key, item in relevant_items.items():
-                    self.docs.append(Document(
-                        page_content= item["content"], 
-                        metadata={
-                            "year": item["year"], 
-                            "type": item_key,
-                            #"type_description": item["title_description"]
-                        }
-                    ))
-            
-            # text_splitter = RecursiveCharacterTextSplitter(chunk_size=16000, chunk_overlap=100)
-            # documents = text_splitter.split_documents(self.docs)
-
-            # print(f"The document list has been split into {len(documents)} Documents.")
-            # for i, doc in enumerate(documents):
-            #     # print(f"text: {doc.page_content}")
-            #     print(f"{i} metadata: {doc.metadata}")
-            #     print("====")
-            print(f"Create db")
-            self.db = Chroma.from_documents(self.docs, self.embeddings, persist_directory=self.persist_directory)
+        # Existing dbs are brought up to date by refresh()
+        if self.manifest is not None:
+            return
+        if os.path.exists(self.persist_directory) and self.layout == "per_symbol":
+            # collection built before manifests existed: scan its metadata once, refresh() then replaces its documents
+            print(f"Writing the manifest of the db for {self.symbol}")
+            self._write_manifest(count_chunks(self.db.get(include=["metadatas"])["metadatas"]), {})
         else:
-            print(f"Loading db for {self.symbol}")
-            self.db = Chroma(persist_directory=self.persist_directory, embedding_function=self.embeddings)
+            print(f"Creating db for {self.symbol}")
+        self.refresh(save_to_txt_files)
+
+    def _get_chunking(self):
+        return {"size": CHUNK_SIZE_TOKENS, "overlap": CHUNK_OVERLAP_TOKENS}
+
+    def _delete_chunks(self, year=None, item_type=None):
+        # chunks of the symbol, of a year, or of one item of a year
+        where = self._get_where({"year": year} if year is not None else None,
+                                {"type": item_type} if item_type is not None else None)
+        ids = self.db.get(where=where, include=[])["ids"]
+        if ids:
+            self.db.delete(ids=ids)
+            self.lexical_index.delete(ids)
+
+    def _add_items(self, year, items):
+        # Returns the number of chunks added for each item
+        docs = [
+            Document(page_content=item["content"], metadata={"symbol": self.symbol, "year": year, "type": item_key})
+            for item_key, item in items.items()
+        ]
+        chunks = self._chunck_data(docs)
+        if chunks:
+            ids = [f"{self.symbol}-{year}-{chunk.metadata['type']}-{chunk.metadata['chunk']}" for chunk in chunks]
+            self.db.add_documents(chunks, ids=ids)
+            self.lexical_index.add(ids, [chunk.page_content for chunk in chunks], [chunk.metadata for chunk in chunks])
+        self.docs.extend(chunks)
+        return count_chunks([chunk.metadata for chunk in chunks]).get(str(year), {})
+
+    def refresh(self, save_to_txt_files=False):
+        """
+        Bring the db up to date with the most recent `num_years` filings: new filings are added and only
+        the items whose content changed are embedded again. The db keeps the most recent years of the largest
+        `num_years` it was refreshed for, so callers asking for fewer years don't remove the years of the others
+        (the retriever chain limits its search to the years it is given); older years are removed. A filing
+        replaced by a newer one of the same fiscal year is removed. A different embedding model or chunking
+        rebuilds the db.
+
+        Returns:
+            dict: {"added": [accession], "updated": [accession], "removed": [accession]}
+        """
+        changes = {"added": [], "updated": [], "removed": []}
+        embedding_model = get_embedding_model_name(self.embeddings)
+        chunking = self._get_chunking()
+        manifest = self.manifest or build_manifest(self.symbol, {}, {}, embedding_model, chunking, self.vector_store)
+        chunks = {year: dict(year_chunks) for year, year_chunks in manifest["chunks"].items()}
+        indexed_filings = manifest["filings"]
+        # the years kept cover the most years any refresh asked for
+        num_years = max(self.num_years, manifest.get("num_years") or 0)
+
+        if self.manifest is not None and (manifest["embedding_model"] != embedding_model or manifest.get("chunking") != chunking
+                                          or manifest.get("vector_store", "chroma") != self.vector_store):
+            print(f"Rebuilding db for {self.symbol}: embedding model, chunking or vector store changed")
+            if self.layout == "shared":
+                self._delete_chunks()
+            else:
+                self.db.delete_collection()
+                self._db = None
+            self.lexical_index.clear()
+            chunks, indexed_filings, num_years = {}, {}, self.num_years
+
+        # the catalog knows the hash and the fiscal year of the filings, they are only hashed when not catalogued
+        catalogued = {filing["accession"]: filing for filing in filings_catalog.get_recent(self.symbol, "10-K", self.num_years)}
+        dir_path = os.path.join(SOURCE_SEC_DIRECTORY, self.symbol, "10-K")
+        filings = dict(indexed_filings)
+        for year_folder in get_recent_folders(self.symbol, num_years=self.num_years):
+            year_folder_path = os.path.join(dir_path, year_folder)
+            if not os.path.isdir(year_folder_path):
+                raise ValueError(f"Directory {year_folder_path} does not exist")
+            doc_path = os.path.join(year_folder_path, PRIMARY_DOCUMENT)
+            catalogued_filing = catalogued.get(year_folder, {})
+            document_hash = catalogued_filing.get("content_hash") or ItemCache.get_document_hash(doc_path)
+            indexed = indexed_filings.get(year_folder)
+            if indexed and indexed["content_hash"] == document_hash:
+                continue
+
+            print("year_folder_path = ", year_folder_path)
+            self.progress("parse", year_folder)
+            # Filings already parsed (e.g. by python -m src.sec.extract) are served from the item cache
+            relevant_items, _ = extract_filing(self.symbol, doc_path, save_to_txt_files, document_hash=document_hash,
+                                               year=catalogued_filing.get("fiscal_year"))
+            if not relevant_items:
+                continue
+            year = next(iter(relevant_items.values()))["year"]
+            item_hashes = {item_key: hashlib.sha256(item["content"].encode("utf-8")).hexdigest()
+                           for item_key, item in relevant_items.items()}
+            indexed_items = indexed["items"] if indexed else {}
+
+            year_chunks = chunks.setdefault(str(year), {})
+            for item_key in list(year_chunks):
+                if item_key not in item_hashes or indexed_items.get(item_key) != item_hashes[item_key]:
+                    self._delete_chunks(year, item_key)
+                    del year_chunks[item_key]
+            changed = {item_key: item for item_key, item in relevant_items.items() if item_key not in year_chunks}
+            self.progress("embed", year_folder)
+            year_chunks.update(self._add_items(year, changed))
+
+            filings[year_folder] = {"year": year, "content_hash": document_hash, "items": item_hashes}
+            changes["updated" if indexed else "added"].append(year_folder)
+            # the chunks of the year were replaced above, a previous filing of the year (e.g. amended) is dropped
+            for accession in [accession for accession, filing in filings.items()
+                              if accession != year_folder and str(filing["year"]) == str(year)]:
+                del filings[accession]
+                changes["removed"].append(accession)
+
+        # years older than the most recent `num_years` are removed
+        years = sorted(set(chunks) | {str(filing["year"]) for filing in filings.values()})
+        for year in years[:-num_years]:
+            changes["removed"].extend(self._remove_year(year, chunks, filings))
+
+        # the manifest is written last, it only lists the chunks both indexes hold;
+        # it is written even without changes, its built_at is the time of the last refresh
+        self.progress("index")
+        if self.manifest is None or any(changes.values()) or filings != manifest["filings"]:
+            self.lexical_index.save()
+        self._write_manifest(chunks, filings, num_years)
+        if any(changes.values()):
+            print(f"Refreshed db for {self.symbol}: {changes}")
+        return changes
+
+    def _remove_year(self, year, chunks, filings):
+        # Removes the chunks of a year from both indexes and its filings from `chunks` and `filings`,
+        # returns the accessions of its filings
+        self._delete_chunks(year)
+        chunks.pop(year, None)
+        accessions = [accession for accession, filing in filings.items() if str(filing["year"]) == year]
+        for accession in accessions:
+            del filings[accession]
+        return accessions
+
+    def remove_filings(self, accessions):
+        """
+        Remove filings from the db (e.g. evicted by sec/prune.py) with the chunks of their years.
+
+        Returns:
+            list: accessions removed
+        """
+        if self.manifest is None:
+            return []
+        chunks = {year: dict(year_chunks) for year, year_chunks in self.manifest["chunks"].items()}
+        filings = dict(self.manifest["filings"])
+        removed = []
+        for year in sorted({str(filings[accession]["year"]) for accession in accessions if accession in filings}):
+            removed.extend(self._remove_year(year, chunks, filings))
+        if removed:
+            self.lexical_index.save()
+            # the db no longer covers the years removed, a request for them ingests them again
+            num_years = self.manifest.get("num_years")
+            if num_years is None or num_years > len(chunks):
+                num_years = len(chunks)
+            self._write_manifest(chunks, filings, num_years)
+            print(f"Removed filings from the db for {self.symbol}: {removed}")
+        return removed
+
+    def _write_manifest(self, chunks, filings, num_years=None):
+        self.manifest = build_manifest(self.symbol, chunks, filings, get_embedding_model_name(self.embeddings),
+                                       self._get_chunking(), self.vector_store, num_years)
+        write_manifest(self.manifest_directory, self.manifest)
 
     def _get_attributes_info(self):
         """
@@ -111,14 +375,18 @@ class K10_DB:
             self.db,
             document_content_description,
             metadata_field_info,
+            structured_query_translator=ScopedChromaTranslator(self._get_scope()),
         )
 
         return retriever
 
 
-    def get_retriever_chain(self, available_years):
-        max_k = len(available_years) * len(RELEVANT_ITEMS)
-        
+    def get_retriever_chain(self, available_years, static_queries=None):
+        """
+        Returns the question answering chain over the `available_years` of the db, retrieving RETRIEVER_TOP_K chunks.
+        The queries in `static_queries` ({query text: StructuredQuery}) skip the LLM query constructor, and retrieve
+        the number of chunks of their limit.
+        """
         attributes_info = self._get_attributes_info()
         constructor_prompt = get_query_constructor(attributes_info)
         output_parser = StructuredQueryOutputParser.from_components()
@@ -127,15 +395,19 @@ class K10_DB:
             model=MODEL_OPENAI,
         )
         query_constructor = constructor_prompt | llm | output_parser
-        chroma_translator = ChromaTranslator()
+        # the translator keeps the search to the available years, and in the shared collection to this symbol
+        chroma_translator = ScopedChromaTranslator(
+            self._get_where({"year": {"$in": list(available_years)}} if available_years else None))
         chroma_translator.allowed_comparators = allowed_comparators    
 
-        # Initialize the Self-Query Retriever
-        retriever = SelfQueryRetriever(
+        # Initialize the Self-Query Retriever, fusing the vector search with the lexical one
+        retriever = HybridSelfQueryRetriever(
             structured_query_translator=chroma_translator,
             query_constructor=query_constructor,
             vectorstore=self.db,
-            search_kwargs={'k': max_k}
+            search_kwargs={'k': RETRIEVER_TOP_K},
+            lexical_index=self.lexical_index if HYBRID_SEARCH else None,
+            static_queries=static_queries or {},
         )
 
         template = '''You are a professional financial analyst, a very disciplined value investor.
@@ -167,18 +439,18 @@ class K10_DB:
         return rag_chain_with_source
 
     def get_available_documents(self):
-        docs = []
-        for x in range(len(self.db.get()["ids"])):
-            # print(db.get()["metadatas"][x])
-            doc = self.db.get()["metadatas"][x]
-            docs.append(doc)
-        return docs
+        """
+        Returns the items in the database, with their year, type and number of chunks.
+        """
+        return [
+            {"year": year, "type": item_type, "chunks": chunks}
+            for year in self.manifest["years"]
+            for item_type, chunks in self.manifest["chunks"][str(year)].items()
+        ]
             
 
     def get_available_years(self):
         """
         Returns the available years in the database.
         """
-        docs = self.get_available_documents()
-        years = [doc["year"] for doc in docs]
-        return sorted(list(set(years)))
+        return list(self.manifest["years"])
@@ -0,0 +1,119 @@
+import os
+import re
+import json
+import math
+from collections import Counter
+from .numpy_store import matches
+from ..config import BM25_K1, BM25_B
+from ..utils.files import atomic_write
+
+BM25_FILE = "bm25.json"
+BM25_VERSION = 1
+
+
+def tokenize(text):
+    """
+    Returns the lowercase terms of a text ("Item 7A" -> ["item", "7a"]).
+    """
+    return re.findall(r"\w+", text.lower())
+
+
+class BM25Index:
+    """
+    Inverted index of the chunks of a db, scored with Okapi BM25 and stored as JSON next to the manifest.
+
+    Only the term frequencies, lengths and metadata of the chunks are stored, their text stays in the
+    vector store. Filters use the Chroma `where` syntax, like the vector stores.
+    """
+    def __init__(self, directory, k1=BM25_K1, b=BM25_B):
+        self.path = os.path.join(directory, BM25_FILE)
+        self.k1 = k1
+        self.b = b
+        self.documents = {}  # id -> {"length", "metadata"}
+        self.postings = {}  # term -> {id: term frequency}
+        self.total_length = 0
+        self._load()
+
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring corrupted lexical index {self.path}: {str(e)}")
+            return
+        if data.get("version") != BM25_VERSION:
+            return
+        self.documents = data["documents"]
+        self.postings = data["postings"]
+        self.total_length = sum(document["length"] for document in self.documents.values())
+
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+
+    def save(self):
+        """
+        Write the index, atomically.
+        """
+        with atomic_write(self.path) as f:
+            json.dump({"version": BM25_VERSION, "documents": self.documents, "postings": self.postings}, f)
+
+
+    def add(self, ids, texts, metadatas):
+        """
+        Index documents, replacing the ones with the same ids.
+        """
+        self.delete([id for id in ids if id in self.documents])
+        for id, text, metadata in zip(ids, texts, metadatas):
+            terms = Counter(tokenize(text))
+            length = sum(terms.values())
+            self.documents[id] = {"length": length, "metadata": dict(metadata)}
+            self.total_length += length
+            for term, frequency in terms.items():
+                self.postings.setdefault(term, {})[id] = frequency
+
+
+    def delete(self, ids):
+        removed = {id for id in ids if id in self.documents}
+        if not removed:
+            return
+        for id in removed:
+            self.total_length -= self.documents.pop(id)["length"]
+        for term in list(self.postings):
+            term_postings = self.postings[term]
+            for id in removed.intersection(term_postings):
+                del term_postings[id]
+            if not term_postings:
+                del self.postings[term]
+
+
+    def clear(self):
+        self.documents, self.postings, self.total_length = {}, {}, 0
+
+
+    def search(self, query, k=4, filter=None):
+        """
+        Returns the ids of the k documents scoring best for a query, with their BM25 score, best first.
+        Documents not matching the filter, or sharing no term with the query, are left out.
+        """
+        if not self.documents:
+            return []
+        num_documents = len(self.documents)
+        average_length = self.total_length / num_documents
+        scores = {}
+        for term in set(tokenize(query)):
+            term_postings = self.postings.get(term)
+            if not term_postings:
+                continue
+            idf = math.log(1 + (num_documents - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            for id, frequency in term_postings.items():
+                length = self.documents[id]["length"]
+                scores[id] = scores.get(id, 0.0) + idf * frequency * (self.k1 + 1) / (
+                    frequency + self.k1 * (1 - self.b + self.b * length / average_length))
+        if filter:
+            scores = {id: score for id, score in scores.items() if matches(self.documents[id]["metadata"], filter)}
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
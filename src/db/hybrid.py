@@ -0,0 +1,70 @@
+import asyncio
+from typing import Any
+from langchain_core.documents import Document
+from langchain.retrievers.self_query.base import SelfQueryRetriever
+from ..config import HYBRID_RRF_K
+
+
+def reciprocal_rank_fusion(rankings, k=HYBRID_RRF_K):
+    """
+    Fuse rankings of ids with Reciprocal Rank Fusion, each id scoring sum(1 / (k + rank)).
+
+    Returns:
+        list: the ids, best first
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, id in enumerate(ranking, start=1):
+            scores[id] = scores.get(id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda id: -scores[id])
+
+
+class HybridSelfQueryRetriever(SelfQueryRetriever):
+    """
+    Self-query retriever fusing the vector search with a BM25 search of the same query and filter,
+    so the chunks containing the exact terms of the query (e.g. "Item 7A") are retrieved too.
+
+    Queries in `static_queries` (query text -> StructuredQuery) are searched with their own filter,
+    without calling the LLM query constructor.
+    """
+    lexical_index: Any = None
+    rrf_k: int = HYBRID_RRF_K
+    static_queries: dict = {}
+
+    def _fuse(self, query, search_kwargs, vector_docs):
+        if self.lexical_index is None:
+            return vector_docs
+        k = search_kwargs.get("k", 4)
+        lexical_ids = [id for id, _ in self.lexical_index.search(query, k, search_kwargs.get("filter"))]
+        docs = {doc.id: doc for doc in vector_docs}
+        ids = reciprocal_rank_fusion([[doc.id for doc in vector_docs], lexical_ids], self.rrf_k)[:k]
+
+        # the text of the chunks only found by the lexical search is read from the vector store
+        missing = [id for id in ids if id not in docs]
+        if missing:
+            found = self.vectorstore.get(ids=missing, include=["documents", "metadatas"])
+            for id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"]):
+                docs[id] = Document(id=id, page_content=text, metadata=metadata)
+        return [docs[id] for id in ids if id in docs]
+
+    def _get_docs_with_query(self, query, search_kwargs):
+        return self._fuse(query, search_kwargs, super()._get_docs_with_query(query, search_kwargs))
+
+    async def _aget_docs_with_query(self, query, search_kwargs):
+        vector_docs = await super()._aget_docs_with_query(query, search_kwargs)
+        # the lexical search and the reads of the vector store don't block the event loop
+        return await asyncio.to_thread(self._fuse, query, search_kwargs, vector_docs)
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        structured_query = self.static_queries.get(query)
+        if structured_query is None:
+            return super()._get_relevant_documents(query, run_manager=run_manager)
+        new_query, search_kwargs = self._prepare_query(query, structured_query)
+        return self._get_docs_with_query(new_query, search_kwargs)
+
+    async def _aget_relevant_documents(self, query, *, run_manager):
+        structured_query = self.static_queries.get(query)
+        if structured_query is None:
+            return await super()._aget_relevant_documents(query, run_manager=run_manager)
+        new_query, search_kwargs = self._prepare_query(query, structured_query)
+        return await self._aget_docs_with_query(new_query, search_kwargs)
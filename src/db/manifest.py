@@ -0,0 +1,88 @@
+import os
+import json
+import hashlib
+from datetime import datetime, timezone
+from ..utils.files import atomic_write
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def get_manifest_path(persist_directory):
+    return os.path.join(persist_directory, MANIFEST_FILE)
+
+
+def count_chunks(metadatas):
+    """
+    Returns the number of documents of each year and item type, {year: {type: count}}.
+    """
+    chunks = {}
+    for metadata in metadatas:
+        year_chunks = chunks.setdefault(str(metadata["year"]), {})
+        year_chunks[metadata["type"]] = year_chunks.get(metadata["type"], 0) + 1
+    return chunks
+
+
+def build_manifest(symbol, chunks, filings, embedding_model, chunking=None, vector_store="chroma", num_years=None):
+    """
+    Build the manifest of a collection.
+
+    Args:
+        symbol (str): ticker symbol of the collection
+        chunks (dict): {year: {type: number of chunks}} stored, see count_chunks
+        filings (dict): {accession: {"year", "content_hash", "items": {type: content hash}}} of the filings indexed
+        embedding_model (str): name of the embedding model of the vectors
+        chunking (dict): parameters the items were chunked with
+        vector_store (str): vector store holding the chunks
+        num_years (int): most recent fiscal years the filings were last refreshed for, a symbol may have fewer
+
+    Returns:
+        dict: the manifest
+    """
+    chunks = {year: dict(year_chunks) for year, year_chunks in chunks.items() if year_chunks}
+    return {
+        "version": MANIFEST_VERSION,
+        "symbol": symbol,
+        "years": sorted(chunks),
+        "items": sorted({item_type for year_chunks in chunks.values() for item_type in year_chunks}),
+        "chunks": chunks,
+        "filings": filings,
+        "embedding_model": embedding_model,
+        "chunking": chunking,
+        "vector_store": vector_store,
+        "num_years": num_years,
+        "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def get_fingerprint(manifest):
+    """
+    Returns a hash of the content indexed by a collection: its filings and item hashes, chunks, embedding model,
+    chunking and vector store. It changes whenever the collection content changes, not when it is only rebuilt.
+    """
+    content = {key: manifest.get(key) for key in ("symbol", "filings", "chunks", "embedding_model", "chunking", "vector_store")}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def write_manifest(persist_directory, manifest):
+    """
+    Write the manifest of a collection, atomically.
+    """
+    with atomic_write(get_manifest_path(persist_directory)) as f:
+        json.dump(manifest, f, indent=2)
+
+
+def read_manifest(persist_directory):
+    """
+    Returns the manifest of a collection, None if missing or unreadable.
+    """
+    path = get_manifest_path(persist_directory)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring corrupted manifest {path}: {str(e)}")
+        return None
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
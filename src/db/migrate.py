@@ -0,0 +1,104 @@
+import os
+import sys
+import argparse
+import chromadb
+from .K10 import get_persist_directory
+from .manifest import read_manifest, write_manifest
+from ..config import DB_PERSIST_DIRECTORY, DB_SHARED_DIRECTORY, DB_SHARED_COLLECTION
+
+# Collection name of the per-symbol dbs, the langchain_chroma default
+PER_SYMBOL_COLLECTION = "langchain"
+
+# Chunks read and written at a time
+MIGRATION_BATCH_SIZE = 1000
+
+
+def get_per_symbol_symbols(filing_type="10-K", base_directory=DB_PERSIST_DIRECTORY):
+    """
+    Returns the symbols having a per-symbol db, sorted.
+    """
+    if not os.path.isdir(base_directory):
+        return []
+    return sorted(
+        symbol for symbol in os.listdir(base_directory)
+        if os.path.isdir(os.path.join(base_directory, symbol, f"{filing_type}_items_1_1a_7_7a_8"))
+    )
+
+
+def migrate_symbol(symbol, shared_collection, filing_type="10-K", base_directory=DB_PERSIST_DIRECTORY,
+                   shared_directory=DB_SHARED_DIRECTORY):
+    """
+    Copy the chunks of the per-symbol db of a symbol to the shared collection, with their vectors,
+    and its manifest to the manifests of the shared layout. Chunks already migrated are replaced.
+
+    Returns:
+        int: the number of chunks copied
+    """
+    persist_directory = os.path.join(base_directory, symbol, f"{filing_type}_items_1_1a_7_7a_8")
+    manifest = read_manifest(persist_directory)
+    if manifest is None:
+        raise ValueError(f"No manifest in {persist_directory}, open the db once to build it")
+
+    client = chromadb.PersistentClient(path=persist_directory)
+    collection = client.get_collection(PER_SYMBOL_COLLECTION)
+    copied = 0
+    while True:
+        batch = collection.get(include=["documents", "metadatas", "embeddings"],
+                               limit=MIGRATION_BATCH_SIZE, offset=copied)
+        if not batch["ids"]:
+            break
+        metadatas = [dict(metadata, symbol=symbol) for metadata in batch["metadatas"]]
+        ids = [f"{symbol}-{metadata['year']}-{metadata['type']}-{metadata.get('chunk', 0)}" for metadata in metadatas]
+        shared_collection.upsert(ids=ids, embeddings=batch["embeddings"], metadatas=metadatas,
+                                 documents=batch["documents"])
+        copied += len(batch["ids"])
+
+    write_manifest(os.path.join(shared_directory, "manifests", symbol), manifest)
+    return copied
+
+
+def migrate(symbols=None, filing_type="10-K", base_directory=DB_PERSIST_DIRECTORY, shared_directory=DB_SHARED_DIRECTORY):
+    """
+    Migrate per-symbol dbs to the shared collection, reusing their vectors.
+
+    Args:
+        symbols (list): symbols to migrate, default all the ones having a per-symbol db
+        filing_type (str): type of filing of the dbs
+        base_directory (str): directory of the per-symbol dbs
+        shared_directory (str): directory of the shared collection
+
+    Returns:
+        dict: {"migrated": {symbol: chunks copied}, "failed": {symbol: error}}
+    """
+    symbols = symbols or get_per_symbol_symbols(filing_type, base_directory)
+    client = chromadb.PersistentClient(path=shared_directory)
+    shared_collection = client.get_or_create_collection(DB_SHARED_COLLECTION)
+
+    result = {"migrated": {}, "failed": {}}
+    for symbol in symbols:
+        try:
+            result["migrated"][symbol] = migrate_symbol(symbol, shared_collection, filing_type, base_directory,
+                                                        shared_directory)
+        except Exception as e:
+            print(f"Error migrating {symbol}: {str(e)}")
+            result["failed"][symbol] = str(e)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate the per-symbol dbs to the shared collection.")
+    parser.add_argument("symbols", nargs="*", help="ticker symbols, e.g. AAPL MSFT (default: all the per-symbol dbs)")
+    parser.add_argument("--filing-type", default="10-K")
+    args = parser.parse_args(argv)
+
+    result = migrate(args.symbols or None, args.filing_type)
+    for symbol, chunks in result["migrated"].items():
+        print(f"Migrated {symbol}: {chunks} chunks")
+    print(f"{len(result['migrated'])} symbols migrated to {get_persist_directory(None, args.filing_type, 'shared')}, "
+          f"{len(result['failed'])} failed")
+    print('Set DB_LAYOUT = "shared" to serve queries from the shared collection')
+    return 1 if result["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
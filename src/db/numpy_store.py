@@ -0,0 +1,259 @@
+import os
+import json
+import uuid
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from ..utils.files import atomic_write
+
+VECTORS_FILE = "vectors.npy"
+SCALES_FILE = "scales.npy"
+DOCUMENTS_FILE = "documents.json"
+
+# Storage types of the vectors: int8 vectors are stored with a float32 scale per vector
+DTYPES = ("float32", "float16", "int8")
+
+_COMPARATORS = {
+    "$eq": lambda value, target: value == target,
+    "$ne": lambda value, target: value != target,
+    "$gt": lambda value, target: value is not None and value > target,
+    "$gte": lambda value, target: value is not None and value >= target,
+    "$lt": lambda value, target: value is not None and value < target,
+    "$lte": lambda value, target: value is not None and value <= target,
+    "$in": lambda value, target: value in target,
+    "$nin": lambda value, target: value not in target,
+}
+
+
+def matches(metadata, where):
+    """
+    Returns whether a metadata dict satisfies a Chroma `where` filter ($and, $or and the field comparators).
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches(metadata, sub_where) for sub_where in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(metadata, sub_where) for sub_where in condition):
+                return False
+        elif isinstance(condition, dict):
+            for comparator, target in condition.items():
+                if comparator not in _COMPARATORS:
+                    raise ValueError(f"Unsupported comparator: {comparator}")
+                if not _COMPARATORS[comparator](metadata.get(key), target):
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact-search vector store for small collections: the normalized vectors are kept in a
+    memory-mapped .npy matrix and the ids, texts and metadata in a JSON file next to it.
+
+    Vectors are stored as float32, or quantized to float16 (half the size) or int8 with a scale
+    per vector (a quarter). A collection stored with another dtype is converted when opened.
+
+    Searches compute the cosine similarity against every vector allowed by the filter, which for the
+    few hundred chunks of a symbol is faster than starting a Chroma client. Filters use the Chroma
+    `where` syntax, so the store works with the Chroma query translator.
+    """
+    def __init__(self, persist_directory, embedding_function, collection_name="langchain", dtype="float32"):
+        if dtype not in DTYPES:
+            raise ValueError(f"Invalid vector dtype: {dtype}")
+        self.persist_directory = persist_directory
+        self.dtype = dtype
+        self.collection_name = collection_name
+        self.directory = os.path.join(persist_directory, "numpy", collection_name)
+        self._embeddings = embedding_function
+        self._load()
+
+
+    @property
+    def embeddings(self):
+        return self._embeddings
+
+
+    def _load(self):
+        vectors_path = os.path.join(self.directory, VECTORS_FILE)
+        scales_path = os.path.join(self.directory, SCALES_FILE)
+        documents_path = os.path.join(self.directory, DOCUMENTS_FILE)
+        if os.path.exists(vectors_path) and os.path.exists(documents_path):
+            self.vectors = np.load(vectors_path, mmap_mode='r')
+            self.scales = np.load(scales_path, mmap_mode='r') if self.vectors.dtype == np.int8 else None
+            with open(documents_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        else:
+            self.vectors = np.zeros((0, 0), dtype=self.dtype)
+            self.scales = np.zeros(0, dtype=np.float32) if self.dtype == "int8" else None
+            data = {"ids": [], "documents": [], "metadatas": []}
+        self.ids = data["ids"]
+        self.documents = data["documents"]
+        self.metadatas = data["metadatas"]
+        if self.vectors.dtype != np.dtype(self.dtype):
+            print(f"Converting the vectors of {self.directory} from {self.vectors.dtype} to {self.dtype}")
+            self._save(*self._quantize(self._dequantize(self.vectors, self.scales)))
+
+
+    def _save(self, vectors, scales):
+        # the files are replaced atomically, the vectors are memory-mapped again afterwards
+        files = [(VECTORS_FILE, vectors)] + ([(SCALES_FILE, scales)] if scales is not None else [])
+        for name, array in files:
+            with atomic_write(os.path.join(self.directory, name), 'wb') as f:
+                np.save(f, array)
+        with atomic_write(os.path.join(self.directory, DOCUMENTS_FILE)) as f:
+            json.dump({"ids": self.ids, "documents": self.documents, "metadatas": self.metadatas}, f)
+        if scales is None and os.path.exists(os.path.join(self.directory, SCALES_FILE)):
+            os.remove(os.path.join(self.directory, SCALES_FILE))
+        self.vectors = np.load(os.path.join(self.directory, VECTORS_FILE), mmap_mode='r')
+        self.scales = np.load(os.path.join(self.directory, SCALES_FILE), mmap_mode='r') if scales is not None else None
+
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+    def _quantize(self, vectors):
+        """
+        Returns the vectors in the storage dtype, and their scales (None unless int8).
+        """
+        if self.dtype != "int8":
+            return np.asarray(vectors, dtype=self.dtype), None
+        vectors = np.asarray(vectors, dtype=np.float32)
+        scales = np.abs(vectors).max(axis=-1) / 127 if len(vectors) else np.zeros(0, dtype=np.float32)
+        scales = np.where(scales == 0, 1, scales).astype(np.float32)
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales
+
+
+    @staticmethod
+    def _dequantize(vectors, scales):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors * np.asarray(scales)[:, None] if scales is not None else vectors
+
+
+    def _get_rows(self, indices, dimensions):
+        # stored vectors and scales of some rows, empty ones with the given dimensions if there are none
+        if indices:
+            return (np.asarray(self.vectors)[indices],
+                    np.asarray(self.scales)[indices] if self.scales is not None else None)
+        return self._quantize(np.zeros((0, dimensions), dtype=np.float32))
+
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+        new_vectors, new_scales = self._quantize(self._normalize(self._embeddings.embed_documents(texts)))
+
+        # existing ids are replaced, like an upsert
+        replaced = set(ids)
+        keep = [index for index, id in enumerate(self.ids) if id not in replaced]
+        vectors, scales = self._get_rows(keep, new_vectors.shape[1])
+        self.ids = [self.ids[index] for index in keep] + ids
+        self.documents = [self.documents[index] for index in keep] + texts
+        self.metadatas = [self.metadatas[index] for index in keep] + [dict(metadata) for metadata in metadatas]
+        self._save(np.concatenate([vectors, new_vectors]),
+                   np.concatenate([scales, new_scales]) if scales is not None else None)
+        return ids
+
+
+    def get(self, ids=None, where=None, include=("documents", "metadatas")):
+        """
+        Returns the ids, and the included fields, of the documents matching `ids` and `where`, like Chroma's get.
+        """
+        wanted = set(ids) if ids is not None else None
+        indices = [
+            index for index, (id, metadata) in enumerate(zip(self.ids, self.metadatas))
+            if (wanted is None or id in wanted) and matches(metadata, where)
+        ]
+        result = {"ids": [self.ids[index] for index in indices]}
+        if "documents" in include:
+            result["documents"] = [self.documents[index] for index in indices]
+        if "metadatas" in include:
+            result["metadatas"] = [self.metadatas[index] for index in indices]
+        if "embeddings" in include:
+            result["embeddings"] = self._dequantize(*self._get_rows(indices, self.vectors.shape[1])) if indices else []
+        return result
+
+
+    def delete(self, ids=None, **kwargs):
+        if not ids:
+            return None
+        removed = set(ids)
+        keep = [index for index, id in enumerate(self.ids) if id not in removed]
+        if len(keep) == len(self.ids):
+            return True
+        vectors, scales = self._get_rows(keep, self.vectors.shape[1])
+        self.ids = [self.ids[index] for index in keep]
+        self.documents = [self.documents[index] for index in keep]
+        self.metadatas = [self.metadatas[index] for index in keep]
+        self._save(vectors, scales)
+        return True
+
+
+    def delete_collection(self):
+        for name in (VECTORS_FILE, SCALES_FILE, DOCUMENTS_FILE):
+            path = os.path.join(self.directory, name)
+            if os.path.exists(path):
+                os.remove(path)
+        self._load()
+
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None):
+        """
+        Returns the k documents most similar to a vector, with their cosine similarity, best first.
+        """
+        if not self.ids:
+            return []
+        candidates = np.array([index for index, metadata in enumerate(self.metadatas) if matches(metadata, filter)],
+                              dtype=np.int64) if filter else np.arange(len(self.ids))
+        if not len(candidates):
+            return []
+        query = self._normalize(embedding)
+        # quantized vectors are scored in float32, int8 ones scaled back afterwards
+        scores = np.asarray(self.vectors[candidates], dtype=np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales[candidates]
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            (Document(id=self.ids[candidates[index]], page_content=self.documents[candidates[index]],
+                      metadata=dict(self.metadatas[candidates[index]])), float(scores[index]))
+            for index in top
+        ]
+
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        return self.similarity_search_by_vector_with_score(self._embeddings.embed_query(query), k, filter)
+
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+
+    def _select_relevance_score_fn(self):
+        # scores are cosine similarities, mapped to [0, 1]
+        return lambda score: (score + 1) / 2
+
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, persist_directory=None,
+                   collection_name="langchain", dtype="float32", **kwargs):
+        if persist_directory is None:
+            raise ValueError("persist_directory is required")
+        store = cls(persist_directory, embedding, collection_name, dtype)
+        store.add_texts(texts, metadatas, ids)
+        return store
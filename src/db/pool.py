@@ -0,0 +1,123 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from ..config import DB_POOL_MAX_ENTRIES, DB_POOL_MAX_MB, DB_POOL_TTL_SECONDS
+
+
+def get_directory_size(path):
+    """
+    Returns the bytes used by the files of a directory, 0 if it does not exist.
+    """
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+class LRUPool:
+    """
+    Thread-safe pool of open resources (dbs, retriever chains, ...), shared by the whole process.
+
+    Entries are built by a factory on the first `get` of their key, and evicted least recently used first
+    when the pool holds more than `max_entries` entries or more than `max_bytes` (as measured by `sizeof`).
+    Entries older than `ttl` seconds are built again, so they pick up new data.
+    A key is built once even when requested concurrently.
+    """
+    def __init__(self, max_entries=DB_POOL_MAX_ENTRIES, max_bytes=DB_POOL_MAX_MB * 1024 * 1024,
+                 ttl=DB_POOL_TTL_SECONDS, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof or (lambda value: 0)
+        self._entries = OrderedDict()  # key -> (value, size, created)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    def _get_entry(self, key):
+        # Returns the value of a live entry and marks it as the most recently used, None if missing or expired
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl is not None and time.monotonic() - entry[2] > self.ttl:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+    def get(self, key, factory):
+        """
+        Returns the value of a key, built by `factory()` if not in the pool.
+        """
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is not None:
+                self.hits += 1
+                return entry[0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # another thread may have built it meanwhile
+            with self._lock:
+                entry = self._get_entry(key)
+                if entry is not None:
+                    self.hits += 1
+                    return entry[0]
+                self.misses += 1
+
+            try:
+                value = factory()
+                size = self.sizeof(value)
+                with self._lock:
+                    if key in self._entries:
+                        self._remove(key)
+                    self._entries[key] = (value, size, time.monotonic())
+                    self._bytes += size
+                    # the entry just added is kept even if it is over the budget alone
+                    while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                        self._remove(next(iter(self._entries)))
+                        self.evictions += 1
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+        return value
+
+
+    def invalidate(self, key=None):
+        """
+        Removes a key from the pool, or every key.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._bytes = 0
+            elif key in self._entries:
+                self._remove(key)
+
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / requests if requests else 0.0,
+            }
+
+
+# Open K10 dbs and their retriever chains, sized by their persist directory or their share of the collection
+db_pool = LRUPool(sizeof=lambda entry: entry["db"].get_size())
@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+from contextlib import contextmanager
+from ..config import JOBS_PATH, JOBS_LEASE_SECONDS
+
+# Stages of an ingestion job, in order
+STAGES = ("download", "parse", "embed", "index")
+
+# Statuses of a job: waiting for a worker, being run, or finished
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+ACTIVE_STATUSES = (PENDING, RUNNING)
+
+
+class JobQueue:
+    """
+    Queue of the ingestion jobs (download, parse, embed and index the filings of a symbol), in SQLite
+    so it is shared by the API and the worker processes.
+
+    The filings of a symbol are indexed in one db whatever the number of years, so its jobs are deduplicated by
+    symbol and filing type, and workers never run two jobs of a symbol at the same time.
+    Workers claim the oldest pending job and report its progress by stage.
+
+    A running job is leased to its worker for `lease_seconds`, renewed by its heartbeats and progress.
+    Jobs whose lease expired (their worker died) are put back in the queue by the next claim.
+    """
+    def __init__(self, path=JOBS_PATH, lease_seconds=JOBS_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+
+
+    @contextmanager
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    symbol TEXT NOT NULL,
+                    filing_type TEXT NOT NULL,
+                    num_years INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    progress TEXT NOT NULL,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_symbol_status ON jobs (symbol, filing_type, status)")
+            yield conn
+        finally:
+            conn.close()
+
+
+    @staticmethod
+    def _to_dict(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["progress"] = json.loads(job["progress"])
+        return job
+
+
+    def submit(self, symbol, filing_type="10-K", num_years=3):
+        """
+        Queue the ingestion of the most recent `num_years` filings of a symbol, unless an active job covers them:
+        a pending job of the symbol is extended to `num_years`, and a running job is returned if it
+        covers them. Otherwise the new job waits for the running one.
+
+        Returns:
+            dict: the job
+        """
+        with self._connect() as conn:
+            # the check and the insert are one transaction, so concurrent submits create one job
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE symbol = ? AND filing_type = ? AND status = ? ORDER BY created LIMIT 1",
+                    (symbol, filing_type, PENDING)
+                ).fetchone()
+                if row is not None and row["num_years"] < num_years:
+                    conn.execute("UPDATE jobs SET num_years = ?, updated = ? WHERE id = ?", (num_years, time.time(), row["id"]))
+                    row = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+                if row is None:
+                    row = conn.execute(
+                        "SELECT * FROM jobs WHERE symbol = ? AND filing_type = ? AND status = ? AND num_years >= ? "
+                        "ORDER BY created LIMIT 1",
+                        (symbol, filing_type, RUNNING, num_years)
+                    ).fetchone()
+                if row is None:
+                    now = time.time()
+                    job_id = uuid.uuid4().hex
+                    conn.execute(
+                        "INSERT INTO jobs (id, symbol, filing_type, num_years, status, stage, progress, error, created, updated) "
+                        "VALUES (?, ?, ?, ?, ?, NULL, ?, NULL, ?, ?)",
+                        (job_id, symbol, filing_type, num_years, PENDING,
+                         json.dumps({stage: {"status": PENDING} for stage in STAGES}), now, now)
+                    )
+                    row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self._to_dict(row)
+
+
+    def get(self, job_id):
+        """
+        Returns a job, None if unknown.
+        """
+        with self._connect() as conn:
+            return self._to_dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+
+    def get_active(self, symbol, filing_type="10-K"):
+        """
+        Returns the latest pending or running job of a symbol, None if there is none.
+        """
+        with self._connect() as conn:
+            return self._to_dict(conn.execute(
+                f"SELECT * FROM jobs WHERE symbol = ? AND filing_type = ? "
+                f"AND status IN ({', '.join('?' * len(ACTIVE_STATUSES))}) ORDER BY created DESC LIMIT 1",
+                (symbol, filing_type, *ACTIVE_STATUSES)
+            ).fetchone())
+
+
+    def claim(self):
+        """
+        Mark the oldest pending job as running and return it, None if there is none.
+        The jobs of a symbol with a running job wait for it, they would refresh the same db.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                requeued = self._requeue_expired(conn)
+                if requeued:
+                    print(f"Requeued {requeued} ingestion jobs whose worker stopped")
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? AND NOT EXISTS ("
+                    "SELECT 1 FROM jobs AS running WHERE running.status = ? "
+                    "AND running.symbol = jobs.symbol AND running.filing_type = jobs.filing_type"
+                    ") ORDER BY created LIMIT 1",
+                    (PENDING, RUNNING)
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE jobs SET status = ?, updated = ? WHERE id = ?", (RUNNING, time.time(), row["id"]))
+                    row = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self._to_dict(row)
+
+
+    def _update(self, job_id, update):
+        # applies update(job) to the job and writes it back
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                job = self._to_dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+                if job is not None:
+                    update(job)
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, stage = ?, progress = ?, error = ?, updated = ? WHERE id = ?",
+                        (job["status"], job["stage"], json.dumps(job["progress"]), job["error"], time.time(), job_id)
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+
+    def set_stage(self, job_id, stage, detail=None):
+        """
+        Record the stage a job is running (with e.g. the accession of the filing), the previous stages are done.
+        """
+        def update(job):
+            for previous in STAGES[:STAGES.index(stage)]:
+                job["progress"][previous]["status"] = DONE
+            # filings are parsed and embedded one after the other: the stages after this one wait for the next filing
+            for following in STAGES[STAGES.index(stage) + 1:]:
+                if job["progress"][following]["status"] == RUNNING:
+                    job["progress"][following]["status"] = PENDING
+            job["progress"][stage] = {"status": RUNNING, "detail": detail} if detail else {"status": RUNNING}
+            job["stage"] = stage
+        self._update(job_id, update)
+
+
+    def finish(self, job_id):
+        def update(job):
+            for stage in STAGES:
+                job["progress"][stage]["status"] = DONE
+            job["status"], job["stage"] = DONE, None
+        self._update(job_id, update)
+
+
+    def fail(self, job_id, error):
+        def update(job):
+            if job["stage"]:
+                job["progress"][job["stage"]]["status"] = FAILED
+            job["status"], job["error"] = FAILED, str(error)
+        self._update(job_id, update)
+
+
+    def heartbeat(self, job_id):
+        """
+        Renew the lease of a running job.
+        """
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET updated = ? WHERE id = ? AND status = ?", (time.time(), job_id, RUNNING))
+
+
+    def _requeue_expired(self, conn):
+        # running jobs without heartbeat for lease_seconds go back to the queue, returns their number
+        now = time.time()
+        return conn.execute("UPDATE jobs SET status = ?, updated = ? WHERE status = ? AND updated < ?",
+                            (PENDING, now, RUNNING, now - self.lease_seconds)).rowcount
+
+
+job_queue = JobQueue()
@@ -0,0 +1,136 @@
+import sys
+import time
+import argparse
+import threading
+import multiprocessing
+from .queue import JobQueue
+from ..config import JOBS_PATH, JOBS_MAX_WORKERS, JOBS_POLL_SECONDS
+from ..db.K10 import K10_DB, get_persist_directory
+from ..models.utils import get_embeddings
+from ..sec.sec import download_filings
+
+
+def ingest(symbol, filing_type="10-K", num_years=3, save_to_txt_files=False, progress=None):
+    """
+    Download the filings of a symbol, and parse, embed and index the new or changed ones.
+
+    Args:
+        symbol (str): ticker symbol
+        filing_type (str): type of filing
+        num_years (int): most recent fiscal years indexed
+        save_to_txt_files (bool): also save the extracted items as text files
+        progress (callable): called with the stage ("download", "parse", "embed", "index") and its detail
+
+    Returns:
+        K10_DB: the db of the symbol, up to date
+    """
+    progress = progress or (lambda stage, detail=None: None)
+    progress("download")
+    download_filings(symbol, filing_type, num_years=num_years)
+    db = K10_DB(get_persist_directory(symbol, filing_type),
+                symbol,
+                get_embeddings(),
+                save_to_txt_files=save_to_txt_files,
+                num_years=num_years,
+                progress=progress)
+    # only the filings new or changed since the db was built are indexed
+    db.refresh(save_to_txt_files)
+    return db
+
+
+def run_job(queue, job):
+    """
+    Run an ingestion job, recording its progress and outcome in the queue.
+    The lease of the job is renewed meanwhile, embedding a filing can take longer than the lease.
+    """
+    print(f"Ingesting {job['symbol']} {job['filing_type']} (job {job['id']})")
+    stopped = threading.Event()
+
+    def heartbeat():
+        while not stopped.wait(queue.lease_seconds / 3):
+            queue.heartbeat(job["id"])
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    try:
+        ingest(job["symbol"], job["filing_type"], job["num_years"],
+               progress=lambda stage, detail=None: queue.set_stage(job["id"], stage, detail))
+    except Exception as e:
+        print(f"Error ingesting {job['symbol']} (job {job['id']}): {str(e)}")
+        queue.fail(job["id"], e)
+        return
+    finally:
+        stopped.set()
+    queue.finish(job["id"])
+
+
+def run_worker(path=JOBS_PATH, poll_seconds=JOBS_POLL_SECONDS, max_jobs=None):
+    """
+    Run the jobs of the queue one after the other, polling it when empty. Stops after `max_jobs` jobs if given.
+    """
+    queue = JobQueue(path)
+    done = 0
+    while max_jobs is None or done < max_jobs:
+        job = queue.claim()
+        if job is None:
+            time.sleep(poll_seconds)
+            continue
+        run_job(queue, job)
+        done += 1
+
+
+class JobWorkers:
+    """
+    Pool of `num_workers` worker processes running the ingestion jobs, so parsing and embedding
+    never run in the API process. Jobs left running by a stopped worker are run again once their lease expires,
+    the jobs of workers still running (e.g. of another API process) are left to them.
+    """
+    def __init__(self, num_workers=JOBS_MAX_WORKERS, path=JOBS_PATH, poll_seconds=JOBS_POLL_SECONDS):
+        self.num_workers = num_workers
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self.processes = []
+
+
+    def start(self):
+        # spawned, the workers don't inherit the threads and connections of the API process
+        context = multiprocessing.get_context("spawn")
+        self.processes = [
+            context.Process(target=run_worker, args=(self.path, self.poll_seconds), daemon=True, name=f"ingestion-worker-{number}")
+            for number in range(self.num_workers)
+        ]
+        for process in self.processes:
+            process.start()
+
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        self.processes = []
+
+
+    def join(self):
+        for process in self.processes:
+            process.join()
+
+
+job_workers = JobWorkers()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the ingestion job workers.")
+    parser.add_argument("--workers", type=int, default=JOBS_MAX_WORKERS, help="worker processes")
+    args = parser.parse_args(argv)
+
+    workers = JobWorkers(args.workers)
+    workers.start()
+    try:
+        workers.join()
+    except KeyboardInterrupt:
+        workers.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import numpy as np
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.embeddings import Embeddings
+from ..config import (EMBEDDINGS_CACHE_PATH, EMBEDDINGS_CACHE_MAX_MB, EMBEDDINGS_BATCH_TOKENS,
+                      EMBEDDINGS_BATCH_SIZE, EMBEDDINGS_MAX_CONCURRENCY, EMBEDDINGS_MAX_RETRIES)
+
+# Fraction of the size budget kept after an eviction, so eviction doesn't run on every insert
+EVICTION_TARGET = 0.9
+
+# Tokenizer of the OpenAI embedding models, loaded on first use
+TOKENIZER_ENCODING = "cl100k_base"
+_tokenizer = None
+
+
+def count_tokens(text):
+    """
+    Returns the number of tokens of a text, estimated as 4 characters per token when tiktoken can't be loaded.
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        try:
+            import tiktoken
+            _tokenizer = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception:
+            # tiktoken downloads its encodings on first use, offline it is not available
+            _tokenizer = False
+    if _tokenizer:
+        return len(_tokenizer.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def get_embedding_model_name(embeddings):
+    """
+    Returns the name of the model of an embeddings instance, its class name if it has none.
+    """
+    model = getattr(embeddings, "model", None)
+    return model if isinstance(model, str) else type(embeddings).__name__
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper caching the vectors on disk, keyed by the SHA-256 of (model, text).
+
+    Vectors are stored as float32 blobs in SQLite, and the least recently used ones are evicted
+    when the cache grows over `max_bytes`. Re-embedding unchanged text costs a lookup.
+    """
+    def __init__(self, embeddings, path=EMBEDDINGS_CACHE_PATH, max_bytes=EMBEDDINGS_CACHE_MAX_MB * 1024 * 1024):
+        self.embeddings = embeddings
+        self.path = path
+        self.max_bytes = max_bytes
+        self.model = get_embedding_model_name(embeddings)
+        self.hits = 0
+        self.misses = 0
+
+
+    @contextmanager
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+            yield conn
+        finally:
+            conn.close()
+
+
+    def get_key(self, text):
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+
+    def _get_cached(self, conn, keys):
+        # {key: vector} of the keys in the cache, queried in batches under SQLite's variable limit
+        cached = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for start in range(0, len(unique_keys), 500):
+            batch = unique_keys[start:start + 500]
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({', '.join('?' * len(batch))})", batch
+            ).fetchall()
+            cached.update((key, np.frombuffer(vector, dtype=np.float32).tolist()) for key, vector in rows)
+        if cached:
+            now = time.time()
+            conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in cached])
+        return cached
+
+
+    def _evict(self, conn):
+        size = conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+        if size <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICTION_TARGET
+        evicted = []
+        for key, length in conn.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used"):
+            if size <= target:
+                break
+            evicted.append((key,))
+            size -= length
+        conn.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+
+
+    def embed_documents(self, texts):
+        keys = [self.get_key(text) for text in texts]
+        # no transaction is held during the embedding call, other processes share the cache
+        with self._connect() as conn:
+            cached = self._get_cached(conn, keys)
+            conn.commit()
+        # texts not cached, each embedded once even if repeated
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            now = time.time()
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                    [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in zip(missing, vectors)]
+                )
+                self._evict(conn)
+                conn.commit()
+            cached.update(zip(missing, vectors))
+        return [list(cached[key]) for key in keys]
+
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper packing the texts into batches of at most `batch_tokens` tokens (and `batch_size` texts),
+    embedded concurrently by `max_concurrency` threads with retries and exponential backoff.
+    The throughput of every batch is logged.
+    """
+    def __init__(self, embeddings, batch_tokens=EMBEDDINGS_BATCH_TOKENS, batch_size=EMBEDDINGS_BATCH_SIZE,
+                 max_concurrency=EMBEDDINGS_MAX_CONCURRENCY, max_retries=EMBEDDINGS_MAX_RETRIES, backoff=1.0):
+        self.embeddings = embeddings
+        self.batch_tokens = batch_tokens
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.model = get_embedding_model_name(embeddings)
+
+
+    def get_batches(self, texts):
+        """
+        Returns the batches of texts as (start index, texts, tokens), in order.
+        A text longer than `batch_tokens` gets a batch of its own.
+        """
+        batches = []
+        start, tokens = 0, 0
+        for index, text in enumerate(texts):
+            text_tokens = count_tokens(text)
+            if index > start and (tokens + text_tokens > self.batch_tokens or index - start >= self.batch_size):
+                batches.append((start, texts[start:index], tokens))
+                start, tokens = index, 0
+            tokens += text_tokens
+        if start < len(texts):
+            batches.append((start, texts[start:], tokens))
+        return batches
+
+
+    def _embed_batch(self, number, total, texts, tokens):
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                print(f"Embedding batch {number}/{total} failed ({str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            elapsed = time.perf_counter() - start
+            print(f"Embedded batch {number}/{total}: {len(texts)} texts, {tokens} tokens in {elapsed:.2f}s "
+                  f"({tokens / max(elapsed, 1e-6):.0f} tokens/s)")
+            return vectors
+
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        batches = self.get_batches(texts)
+        if not batches:
+            return []
+
+        vectors = [None] * len(texts)
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+            futures = [
+                (start, executor.submit(self._embed_batch, number, len(batches), batch, tokens))
+                for number, (start, batch, tokens) in enumerate(batches, start=1)
+            ]
+            for start, future in futures:
+                batch_vectors = future.result()
+                vectors[start:start + len(batch_vectors)] = batch_vectors
+        return vectors
+
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+
+class DeterministicEmbeddings(Embeddings):
+    """
+    Local embeddings for tests and benchmarks: the words of a text are hashed into `size` signed
+    buckets and the vector is normalized. The same text always gets the same vector, and texts
+    sharing words get close vectors, without any network call.
+    """
+    def __init__(self, size=256):
+        self.size = size
+        self.model = f"deterministic-{size}"
+
+
+    def _embed(self, text):
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = int(hashlib.md5(word.encode("utf-8")).hexdigest()[:8], 16)
+            vector[digest % self.size] += 1.0 if digest & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+
+    def embed_query(self, text):
+        return self._embed(text)
@@ -1,7 +1,10 @@
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from .embeddings import CachedEmbeddings, BatchedEmbeddings, get_embedding_model_name
 
 def get_embeddings():
-    return OpenAIEmbeddings()
+    # vectors of text already embedded are served from the on-disk cache,
+    # the others are embedded in concurrent token-sized batches
+    return CachedEmbeddings(BatchedEmbeddings(OpenAIEmbeddings()))
 
 def get_llm():
     return ChatOpenAI(temperature=0)
\ No newline at end of file
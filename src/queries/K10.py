@@ -1,8 +1,12 @@
-from langchain_core.structured_query import Comparator
+from langchain_core.structured_query import Comparator, Comparison, Operation, Operator, StructuredQuery
 from langchain.chains.query_constructor.base import StructuredQueryOutputParser, get_query_constructor_prompt
 # from sec.K10 import RELEVANT_ITEMS
 document_content_description = "Yearly financial reports of the company"
 
+# Version of the queries and of the answer prompt, cached results of other versions are not used (see queries/cache.py).
+# Bump it when a query text, a filter or the prompt of the retriever chain changes.
+PROMPT_VERSION = 3
+
 # Define allowed comparators list
 allowed_comparators = [
         Comparator.EQ,
@@ -40,6 +44,12 @@ examples = [
     ),
 ]
 
+# Items the analyses are based on, and the ones about risks
+ANALYSIS_ITEMS = ["Item 1", "Item 1A", "Item 7", "Item 7A", "Item 8"]
+RISK_ITEMS = ["Item 1A", "Item 7A"]
+# Items stored in the db, the keys of RELEVANT_ITEMS in sec/K10.py
+ALL_ITEMS = ANALYSIS_ITEMS + ["Item 9"]
+
 def get_query_constructor(metadata_field_info):
     # Create constructor prompt
     constructor_prompt = get_query_constructor_prompt(
@@ -57,7 +67,11 @@ class K10Query:
         self.available_years = available_years if available_years else []
         self.latest_year = available_years[-1] if available_years else ""
         self.queries = {}
+        self.filters = {}
+        self.item_counts = {}
+        self.search_queries = {}
         self._init_queries()
+        self._init_filters()
 
 
     def _init_queries(self):
@@ -70,6 +84,47 @@ class K10Query:
         }
 
 
+    def _init_filters(self):
+        # Filters of the documents each query is about, so the retriever doesn't ask the LLM for them.
+        # Without available years the queries are left to the LLM query constructor.
+        if not self.available_years:
+            self.filters = {}
+            self.item_counts = {}
+            self.search_queries = {}
+            return
+        latest_year = Comparison(comparator=Comparator.EQ, attribute="year", value=self.latest_year)
+        analysis_items = Operation(operator=Operator.AND, arguments=[
+            latest_year,
+            Comparison(comparator=Comparator.IN, attribute="type", value=ANALYSIS_ITEMS),
+        ])
+        self.filters = {
+            "Overview": latest_year,
+            "Business and Risk": analysis_items,
+            "Strategic Outlook and Future Projections": analysis_items,
+            "Risk Factors Years": Operation(operator=Operator.AND, arguments=[
+                Comparison(comparator=Comparator.IN, attribute="year", value=list(self.available_years)),
+                Comparison(comparator=Comparator.IN, attribute="type", value=RISK_ITEMS),
+            ]),
+            "SWOT": analysis_items,
+        }
+        # text searched (by the vector and the lexical search) for each query, the prompt only goes to the LLM
+        self.search_queries = {
+            "Overview": "business overview strengths opportunities challenges threats outlook",
+            "Business and Risk": "core business operations financial results key metrics risk factors market risk mitigation",
+            "Strategic Outlook and Future Projections": "competitive position market opportunities strategy growth outlook financial trends",
+            "Risk Factors Years": "risk factors market risk exposure new and changed risks",
+            "SWOT": "strengths weaknesses opportunities threats competition risks",
+        }
+        # number of items (of a year) each filter selects, the chunks retrieved by a query are sized by it
+        self.item_counts = {
+            "Overview": len(ALL_ITEMS),
+            "Business and Risk": len(ANALYSIS_ITEMS),
+            "Strategic Outlook and Future Projections": len(ANALYSIS_ITEMS),
+            "Risk Factors Years": len(self.available_years) * len(RISK_ITEMS),
+            "SWOT": len(ANALYSIS_ITEMS),
+        }
+
+
     def _get_overview_query(self):
         return f"""
 Based on the comprehensive review of all items of the latest year {self.latest_year} of 10-K filing of {self.symbol}, identify and analyze three positive and three negative aspects regarding the company's prospects.
@@ -170,3 +225,24 @@ Provide a structured analysis how risks have changed and what impacts they have
 
     def get_all_queries(self):
         return self.queries
+
+
+    def get_filter(self, key):
+        """
+        Returns the filter of the documents of a query, None if it is left to the LLM query constructor.
+        """
+        if key not in self.queries:
+            raise AttributeError(f"Key {key} not found")
+        return self.filters.get(key)
+
+
+    def get_structured_queries(self, chunks_per_item=4):
+        """
+        Returns the structured query of each query having a filter, by query text.
+        Each one searches the short text of its key and retrieves `chunks_per_item` chunks for each item its filter selects.
+        """
+        return {
+            self.queries[key]: StructuredQuery(query=self.search_queries[key], filter=query_filter,
+                                               limit=chunks_per_item * self.item_counts[key])
+            for key, query_filter in self.filters.items()
+        }
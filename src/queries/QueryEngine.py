@@ -1,15 +1,29 @@
 import os
+import time
+import asyncio
+from datetime import datetime
 # from queries import get_query
+from .K10 import K10Query, PROMPT_VERSION
+from .cache import result_cache
+from ..sec.sec import get_recent_folders
+from ..config import (SOURCE_SEC_DIRECTORY, MODEL_OPENAI, CHUNKS_PER_ITEM, RETRIEVER_TOP_K, HYBRID_SEARCH, RESULTS_CACHE_ENABLED,
+                      JOBS_ENABLED, JOBS_REFRESH_SECONDS)
+from ..db.K10 import K10_DB, get_persist_directory, get_manifest_directory
+from ..db.pool import db_pool
+from ..db.manifest import get_fingerprint, read_manifest
+from ..jobs.worker import ingest
 from ..models.utils import get_embeddings
-from .K10 import K10Query
-from ..sec.sec import get_recent_folders, download_filings
-from ..config import DB_PERSIST_DIRECTORY, SOURCE_SEC_DIRECTORY
-from ..db.K10 import K10_DB
 
 FILING_TYPE_10K = "10-K"
 
 class QueryEngine:
     def __init__(self, symbol, type=FILING_TYPE_10K, key=None, save_to_txt_files=True, num_years=3):
+        self._init_params(symbol, type, key, save_to_txt_files, num_years)
+        self._init_db()
+        self._init_query()
+
+
+    def _init_params(self, symbol, type, key, save_to_txt_files, num_years):
         self.symbol = symbol
         self.type = type
         self.key = key
@@ -17,28 +31,108 @@ class QueryEngine:
         self.num_years = num_years
         self.available_years = []
         self.available_docs = []
+        self.manifest = None
         self.retriever = None
         self.queryInstance = None
-        self._init_db()
-        self._init_query()
+
+
+    @staticmethod
+    def _read_manifest(symbol, type):
+        return read_manifest(get_manifest_directory(get_persist_directory(symbol, type), symbol))
+
+
+    @staticmethod
+    def _covers(manifest, num_years):
+        # the db was refreshed for at least `num_years` years; manifests written before num_years was recorded count their years
+        if manifest is None:
+            return False
+        return (manifest.get("num_years") or len(manifest["years"])) >= num_years
+
+
+    @staticmethod
+    def is_ready(symbol, type=FILING_TYPE_10K, num_years=3):
+        """
+        Returns whether the db of a symbol holds the most recent `num_years` filings, so an engine can be created for it.
+        """
+        return QueryEngine._covers(QueryEngine._read_manifest(symbol, type), num_years)
+
+
+    @staticmethod
+    def is_stale(symbol, type=FILING_TYPE_10K):
+        """
+        Returns whether the db of a symbol was last refreshed more than JOBS_REFRESH_SECONDS ago, and may miss new filings.
+        """
+        manifest = QueryEngine._read_manifest(symbol, type)
+        if manifest is None:
+            return False
+        return time.time() - datetime.fromisoformat(manifest["built_at"]).timestamp() > JOBS_REFRESH_SECONDS
+
+
+    @classmethod
+    async def acreate(cls, symbol, type=FILING_TYPE_10K, key=None, save_to_txt_files=True, num_years=3):
+        """
+        Async constructor: the db is opened (or, without job workers, the filings ingested) in a worker thread,
+        so the event loop keeps serving other requests meanwhile.
+        """
+        engine = cls.__new__(cls)
+        engine._init_params(symbol, type, key, save_to_txt_files, num_years)
+        await asyncio.to_thread(engine._init_db)
+        engine._init_query()
+        return engine
 
 
     def _init_db(self):
-        download_filings(self.symbol, self.type)
-        self.persist_directory = f"{DB_PERSIST_DIRECTORY}/{self.symbol}/{self.type}_items_1_1a_7_7a_8"
-        self.embeddings = get_embeddings()
-        if self.type == FILING_TYPE_10K:
-            self.db = K10_DB(self.persist_directory,
-                             self.symbol,
-                             self.embeddings,
-                             save_to_txt_files=self.save_to_txt_files,
-                             num_years=self.num_years)
-
-            self.available_docs = self.db.get_available_documents()
-            self.available_years = self.db.get_available_years()
-            self.retriever = self.db.get_retriever_chain(self.available_years)
-        else:
+        if self.type != FILING_TYPE_10K:
             raise ValueError(f"Invalid type: {self.type}")
+        manifest = self._read_manifest(self.symbol, self.type)
+        if not self._covers(manifest, self.num_years):
+            if JOBS_ENABLED:
+                # the filings are ingested by the job workers, the API queues the job (see api/routers/queries.py)
+                raise ValueError(f"The {self.type} filings of {self.symbol} have not been ingested yet")
+            # without job workers the engine ingests the filings itself
+            manifest = ingest(self.symbol, self.type, self.num_years, self.save_to_txt_files).manifest
+
+        # dbs are shared by the engines of the same symbol, whatever their number of years, see db/pool.py
+        key = (self.symbol, self.type)
+        entry = db_pool.get(key, self._open_db)
+        if entry["fingerprint"] != get_fingerprint(manifest):
+            # the db was refreshed since it was opened, e.g. by another engine or an ingestion worker
+            db_pool.invalidate(key)
+            entry = db_pool.get(key, self._open_db)
+        self.db = entry["db"]
+        self.persist_directory = self.db.persist_directory
+        self.embeddings = self.db.embeddings
+        # served by the manifest of the collection, without opening it
+        self.manifest = self.db.manifest
+        # the db keeps every year indexed, the engine only queries the most recent `num_years`
+        self.available_years = self.db.get_available_years()[-self.num_years:]
+        self.available_docs = [doc for doc in entry["available_docs"] if doc["year"] in self.available_years]
+        self.retriever = self._get_retriever(entry)
+
+
+    def _open_db(self):
+        # opens the db as indexed, the ingestion jobs refresh it
+        db = K10_DB(get_persist_directory(self.symbol, self.type),
+                    self.symbol,
+                    get_embeddings(),
+                    save_to_txt_files=self.save_to_txt_files,
+                    num_years=self.num_years)
+        return {
+            "db": db,
+            "fingerprint": get_fingerprint(db.manifest),
+            "available_docs": db.get_available_documents(),
+            # retriever chains by years, built on first use
+            "retrievers": {},
+        }
+
+
+    def _get_retriever(self, entry):
+        years = tuple(self.available_years)
+        if years not in entry["retrievers"]:
+            # the standard analyses come with their filters, only free-form questions go through the LLM query constructor
+            entry["retrievers"][years] = entry["db"].get_retriever_chain(
+                list(years), K10Query(self.symbol, list(years)).get_structured_queries(CHUNKS_PER_ITEM))
+        return entry["retrievers"][years]
 
 
     def _init_query(self):
@@ -55,20 +149,86 @@ class QueryEngine:
             return False
 
 
+    def _get_query_text(self):
+        # Returns the text of the query of the key, checking it can be run
+        if not self._check_valid_key(self.key):
+            raise ValueError("Invalid query key")
+        if not (self.retriever and self.available_docs):
+            raise ValueError("retriever, or available docs not found")
+        if self.type != FILING_TYPE_10K:
+            raise ValueError(f"query() not implemented for type: {self.type}")
+        return self.queryInstance.get_query(self.key)
+
+
     def query(self):
-        res = None
-        if self._check_valid_key(self.key):
-            if self.retriever and self.available_docs:
-                if self.type == FILING_TYPE_10K:
-                    query = self.queryInstance.get_query(self.key)
-                    res = self.retriever.invoke(query)
+        query = self._get_query_text()
+        cache_key = self.get_cache_key(query) if RESULTS_CACHE_ENABLED else None
+        res = result_cache.get(cache_key) if cache_key else None
+        if res is None:
+            res = self.retriever.invoke(query)
+            if cache_key and res:
+                result_cache.set(cache_key, res)
+        return res
+
+
+    async def aquery(self):
+        """
+        Async query(): the retriever chain runs with ainvoke, and the result cache is read and written in a worker thread.
+        """
+        query = self._get_query_text()
+        cache_key = self.get_cache_key(query) if RESULTS_CACHE_ENABLED else None
+        res = await asyncio.to_thread(result_cache.get, cache_key) if cache_key else None
+        if res is None:
+            res = await self.retriever.ainvoke(query)
+            if cache_key and res:
+                await asyncio.to_thread(result_cache.set, cache_key, res)
+        return res
+
+
+    async def astream_query(self):
+        """
+        Streams the result of the query as (event, value) pairs: ("context", documents) as soon as they are retrieved,
+        ("token", text) for each token of the answer, then ("complete", result) with the same result as query().
+        """
+        query = self._get_query_text()
+        cache_key = self.get_cache_key(query) if RESULTS_CACHE_ENABLED else None
+        res = await asyncio.to_thread(result_cache.get, cache_key) if cache_key else None
+        if res is not None:
+            yield "context", res.get("context", [])
+            yield "token", res.get("answer", "")
+            yield "complete", res
+            return
+
+        # the chain streams its outputs by key: the context and the question first, then the answer token by token
+        res = {}
+        async for chunk in self.retriever.astream(query):
+            for name, value in chunk.items():
+                if name == "answer":
+                    res["answer"] = res.get("answer", "") + value
+                    yield "token", value
                 else:
-                    raise ValueError(f"query() not implemented for type: {self.type}")
-                return res
-            else:
-                raise ValueError("retriever, or available docs not found")
-        else:
-            raise ValueError("Invalid query key")
+                    res[name] = value
+                    if name == "context":
+                        yield "context", value
+        if cache_key and res:
+            await asyncio.to_thread(result_cache.set, cache_key, res)
+        yield "complete", res
+
+
+    def get_cache_key(self, query):
+        """
+        Returns the key of the result of a query in the result cache, which changes with the content of the db.
+        """
+        return result_cache.get_key(
+            symbol=self.symbol,
+            type=self.type,
+            key=self.key,
+            query=query,
+            corpus=get_fingerprint(self.manifest),
+            model=MODEL_OPENAI,
+            prompt_version=PROMPT_VERSION,
+            retrieval={"chunks_per_item": CHUNKS_PER_ITEM, "top_k": RETRIEVER_TOP_K, "hybrid": HYBRID_SEARCH, "years": list(self.queryInstance.available_years)},
+        )
 
 
     def get_all_queries(self):
@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+from langchain_core.documents import Document
+from ..config import RESULTS_CACHE_PATH, RESULTS_CACHE_MAX_ENTRIES
+
+
+def _encode(value):
+    # Documents of the retrieved context are stored as tagged dicts
+    if isinstance(value, Document):
+        return {"__document__": {"id": value.id, "page_content": value.page_content, "metadata": value.metadata}}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode(value):
+    if "__document__" in value:
+        return Document(**value["__document__"])
+    return value
+
+
+class ResultCache:
+    """
+    Disk cache of the results of the queries, in SQLite.
+
+    Results are keyed by everything they depend on (symbol, filing type, query key and text, corpus fingerprint,
+    model, prompt version), so a change to the indexed content gives new keys and old results are never served.
+    The least recently used results are evicted when the cache holds more than `max_entries`.
+    """
+    def __init__(self, path=RESULTS_CACHE_PATH, max_entries=RESULTS_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+
+    @contextmanager
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_used ON results (last_used)")
+            yield conn
+        finally:
+            conn.close()
+
+
+    @staticmethod
+    def get_key(**parts):
+        """
+        Returns the key of a result, the SHA-256 of the parts it depends on.
+        """
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+    def get(self, key):
+        """
+        Returns the cached result of a key, None if missing.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+        self.hits += 1
+        return json.loads(row[0], object_hook=_decode)
+
+
+    def set(self, key, result):
+        value = json.dumps(result, default=_encode)
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO results (key, value, last_used) VALUES (?, ?, ?)", (key, value, time.time()))
+            conn.execute("""
+                DELETE FROM results WHERE key IN (
+                    SELECT key FROM results ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            conn.commit()
+
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results")
+            conn.commit()
+
+
+result_cache = ResultCache()
@@ -1,6 +1,12 @@
 import os
+import io
+import re
+import copy
+import mmap
 import unicodedata
-from bs4 import BeautifulSoup, Tag
+from bs4 import BeautifulSoup, Tag, NavigableString, CData
+from lxml import etree
+from .catalog import get_accession_year
 
 # https://www.sec.gov/files/reada10k.pdf
 # https://www.wallstreetprep.com/knowledge/10-k-filing/ 
@@ -14,38 +20,124 @@ RELEVANT_ITEMS = {
             "Item 9" : {"title_description": "Changes in and Disagreements with Accountants on Accounting"},
         }
 
+# Version of the extraction output, bump it whenever a change alters the extracted items
+# so the content-addressed item cache (sec/cache.py) stops serving stale entries
+PARSER_VERSION = 4
+
+# "bs4" builds the whole document tree, "lxml" streams the file with bounded memory
+PARSER_ENGINES = ("bs4", "lxml")
+
+# Text nodes collected by get_text(): comments, scripts and styles are skipped
+TEXT_NODE_TYPES = (NavigableString, CData)
+SKIPPED_TAGS = ("script", "style", "template")
+
+# Raw byte patterns used by the pre-scan
+TABLE_START_PATTERN = re.compile(rb'<table\b', re.IGNORECASE)
+TABLE_TAG_PATTERN = re.compile(rb'<(/?)table\b[^>]*>', re.IGNORECASE)
+DIV_TAG_PATTERN = re.compile(rb'<(/?)div\b[^>]*>', re.IGNORECASE)
+
 class K10:
-    def __init__(self, symbol, file_path):
+    def __init__(self, symbol, file_path, engine="bs4", prescan=False, year=None):
+        if engine not in PARSER_ENGINES:
+            raise ValueError(f"Invalid parser engine: {engine}, expected one of {PARSER_ENGINES}")
+
         self.symbol = symbol
         self.file_path = file_path
-        self.year = None
+        self.engine = engine
+        self.prescan = prescan
+        # fiscal year of the filing, from the filings catalog; the filing year of its accession number otherwise
+        self.year = str(year) if year else None
         self.soup = None
         self.summary_table = None
 
-        self.relevant_items = RELEVANT_ITEMS
+        self.relevant_items = copy.deepcopy(RELEVANT_ITEMS)
 
         self._load_html()
 
 
     # Load HTML content from the specified file path
     def _load_html(self):
-        with open(self.file_path, 'r', encoding='utf-8') as file:
-            html_content = file.read()
+        if self.year is None:
+            self.year = str(get_accession_year(self.file_path.split('/')[-2]))
+
+        # the lxml engine and the pre-scan read the file when extracting, nothing is kept in memory here
+        if self.engine == "bs4" and not self.prescan:
+            with open(self.file_path, 'r', encoding='utf-8') as file:
+                html_content = file.read()
+            self.soup = BeautifulSoup(html_content, 'html.parser')
+
+
+    def _iterparse(self, events, source=None):
+        source = source if source is not None else self.file_path
+        return etree.iterparse(source, events=events, html=True, encoding="utf-8", huge_tree=True)
+
+
+    def _free_element(self, elem):
+        # Drop an element already consumed, together with its consumed previous siblings
+        elem.clear(keep_tail=True)
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
 
-        folder = self.file_path.split('/')[-2]
-        self.year = "20" + folder.split('-')[1]
-        self.soup = BeautifulSoup(html_content, 'html.parser')
 
+    def _iter_element_strings(self, elem):
+        # lxml counterpart of get_text(): comments, scripts and styles are skipped
+        if isinstance(elem.tag, str) and elem.tag not in SKIPPED_TAGS:
+            if elem.text:
+                yield elem.text
+            for child in elem:
+                yield from self._iter_element_strings(child)
+                if child.tail:
+                    yield child.tail
 
-    def _get_summary_table(self):
-        tables = self.soup.find_all('table')
-        for table in tables:
-            rows = table.find_all('tr')
-            for row in rows:
-                cells = row.find_all(['td', 'th'])
-                cell_text = ' '.join(cell.get_text(strip=True) for cell in cells)
+
+    def _get_soup_table_rows(self, table):
+        rows = []
+        for row in table.find_all('tr'):
+            cells = row.find_all(['td', 'th'])
+            cell_text = ' '.join(cell.get_text(strip=True) for cell in cells)
+            link = row.find('a')
+            rows.append((cell_text, link.get('href') if link else None))
+        return rows
+
+
+    def _get_lxml_table_rows(self, table):
+        rows = []
+        for row in table.iter('tr'):
+            cells = row.iter('td', 'th')
+            cell_text = ' '.join("".join(s.strip() for s in self._iter_element_strings(cell)) for cell in cells)
+            link = next(row.iter('a'), None)
+            rows.append((cell_text, link.get('href') if link is not None else None))
+        return rows
+
+
+    def _iter_lxml_tables(self):
+        # Stream the file and yield the rows of each outermost table, freeing everything already seen
+        table_depth = 0
+        for event, elem in self._iterparse(("start", "end")):
+            if elem.tag == "table":
+                if event == "start":
+                    table_depth += 1
+                    continue
+                table_depth -= 1
+                if table_depth == 0:
+                    yield self._get_lxml_table_rows(elem)
+            if event == "end" and table_depth == 0:
+                self._free_element(elem)
+
+
+    def _get_summary_table(self, data=None):
+        """Find the table of contents, kept as a list of (cell_text, href) rows."""
+        if data is not None:
+            tables = self._iter_prescan_tables(data)
+        elif self.engine == "lxml":
+            tables = self._iter_lxml_tables()
+        else:
+            tables = (self._get_soup_table_rows(table) for table in self.soup.find_all('table'))
+
+        for rows in tables:
+            for cell_text, _ in rows:
                 if 'Item 1' in cell_text and 'Business' in cell_text:
-                    self.summary_table = table
+                    self.summary_table = rows
                     break
 
     def _get_hrefs(self, item_key, title_description):
@@ -53,84 +145,346 @@ class K10:
         hrefs = {}
         if self.summary_table:
             # Scan through all rows in summary table
-            rows = self.summary_table.find_all('tr')
-            for row in rows:
-                # Get all cells in row
-                cells = row.find_all(['td', 'th'])
-                cell_text = ' '.join(cell.get_text(strip=True).lower() for cell in cells)
-                
-                # Check each relevant item
-                # for item_key in self.relevant_items.keys():
+            for index, (cell_text, href) in enumerate(self.summary_table):
+                cell_text = cell_text.lower()
+
                 if item_key.lower() in cell_text and title_description.lower() in cell_text:
-                    # Find href in this row
-                    link = row.find('a')
-                    if link and link.get('href'):
-                        hrefs["begin"] = link.get('href')
-                        # Get next row
-                        next_row = row.find_next_sibling('tr')
-                        if next_row:
-                            next_link = next_row.find('a')
-                            if next_link and next_link.get('href'):
-                                hrefs["end"] = next_link.get('href')
-
-                        # Find next row
-                        #return link.get('href')
+                    # href in this row
+                    if href:
+                        hrefs["begin"] = href
+                        # href in next row
+                        if index + 1 < len(self.summary_table):
+                            next_href = self.summary_table[index + 1][1]
+                            if next_href:
+                                hrefs["end"] = next_href
         return hrefs
 
 
+    def _open_raw(self):
+        # Memory-map the raw file, pages are only read when the pre-scan touches them
+        with open(self.file_path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+    def _iter_fragment_events(self, fragment):
+        # Events of a raw byte slice, parsed with the selected engine
+        if self.engine == "lxml":
+            return self._iter_lxml_events(io.BytesIO(fragment))
+        return self._iter_soup_events(BeautifulSoup(fragment.decode('utf-8', errors='replace'), 'html.parser'))
+
+
+    def _find_table_end(self, data, start):
+        # Byte offset after the closing tag of the table starting at `start`, None if it is never closed
+        depth = 0
+        for match in TABLE_TAG_PATTERN.finditer(data, start):
+            depth = depth - 1 if match.group(1) else depth + 1
+            if not depth:
+                return match.end()
+        return None
+
+
+    def _iter_prescan_tables(self, data):
+        """Yield the rows of the raw tables that may be the table of contents.
+
+        Only tables whose bytes mention "Business" are parsed, everything else is skipped unparsed.
+        A table runs up to its own closing tag, past the tables nested in it.
+        """
+        pos = 0
+        while True:
+            start = TABLE_START_PATTERN.search(data, pos)
+            if not start:
+                return
+            end = self._find_table_end(data, start.start())
+            if end is None:
+                return
+            pos = end
+            if data.find(b'Business', start.end(), end) == -1:
+                continue
+
+            fragment = data[start.start():end]
+            if self.engine == "lxml":
+                root = etree.fromstring(fragment, etree.HTMLParser(encoding="utf-8"))
+                table = root.find('.//table') if root is not None else None
+                if table is not None:
+                    yield self._get_lxml_table_rows(table)
+            else:
+                table = BeautifulSoup(fragment.decode('utf-8', errors='replace'), 'html.parser').find('table')
+                if table:
+                    yield self._get_soup_table_rows(table)
+
+
+    def _find_anchor_offsets(self, data, anchor_ids):
+        """Find the byte offset of the tag carrying each anchor id, scanning the raw bytes once."""
+        alternatives = b"|".join(re.escape(anchor_id.encode('utf-8')) for anchor_id in anchor_ids)
+        pattern = re.compile(rb'(?<![\w-])id\s*=\s*["\']?(' + alternatives + rb')(?=["\'\s/>])')
+        offsets = {}
+        for match in pattern.finditer(data):
+            anchor_id = match.group(1).decode('utf-8')
+            if anchor_id not in offsets:
+                offsets[anchor_id] = data.rfind(b'<', 0, match.start())
+                if len(offsets) == len(anchor_ids):
+                    break
+        return offsets
+
+
+    def _find_segment_end(self, data, start, anchor_end):
+        """Find the byte offset where the segment starting at `start` can be cut.
+
+        Text belongs to the segment in which its div started, so the divs opened in the segment
+        and still open at the next anchor (`anchor_end`) are followed up to their closing tag.
+        """
+        depth = 0
+        for match in DIV_TAG_PATTERN.finditer(data, start, anchor_end):
+            # closing tags of divs opened before the segment are not counted
+            depth = max(depth - 1, 0) if match.group(1) else depth + 1
+        if not depth:
+            return anchor_end
+        for match in DIV_TAG_PATTERN.finditer(data, anchor_end):
+            depth = depth - 1 if match.group(1) else depth + 1
+            if not depth:
+                return match.end()
+        return len(data)
+
+
+    def _prescan_segments(self, data, anchor_ids, item_anchors):
+        """Build the segments of _segment_document parsing only the byte ranges of the items.
+
+        Each range runs from the tag of an anchor to the next anchor, or to the end of the divs
+        still open there, see _find_segment_end.
+
+        Args:
+            data: raw bytes (or mmap) of the document
+            anchor_ids (set): ids of the anchors referenced by the summary table
+            item_anchors (list): (begin_id, end_id) of each item
+
+        Returns:
+            (list, dict): anchor ids in document order, and the text blocks of each segment
+        """
+        offsets = self._find_anchor_offsets(data, anchor_ids)
+        order = sorted(offsets, key=offsets.get)
+        segments = {anchor_id: [] for anchor_id in order}
+
+        # Segments covered by at least one item, the rest of the document is never parsed
+        needed = set()
+        for begin_id, end_id in item_anchors:
+            if begin_id in segments and end_id in segments:
+                begin = order.index(begin_id)
+                end = order.index(end_id)
+                needed.update(order[begin:end] if end > begin else order[begin:])
+
+        for index, anchor_id in enumerate(order):
+            if anchor_id not in needed:
+                continue
+            start = offsets[anchor_id]
+            end = self._find_segment_end(data, start, offsets[order[index + 1]]) if index + 1 < len(order) else len(data)
+            # the slice may run past the next anchors, their text is left to their own segments
+            events = self._iter_fragment_events(data[start:end])
+            _, fragment_segments = self._segment_document(events, anchor_ids)
+            segments[anchor_id] = fragment_segments.get(anchor_id, [])
+
+        return order, segments
+
+
     def _normalize_text(self, text):
         return unicodedata.normalize('NFKD', text)
 
 
+    def _get_anchor_id(self, href):
+        # "#i1234" -> "i1234", "primary.htm#i1234" -> "i1234"
+        return href.split("#")[-1]
+
+
+    def _iter_soup_events(self, soup=None):
+        """Walk the parsed document once, in document order.
+
+        Yields the events consumed by _segment_document:
+            ("anchor", id)          an element carrying an id attribute
+            ("div", key)            a div element starts
+            ("text", key, string)   a text node, key is its nearest enclosing div (None if outside any div)
+        """
+        soup = soup if soup is not None else self.soup
+        for node in soup.descendants:
+            if isinstance(node, Tag):
+                anchor_id = node.get("id")
+                if anchor_id:
+                    yield ("anchor", anchor_id)
+                if node.name == "div":
+                    yield ("div", id(node))
+            elif type(node) in TEXT_NODE_TYPES:
+                parent = node.parent
+                while parent is not None and parent.name != "div":
+                    parent = parent.parent
+                yield ("text", id(parent) if parent is not None else None, node)
+
+
+    def _iter_lxml_events(self, source=None):
+        """Stream the document with lxml and yield the same events as _iter_soup_events.
+
+        Text is read once its position is settled: the text before a node when the node
+        starts (previous sibling tail or parent text), the text closing an element when it
+        ends (last child tail or its own text). Every element is freed once it has ended,
+        so memory stays bounded by the depth of the document rather than its size.
+        """
+        div_stack = []
+        div_count = 0
+        skip_depth = 0
+        for event, elem in self._iterparse(("start", "end", "comment", "pi"), source):
+            if event == "end":
+                last = elem[-1] if len(elem) else None
+                text = last.tail if last is not None else elem.text
+                if text and not skip_depth:
+                    yield ("text", div_stack[-1] if div_stack else None, text)
+                if elem.tag == "div":
+                    div_stack.pop()
+                elif elem.tag in SKIPPED_TAGS:
+                    skip_depth -= 1
+                self._free_element(elem)
+                continue
+
+            prev = elem.getprevious()
+            if prev is not None:
+                text = prev.tail
+            else:
+                parent = elem.getparent()
+                text = parent.text if parent is not None else None
+            if text and not skip_depth:
+                yield ("text", div_stack[-1] if div_stack else None, text)
+
+            if event == "start":
+                anchor_id = elem.get("id")
+                if anchor_id:
+                    yield ("anchor", anchor_id)
+                if elem.tag == "div":
+                    div_count += 1
+                    div_stack.append(div_count)
+                    yield ("div", div_count)
+                elif elem.tag in SKIPPED_TAGS:
+                    skip_depth += 1
+
+
+    def _segment_document(self, events, anchor_ids):
+        """Cut the document at every table-of-contents anchor in a single pass.
+
+        Text is grouped into blocks of consecutive strings sharing the same nearest div, so
+        nested divs are no longer collected twice. A block belongs to the segment in which
+        its div started, which mirrors the old "divs after the begin anchor" walk.
+
+        Args:
+            events: iterable of events, see _iter_soup_events
+            anchor_ids (set): ids of the anchors referenced by the summary table
+
+        Returns:
+            (list, dict): anchor ids in document order, and the text blocks of each segment
+        """
+        order = []
+        segments = {}
+        div_segments = {}
+        current = None
+        block_div = None
+        block_parts = []
+
+        def flush():
+            segment = div_segments.get(block_div) if block_div is not None else None
+            if segment is not None:
+                text = "".join(block_parts)
+                if text and text.lower() != "table of contents" and not text.isdigit():
+                    segments[segment].append(text)
+
+        for event in events:
+            kind = event[0]
+            if kind == "anchor":
+                if event[1] in anchor_ids and event[1] not in segments:
+                    current = event[1]
+                    order.append(current)
+                    segments[current] = []
+            elif kind == "div":
+                div_segments[event[1]] = current
+            else:
+                # whitespace is dropped differently by each parser, so it never splits a block
+                text = event[2].strip()
+                if not text:
+                    continue
+                if event[1] != block_div:
+                    flush()
+                    block_div = event[1]
+                    block_parts = []
+                block_parts.append(text)
+        flush()
+
+        return order, segments
+
+
+    def _join_segments(self, order, segments, begin_id, end_id):
+        # Content of an item runs from its begin anchor up to its end anchor.
+        # Like the old next_element walk, an end anchor placed before the begin one runs to the end of the document.
+        begin = order.index(begin_id)
+        end = order.index(end_id)
+        if end <= begin:
+            end = len(order)
+        blocks = []
+        for anchor_id in order[begin:end]:
+            blocks.extend(segments[anchor_id])
+        return " ".join(blocks)
+
+
     def extract_item_contents(self, save_to_txt_files=True):
         """Extract contents of relevant items from the 10-K document.
 
         This method performs the following steps:
         1. Gets the summary table containing item references
         2. Extracts begin and end href links for each relevant item
-        3. Extracts text content between the href locations for each item
-        4. Optionally saves the extracted content to separate text files
+        3. Walks the document once, cutting it at every anchor of the summary table
+           (with prescan, only the byte ranges between the anchors of the items are parsed)
+        4. Joins the segments between the begin and end anchors of each item
+        5. Optionally saves the extracted content to separate text files
 
         Args:
             save_to_txt_files (bool): If True, saves extracted content to text files
 
         The extracted content for each item is stored in self.relevant_items dictionary.
-        If save_to_txt_files is True, content is saved to: /tmp/{item_key}_{year}.txt
+        If save_to_txt_files is True, content is saved to: /tmp/{symbol}_{item_key}_{year}.txt
         """
+        # Map the raw bytes when pre-scanning, only the item byte ranges get parsed
+        data = self._open_raw() if self.prescan else None
+
         # Initialize dictionary to store relevant items
-        self._get_summary_table()
+        self._get_summary_table(data)
 
         # Get begin and end hrefs for each item
+        anchor_ids = set()
         for item_key in self.relevant_items.keys():
-            self.relevant_items[item_key]["hrefs"] = self._get_hrefs(item_key, self.relevant_items[item_key]["title_description"])
+            hrefs = self._get_hrefs(item_key, self.relevant_items[item_key]["title_description"])
+            self.relevant_items[item_key]["hrefs"] = hrefs
             # adds year to each item
             self.relevant_items[item_key]["year"] = self.year
+            anchor_ids.update(self._get_anchor_id(href) for href in hrefs.values())
 
+        # Cut the whole document at the summary table anchors in a single pass
+        if not anchor_ids:
+            order, segments = [], {}
+        elif data is not None:
+            item_anchors = [(self._get_anchor_id(item["hrefs"]["begin"]), self._get_anchor_id(item["hrefs"]["end"]))
+                            for item in self.relevant_items.values()
+                            if "begin" in item["hrefs"] and "end" in item["hrefs"]]
+            order, segments = self._prescan_segments(data, anchor_ids, item_anchors)
+        else:
+            events = self._iter_lxml_events() if self.engine == "lxml" else self._iter_soup_events()
+            order, segments = self._segment_document(events, anchor_ids)
 
-        # Extract text content between hrefs for each item
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+        # Join the segments between begin and end anchors for each item
         for item_key, item_data in self.relevant_items.items():
-            if "hrefs" in item_data and "begin" in item_data["hrefs"] and "end" in item_data["hrefs"]:
-                # Find begin and end elements
-                begin_id = item_data["hrefs"]["begin"].replace("#", "")
-                end_id = item_data["hrefs"]["end"].replace("#", "")
-                
-                # Find begin element
-                begin_elem = self.soup.find(attrs={"id": begin_id})
-                end_elem = self.soup.find(attrs={"id": end_id})
-                
-                if begin_elem and end_elem:
-                    # Get all div elements between begin and end
-                    content = []
-                    current = begin_elem
-                    while current and current != end_elem:
-                        if isinstance(current, Tag) and current.name == 'div':
-                            text = current.get_text(strip=True)
-                            if text and text.lower() != "table of contents" and not text.strip().isdigit():
-                                content.append(current.get_text(strip=True))
-                        current = current.next_element
-                    
-                    # Store extracted content
-                    self.relevant_items[item_key]["content"] = self._normalize_text(" ".join(content))
+            hrefs = item_data["hrefs"]
+            if "begin" in hrefs and "end" in hrefs:
+                begin_id = self._get_anchor_id(hrefs["begin"])
+                end_id = self._get_anchor_id(hrefs["end"])
+                if begin_id in segments and end_id in segments:
+                    content = self._join_segments(order, segments, begin_id, end_id)
+                    self.relevant_items[item_key]["content"] = self._normalize_text(content)
                 else:
                     self.relevant_items[item_key]["content"] = ""
             else:
@@ -148,4 +502,3 @@ class K10:
                             f.write(item_data["content"])
 
         return self.relevant_items
-    
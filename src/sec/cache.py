@@ -0,0 +1,86 @@
+import os
+import glob
+import gzip
+import json
+import time
+import hashlib
+from .K10 import PARSER_VERSION
+from ..utils.files import atomic_write
+from ..config import EXTRACTED_DIRECTORY
+
+
+class ItemCache:
+    """
+    Content-addressed cache of the items extracted from 10-K primary documents.
+
+    Entries are keyed by the SHA-256 of the source document plus PARSER_VERSION, so a
+    filing is parsed once and re-parsed only when the document or the extraction changes.
+    Each entry is a gzip-compressed JSON file holding the items and some metadata:
+        {EXTRACTED_DIRECTORY}/{sha256[:2]}/{sha256}-v{PARSER_VERSION}.json.gz
+    """
+    def __init__(self, directory=EXTRACTED_DIRECTORY, parser_version=PARSER_VERSION):
+        self.directory = directory
+        self.parser_version = parser_version
+
+
+    @staticmethod
+    def get_document_hash(doc_path, chunk_size=1024 * 1024):
+        """
+        Returns the SHA-256 hex digest of a document, read in chunks.
+        """
+        digest = hashlib.sha256()
+        with open(doc_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+
+    def get_path(self, document_hash):
+        return os.path.join(self.directory, document_hash[:2], f"{document_hash}-v{self.parser_version}.json.gz")
+
+
+    def get(self, document_hash):
+        """
+        Returns the cached items of a document, None if missing or unreadable.
+        """
+        path = self.get_path(document_hash)
+        if not os.path.exists(path):
+            return None
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                return json.load(f)["items"]
+        except (OSError, EOFError, ValueError, KeyError) as e:
+            print(f"Ignoring corrupted cache entry {path}: {str(e)}")
+            return None
+
+
+    def put(self, document_hash, items, **metadata):
+        """
+        Stores the items of a document, with optional metadata (symbol, source path, ...).
+        The entry is written to a temporary file and then renamed, so readers never see partial entries.
+        """
+        path = self.get_path(document_hash)
+        entry = {
+            "sha256": document_hash,
+            "parser_version": self.parser_version,
+            "created": time.time(),
+            "metadata": metadata,
+            "items": items,
+        }
+        with atomic_write(path, 'wt', opener=gzip.open) as f:
+            json.dump(entry, f)
+        return path
+
+
+    def remove(self, document_hash):
+        """
+        Removes the cached items of a document, for every parser version.
+
+        Returns:
+            int: bytes freed
+        """
+        freed = 0
+        for path in glob.glob(os.path.join(self.directory, document_hash[:2], f"{document_hash}-v*.json.gz")):
+            freed += os.path.getsize(path)
+            os.remove(path)
+        return freed
@@ -0,0 +1,114 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from ..config import CATALOG_PATH
+
+CATALOG_COLUMNS = ("symbol", "cik", "form", "accession", "fiscal_year", "filing_date", "path", "size", "content_hash")
+
+
+class FilingsCatalog:
+    """
+    SQLite catalog of the filings on disk, kept up to date by the downloader.
+    "Latest N filings" of a symbol is an indexed lookup instead of a directory scan.
+    """
+    def __init__(self, path=CATALOG_PATH):
+        self.path = path
+
+
+    @contextmanager
+    def _connect(self, read_only=False):
+        """Context manager for catalog connections"""
+        if read_only:
+            # never creates the file, raises sqlite3.OperationalError if the catalog does not exist yet
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            self._init_schema(conn)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+    def _init_schema(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS filings (
+                symbol TEXT NOT NULL,
+                cik INTEGER,
+                form TEXT NOT NULL,
+                accession TEXT NOT NULL,
+                fiscal_year INTEGER,
+                filing_date TEXT,
+                path TEXT,
+                size INTEGER,
+                content_hash TEXT,
+                PRIMARY KEY (symbol, form, accession)
+            )
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_filings_recent
+            ON filings (symbol, form, fiscal_year DESC, filing_date DESC)
+        """)
+
+
+    def upsert(self, symbol, cik, form, accession, fiscal_year, filing_date, path, size, content_hash):
+        """Insert or update a filing"""
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO filings ({', '.join(CATALOG_COLUMNS)}) VALUES ({', '.join('?' * len(CATALOG_COLUMNS))})",
+                (symbol, cik, form, accession, fiscal_year, filing_date, path, size, content_hash)
+            )
+            conn.commit()
+
+
+    def remove(self, symbol, form, accession):
+        """Remove a filing"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM filings WHERE symbol = ? AND form = ? AND accession = ?", (symbol, form, accession))
+            conn.commit()
+
+
+    def get_recent(self, symbol, form="10-K", num_years=3):
+        """
+        Returns the most recent filings of a symbol as dicts, most recent first.
+        Returns an empty list if the catalog does not exist yet.
+        """
+        try:
+            with self._connect(read_only=True) as conn:
+                rows = conn.execute(
+                    "SELECT * FROM filings WHERE symbol = ? AND form = ? "
+                    "ORDER BY fiscal_year DESC, filing_date DESC LIMIT ?",
+                    (symbol, form, num_years)
+                ).fetchall()
+        except sqlite3.OperationalError:
+            return []
+        return [dict(row) for row in rows]
+
+
+    def get_all(self, symbol=None, form=None):
+        """
+        Returns all the filings, optionally of a symbol and form, most recent first.
+        """
+        query = "SELECT * FROM filings WHERE (? IS NULL OR symbol = ?) AND (? IS NULL OR form = ?) " \
+                "ORDER BY symbol, form, fiscal_year DESC, filing_date DESC"
+        try:
+            with self._connect(read_only=True) as conn:
+                rows = conn.execute(query, (symbol, symbol, form, form)).fetchall()
+        except sqlite3.OperationalError:
+            return []
+        return [dict(row) for row in rows]
+
+
+def get_accession_year(accession):
+    """
+    Returns the filing year encoded in an accession number, "0000320193-98-000105" -> 1998.
+    EDGAR accession numbers start in 1993, so years from 93 on are in the 1900s.
+    The fiscal year of the catalog is preferred, a late filing is filed the year after its fiscal year.
+    """
+    year = int(accession.split('-')[1])
+    return 1900 + year if year >= 93 else 2000 + year
+
+
+catalog = FilingsCatalog()
@@ -0,0 +1,146 @@
+"""
+Batch extraction of 10-K items for many symbols, fanned out over a process pool.
+
+The extracted items are written to the content-addressed item cache (sec/cache.py)
+that K10_DB reads before parsing a filing itself.
+
+Usage:
+    python -m src.sec.extract AAPL MSFT TROW --num-years 3 --workers 8
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .K10 import K10
+from .cache import ItemCache
+from .sec import get_recent_folders, adownload_filings, PRIMARY_DOCUMENT
+from ..config import SOURCE_SEC_DIRECTORY, EXTRACTED_DIRECTORY, PARSER_ENGINE, PARSER_PRESCAN
+
+
+def extract_filing(symbol, doc_path, save_to_txt_files=False, cache=None, document_hash=None, year=None):
+    """
+    Extract the relevant items of a single 10-K primary document.
+    Items are served from the content-addressed item cache when the document was already parsed.
+    The SHA-256 of the document is computed unless given. The items carry the fiscal year given (from the catalog),
+    the filing year of the accession number otherwise.
+
+    Returns:
+        (dict, bool): the items, and whether they came from the cache
+    """
+    cache = cache if cache is not None else ItemCache()
+    document_hash = document_hash or cache.get_document_hash(doc_path)
+    items = cache.get(document_hash)
+    if items is not None:
+        if year:
+            items = {item_key: {**item, "year": str(year)} for item_key, item in items.items()}
+        return items, True
+
+    extractor = K10(symbol, doc_path, engine=PARSER_ENGINE, prescan=PARSER_PRESCAN, year=year)
+    items = extractor.extract_item_contents(save_to_txt_files)
+    cache.put(document_hash, items, symbol=symbol, source_path=doc_path, size=os.path.getsize(doc_path))
+    return items, False
+
+
+def collect_filings(symbols, filing_type="10-K", num_years=3):
+    """
+    List the filings to extract for each symbol.
+
+    Returns:
+        (list, list): (symbol, accession, doc_path) tasks, and (symbol, error) for symbols without filings
+    """
+    tasks = []
+    failures = []
+    for symbol in symbols:
+        try:
+            for accession in get_recent_folders(symbol, filing_type, num_years=num_years):
+                doc_path = os.path.join(SOURCE_SEC_DIRECTORY, symbol, filing_type, accession, PRIMARY_DOCUMENT)
+                tasks.append((symbol, accession, doc_path))
+        except Exception as e:
+            failures.append((symbol, str(e)))
+    return tasks, failures
+
+
+def _extract_task(symbol, doc_path, cache_directory):
+    # Runs in a worker process: errors are returned, never raised, so one bad filing can't stop the batch
+    start = time.time()
+    try:
+        _, cached = extract_filing(symbol, doc_path, cache=ItemCache(cache_directory))
+        return None, cached, time.time() - start
+    except Exception as e:
+        return f"{type(e).__name__}: {e}", False, time.time() - start
+
+
+def run_batch(tasks, workers=None, cache_directory=EXTRACTED_DIRECTORY, progress=print):
+    """
+    Extract the given filings over a process pool into the shared item cache.
+
+    Args:
+        tasks (list): (symbol, accession, doc_path) tuples, see collect_filings
+        workers (int): number of worker processes, defaults to the number of CPUs
+        cache_directory (str): root of the item cache
+        progress (callable): called with a line of text for each completed filing
+
+    Returns:
+        dict: {"completed": [(symbol, accession)], "cached": [(symbol, accession)], "failed": [(symbol, accession, error)]}
+    """
+    results = {"completed": [], "cached": [], "failed": []}
+    if not tasks:
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_extract_task, symbol, doc_path, cache_directory): (symbol, accession)
+            for symbol, accession, doc_path in tasks
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            symbol, accession = futures[future]
+            try:
+                error, cached, elapsed = future.result()
+            except Exception as e:
+                # the worker process itself died
+                error, cached, elapsed = f"{type(e).__name__}: {e}", False, 0.0
+
+            if error:
+                results["failed"].append((symbol, accession, error))
+                progress(f"[{done}/{len(tasks)}] {symbol} {accession} failed: {error}")
+            elif cached:
+                results["cached"].append((symbol, accession))
+                progress(f"[{done}/{len(tasks)}] {symbol} {accession} cached ({elapsed:.2f}s)")
+            else:
+                results["completed"].append((symbol, accession))
+                progress(f"[{done}/{len(tasks)}] {symbol} {accession} ok ({elapsed:.2f}s)")
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract 10-K items for many symbols over a process pool.")
+    parser.add_argument("symbols", nargs="+", help="ticker symbols, e.g. AAPL MSFT")
+    parser.add_argument("--filing-type", default="10-K")
+    parser.add_argument("--num-years", type=int, default=3, help="number of most recent filings per symbol")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: number of CPUs)")
+    parser.add_argument("--cache-dir", default=EXTRACTED_DIRECTORY, help="root directory of the extracted items cache")
+    parser.add_argument("--download", action="store_true", help="download the filings before extracting them")
+    args = parser.parse_args(argv)
+
+    symbols = [symbol.upper() for symbol in args.symbols]
+    if args.download:
+        asyncio.run(adownload_filings(symbols, args.filing_type, num_years=args.num_years))
+
+    start = time.time()
+    tasks, failures = collect_filings(symbols, args.filing_type, args.num_years)
+    for symbol, error in failures:
+        print(f"{symbol} skipped: {error}")
+
+    print(f"Extracting {len(tasks)} filings for {len(symbols)} symbols")
+    results = run_batch(tasks, args.workers, args.cache_dir)
+
+    print(f"Done in {time.time() - start:.1f}s: {len(results['completed'])} extracted, "
+          f"{len(results['cached'])} cached, {len(results['failed'])} failed, {len(failures)} symbols skipped")
+    return 1 if results["failed"] or failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Retention of the downloaded filings.
+
+The filings of the most recent fiscal years of each symbol are kept, then the oldest filings left
+are evicted until the filings fit the disk budget (the most recent filing of a symbol is never evicted).
+Evicting a filing removes its folder, its extracted items (sec/cache.py), its XBRL facts (sec/xbrl.py),
+its manifest entry, its catalog row, and its chunks in the db of the symbol (db/K10.py). The full submissions of the kept filings are removed when
+their primary document is on disk.
+
+Only catalogued filings are pruned: a download records the filings on disk in the catalog.
+
+Usage:
+    python -m src.sec.prune --keep-years 3 --budget-mb 2000
+    python -m src.sec.prune AAPL MSFT --keep-years 2 --dry-run
+"""
+import os
+import sys
+import shutil
+import argparse
+from .cache import ItemCache
+from .catalog import catalog as filings_catalog
+from .sec import FilingsDownloader, PRIMARY_DOCUMENT, FULL_SUBMISSION
+from .xbrl import get_facts_path
+from ..db.K10 import remove_filings
+from ..config import SOURCE_SEC_DIRECTORY, XBRL_DIRECTORY, SEC_RETENTION_YEARS, SEC_DISK_BUDGET_MB
+
+
+def get_filing_sizes(folder):
+    """
+    Returns the bytes used by a filing folder, and the bytes of its full submission
+    that can be removed because the primary document is on disk.
+    """
+    total = 0
+    for root, _, files in os.walk(folder):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    removable = 0
+    full_submission = os.path.join(folder, FULL_SUBMISSION)
+    if os.path.exists(full_submission) and os.path.exists(os.path.join(folder, PRIMARY_DOCUMENT)):
+        removable = os.path.getsize(full_submission)
+    return total, removable
+
+
+def _evict(filing, folder, item_cache, xbrl_directory, catalog):
+    # Returns the bytes freed by removing a filing and its derived artifacts
+    freed = get_filing_sizes(folder)[0] if os.path.isdir(folder) else 0
+    shutil.rmtree(folder, ignore_errors=True)
+    if filing["content_hash"]:
+        freed += item_cache.remove(filing["content_hash"])
+    facts_path = get_facts_path(filing["symbol"], filing["accession"], filing["form"], xbrl_directory)
+    if os.path.exists(facts_path):
+        freed += os.path.getsize(facts_path)
+        os.remove(facts_path)
+    catalog.remove(filing["symbol"], filing["form"], filing["accession"])
+    return freed
+
+
+def prune(symbols=None, filing_type="10-K", keep_years=SEC_RETENTION_YEARS, disk_budget_mb=SEC_DISK_BUDGET_MB,
+          dry_run=False, base_directory=SOURCE_SEC_DIRECTORY, catalog=filings_catalog, item_cache=None,
+          xbrl_directory=XBRL_DIRECTORY):
+    """
+    Evict the filings outside the retention, and the oldest ones until the disk budget is met.
+
+    Args:
+        symbols (list): symbols to prune, all the catalogued ones if None
+        filing_type (str): filing type to prune
+        keep_years (int): most recent fiscal years kept per symbol
+        disk_budget_mb (float): disk budget of the kept filings in MB, no budget if None
+        dry_run (bool): only report what would be removed
+
+    Returns:
+        dict: {"evicted": [(symbol, accession)], "freed": bytes freed (or to be freed)}
+    """
+    item_cache = item_cache if item_cache is not None else ItemCache()
+    filings = catalog.get_all(form=filing_type)
+    if symbols is not None:
+        symbols = {symbol.upper() for symbol in symbols}
+        filings = [filing for filing in filings if filing["symbol"] in symbols]
+
+    # the catalog lists the filings of each symbol most recent first
+    kept, evicted = [], []
+    by_symbol = {}
+    for filing in filings:
+        by_symbol.setdefault(filing["symbol"], []).append(filing)
+    for symbol_filings in by_symbol.values():
+        kept.extend(symbol_filings[:keep_years])
+        evicted.extend(symbol_filings[keep_years:])
+
+    folders = {
+        (filing["symbol"], filing["accession"]): os.path.join(base_directory, filing["symbol"], filing_type, filing["accession"])
+        for filing in filings
+    }
+    sizes = {key: get_filing_sizes(folder) if os.path.isdir(folder) else (0, 0) for key, folder in folders.items()}
+
+    freed = 0
+    for filing in kept:
+        key = (filing["symbol"], filing["accession"])
+        removable = sizes[key][1]
+        if removable:
+            freed += removable
+            if not dry_run:
+                os.remove(os.path.join(folders[key], FULL_SUBMISSION))
+
+    if disk_budget_mb is not None:
+        budget = disk_budget_mb * 1024 * 1024
+        # bytes used by each kept filing once its full submission is removed
+        used = {key: total - removable for key, (total, removable) in sizes.items()}
+        total = sum(used[(filing["symbol"], filing["accession"])] for filing in kept)
+        newest = {symbol_filings[0]["accession"] for symbol_filings in by_symbol.values()}
+        candidates = sorted((filing for filing in kept if filing["accession"] not in newest),
+                            key=lambda filing: (filing["fiscal_year"] or 0, filing["filing_date"] or ""))
+        for filing in candidates:
+            if total <= budget:
+                break
+            key = (filing["symbol"], filing["accession"])
+            total -= used[key]
+            kept.remove(filing)
+            evicted.append(filing)
+
+    for filing in evicted:
+        key = (filing["symbol"], filing["accession"])
+        if dry_run:
+            freed += sizes[key][0]
+        else:
+            freed += _evict(filing, folders[key], item_cache, xbrl_directory, catalog)
+
+    if not dry_run:
+        # evicted filings leave the manifests, which now only cover the years kept,
+        # so a download asking for more years looks at the older filings again
+        downloader = FilingsDownloader(base_directory, catalog=catalog)
+        for symbol in {filing["symbol"] for filing in evicted}:
+            manifest = downloader.load_manifest(symbol, filing_type)
+            for filing in evicted:
+                if filing["symbol"] == symbol:
+                    manifest["filings"].pop(filing["accession"], None)
+            kept_years = sum(1 for filing in kept if filing["symbol"] == symbol)
+            if manifest.get("num_years") is None or manifest["num_years"] > kept_years:
+                manifest["num_years"] = kept_years
+            downloader.save_manifest(symbol, filing_type, manifest)
+            # the evicted filings are no longer retrieved, and their embeddings are freed
+            remove_filings(symbol, [filing["accession"] for filing in evicted if filing["symbol"] == symbol], filing_type)
+
+    return {"evicted": [(filing["symbol"], filing["accession"]) for filing in evicted], "freed": freed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evict old filings and their derived artifacts.")
+    parser.add_argument("symbols", nargs="*", help="ticker symbols, e.g. AAPL MSFT (default: all the catalogued ones)")
+    parser.add_argument("--filing-type", default="10-K")
+    parser.add_argument("--keep-years", type=int, default=SEC_RETENTION_YEARS, help="most recent fiscal years kept per symbol")
+    parser.add_argument("--budget-mb", type=float, default=SEC_DISK_BUDGET_MB, help="disk budget of the filings in MB")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be removed")
+    args = parser.parse_args(argv)
+
+    result = prune(args.symbols or None, args.filing_type, args.keep_years, args.budget_mb, args.dry_run)
+    for symbol, accession in result["evicted"]:
+        print(f"{'Would evict' if args.dry_run else 'Evicted'} {symbol} {accession}")
+    print(f"{len(result['evicted'])} filings evicted, {result['freed'] / (1024 * 1024):.1f} MB "
+          f"{'to be freed' if args.dry_run else 'freed'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,50 +1,353 @@
 import os
-from sec_edgar_downloader import Downloader
-from ..config import COMPANY_NAME, EMAIL, DATA_DIRECTORY, SOURCE_SEC_DIRECTORY
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from .cache import ItemCache
+from .catalog import catalog as filings_catalog, get_accession_year
+from .symbols import symbol_master
+from ..utils.files import atomic_write
+from ..config import (SEC_USER_AGENT, SOURCE_SEC_DIRECTORY, SEC_WWW_URL, SEC_DATA_URL,
+                      SEC_REQUESTS_PER_SECOND, SEC_MAX_CONCURRENT_TICKERS, SEC_PRIMARY_ONLY)
 
-dl = Downloader(COMPANY_NAME, EMAIL, DATA_DIRECTORY)
+USER_AGENT = SEC_USER_AGENT
 
+MANIFEST_FILE = "manifest.json"
+PRIMARY_DOCUMENT = "primary-document.html"
+FULL_SUBMISSION = "full-submission.txt"
 
-def download_filings(ticker, filing_type="10-K", download_details=True):
+# Responses retried with backoff
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 3
+
+
+class RateLimiter:
+    """
+    Spaces requests to at most `rate` per `period` seconds.
+    Slots are reserved under a thread lock, so one instance is shared by every event loop and thread of the process.
+    """
+    def __init__(self, rate, period=1.0):
+        self.interval = period / rate
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+            return slot - now
+
+    async def wait(self):
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+# Global limiter for all the requests to SEC (10 requests/second at most)
+sec_rate_limiter = RateLimiter(SEC_REQUESTS_PER_SECOND)
+
+
+class FilingsDownloader:
+    """
+    Concurrent, freshness-aware downloader of SEC filings.
+
+    Each {ticker}/{filing_type} directory holds a manifest with the accession numbers already on disk
+    and the validators (ETag, Last-Modified) of the company submissions: the submissions are fetched
+    conditionally, and only the filings missing from the manifest are downloaded.
+    Every filing on disk is also recorded in the filings catalog (sec/catalog.py).
+    """
+    def __init__(self, base_directory=SOURCE_SEC_DIRECTORY, www_url=SEC_WWW_URL, data_url=SEC_DATA_URL,
+                 rate_limiter=sec_rate_limiter, max_concurrent_tickers=SEC_MAX_CONCURRENT_TICKERS,
+                 catalog=filings_catalog, symbols=symbol_master):
+        self.base_directory = base_directory
+        self.www_url = www_url.rstrip('/')
+        self.data_url = data_url.rstrip('/')
+        self.rate_limiter = rate_limiter
+        self.max_concurrent_tickers = max_concurrent_tickers
+        self.catalog = catalog
+        self.symbols = symbols
+
+
+    def _get_directory(self, ticker, filing_type):
+        return os.path.join(self.base_directory, ticker, filing_type)
+
+
+    def load_manifest(self, ticker, filing_type="10-K"):
+        path = os.path.join(self._get_directory(ticker, filing_type), MANIFEST_FILE)
+        if not os.path.exists(path):
+            return {"filings": {}}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+    def save_manifest(self, ticker, filing_type, manifest):
+        path = os.path.join(self._get_directory(ticker, filing_type), MANIFEST_FILE)
+        with atomic_write(path) as f:
+            json.dump(manifest, f, indent=2)
+
+
+    async def _get(self, client, url, headers=None):
+        """
+        GET a SEC url through the global rate limiter, retrying throttled and failed responses.
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            await self.rate_limiter.wait()
+            response = await client.get(url, headers=headers)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == MAX_RETRIES:
+                break
+            await asyncio.sleep(2 ** attempt)
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+
+
+    async def get_cik(self, ticker):
+        if not self.symbols.is_loaded():
+            # first use: wait for the symbols to be read from disk, or downloaded
+            await asyncio.to_thread(self.symbols.load)
+        cik = self.symbols.get_cik(ticker)
+        if cik is None:
+            raise ValueError(f"Unknown ticker: {ticker}")
+        return cik
+
+
+    def _get_filings(self, submissions, filing_type):
+        # submissions "filings" columns -> {accession: {...}} for the given filing type
+        filings = {}
+        columns = submissions.get("filings", submissions)
+        recent = columns.get("recent", columns)
+        for index, form in enumerate(recent.get("form", [])):
+            if form == filing_type:
+                filings[recent["accessionNumber"][index]] = {
+                    "filing_date": recent["filingDate"][index],
+                    "report_date": recent["reportDate"][index],
+                    "primary_document": recent["primaryDocument"][index],
+                }
+        return filings
+
+
+    async def _download_file(self, client, url, path):
+        response = await self._get(client, url)
+        with atomic_write(path, 'wb') as f:
+            f.write(response.content)
+
+
+    def _get_recent_filings(self, filings, num_years):
+        # the filings of the `num_years` most recent fiscal years, all of them if num_years is None
+        if num_years is None:
+            return filings
+        recent = sorted(filings.items(), key=lambda item: (item[1]["report_date"], item[1]["filing_date"]), reverse=True)
+        return dict(recent[:num_years])
+
+
+    async def _download_filing(self, client, cik, ticker, filing_type, accession, filing, download_details, primary_only=False):
+        folder = os.path.join(self._get_directory(ticker, filing_type), accession)
+        archive_url = f"{self.www_url}/Archives/edgar/data/{cik}/{accession.replace('-', '')}"
+        downloads = []
+        # the full submission is only needed when there is no primary document
+        if not (download_details and primary_only):
+            downloads.append(self._download_file(client, f"{archive_url}/{accession}.txt", os.path.join(folder, FULL_SUBMISSION)))
+        if download_details:
+            downloads.append(self._download_file(client, f"{archive_url}/{filing['primary_document']}",
+                                                 os.path.join(folder, PRIMARY_DOCUMENT)))
+        await asyncio.gather(*downloads)
+
+
+    def _is_on_disk(self, ticker, filing_type, accession, download_details):
+        folder = os.path.join(self._get_directory(ticker, filing_type), accession)
+        document = PRIMARY_DOCUMENT if download_details else FULL_SUBMISSION
+        return os.path.exists(os.path.join(folder, document))
+
+
+    def _catalog_filing(self, cik, ticker, filing_type, accession, filing):
+        """
+        Record a filing on disk in the catalog, with the size and SHA-256 of its document
+        (the primary document if downloaded, the full submission otherwise).
+        """
+        folder = os.path.join(self._get_directory(ticker, filing_type), accession)
+        path = os.path.join(folder, PRIMARY_DOCUMENT)
+        if not os.path.exists(path):
+            path = os.path.join(folder, FULL_SUBMISSION)
+        if not os.path.exists(path):
+            return
+        # the fiscal year is the year of the period reported, "2023-09-30" -> 2023
+        period = filing.get("report_date") or filing.get("filing_date") or ""
+        fiscal_year = int(period[:4]) if period[:4].isdigit() else None
+        self.catalog.upsert(ticker, cik, filing_type, accession, fiscal_year, filing.get("filing_date"),
+                            path, os.path.getsize(path), ItemCache.get_document_hash(path))
+
+
+    async def download(self, client, ticker, filing_type="10-K", download_details=True, num_years=None, primary_only=False):
+        """
+        Download the filings of a ticker that are not on disk yet.
+
+        Args:
+            num_years (int): only download the filings of the most recent fiscal years, all of them if None
+            primary_only (bool): skip the full submission when the primary document is downloaded
+
+        Returns:
+            list: accession numbers downloaded
+        """
+        ticker = ticker.upper()
+        manifest = self.load_manifest(ticker, filing_type)
+        cik = manifest.get("cik") or await self.get_cik(ticker)
+        # years already synced, None for all of them (manifests written before retention was added)
+        synced_years = manifest.get("num_years")
+        covered = bool(manifest["filings"]) and (synced_years is None or (num_years is not None and num_years <= synced_years))
+
+        # filings downloaded before the catalog existed
+        if manifest["filings"] and not self.catalog.get_recent(ticker, filing_type, num_years=1):
+            for accession, filing in manifest["filings"].items():
+                await asyncio.to_thread(self._catalog_filing, cik, ticker, filing_type, accession, filing)
+
+        # Submissions are only sent back when they changed since the last download
+        # (a wider retention than the one synced has to look at the submissions again)
+        headers = {}
+        if covered and manifest.get("etag"):
+            headers["If-None-Match"] = manifest["etag"]
+        if covered and manifest.get("last_modified"):
+            headers["If-Modified-Since"] = manifest["last_modified"]
+        response = await self._get(client, f"{self.data_url}/submissions/CIK{cik:010d}.json", headers)
+        if response.status_code == 304:
+            return []
+
+        submissions = response.json()
+        filings = self._get_filings(submissions, filing_type)
+        # the first download also goes through the older submission pages, unless the recent ones already cover the years
+        if not covered and (num_years is None or len(filings) < num_years):
+            for page in submissions.get("filings", {}).get("files", []):
+                page_response = await self._get(client, f"{self.data_url}/submissions/{page['name']}")
+                filings.update(self._get_filings(page_response.json(), filing_type))
+        filings = self._get_recent_filings(filings, num_years)
+
+        missing = {}
+        for accession, filing in filings.items():
+            if accession in manifest["filings"]:
+                continue
+            # filings downloaded before the manifest existed only need to be recorded
+            if self._is_on_disk(ticker, filing_type, accession, download_details):
+                manifest["filings"][accession] = filing
+                await asyncio.to_thread(self._catalog_filing, cik, ticker, filing_type, accession, filing)
+            else:
+                missing[accession] = filing
+
+        results = await asyncio.gather(
+            *(self._download_filing(client, cik, ticker, filing_type, accession, filing, download_details, primary_only)
+              for accession, filing in missing.items()),
+            return_exceptions=True
+        )
+        downloaded = []
+        for (accession, filing), result in zip(missing.items(), results):
+            if isinstance(result, Exception):
+                print(f"Error downloading {filing_type} {accession} for {ticker}: {str(result)}")
+            else:
+                manifest["filings"][accession] = filing
+                await asyncio.to_thread(self._catalog_filing, cik, ticker, filing_type, accession, filing)
+                downloaded.append(accession)
+
+        manifest["cik"] = cik
+        # validators are only kept when every filing made it to disk, otherwise the next call retries
+        if len(downloaded) == len(missing):
+            manifest["etag"] = response.headers.get("etag")
+            manifest["last_modified"] = response.headers.get("last-modified")
+            if not covered:
+                manifest["num_years"] = num_years
+        self.save_manifest(ticker, filing_type, manifest)
+        return downloaded
+
+
+    async def download_many(self, tickers, filing_type="10-K", download_details=True, num_years=None, primary_only=False):
+        """
+        Download the filings of many tickers concurrently.
+
+        Returns:
+            dict: ticker -> list of accession numbers downloaded, or the exception raised for that ticker
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent_tickers)
+
+        async def download_ticker(client, ticker):
+            async with semaphore:
+                try:
+                    return await self.download(client, ticker, filing_type, download_details, num_years, primary_only)
+                except Exception as e:
+                    return e
+
+        async with httpx.AsyncClient(headers={"User-Agent": USER_AGENT}, timeout=60.0, follow_redirects=True) as client:
+            results = await asyncio.gather(*(download_ticker(client, ticker) for ticker in tickers))
+        return dict(zip(tickers, results))
+
+
+downloader = FilingsDownloader()
+
+
+def _run(coroutine):
+    # Run a coroutine from sync code, also when called from a running event loop (e.g. an async route)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+async def adownload_filings(tickers, filing_type="10-K", download_details=True, num_years=None, primary_only=SEC_PRIMARY_ONLY):
+    """
+    Download SEC filings for many companies concurrently.
+
+    Args:
+    tickers (list): The stock ticker symbols of the companies.
+    filing_type (str): The type of SEC filing to download. Default is "10-K".
+    download_details (bool): Whether to download the primary document of the filings. Default is True.
+    num_years (int): Only download the filings of the most recent fiscal years. Default is None (all of them).
+    primary_only (bool): Skip the full submission when the primary document is downloaded. Default is SEC_PRIMARY_ONLY.
+
+    Returns:
+    dict: ticker -> list of new accession numbers, or the exception raised for that ticker
+    """
+    results = await downloader.download_many(tickers, filing_type, download_details, num_years, primary_only)
+    for ticker, result in results.items():
+        if isinstance(result, Exception):
+            print(f"Error downloading {filing_type} for {ticker}: {str(result)}")
+        else:
+            print(f"Successfully downloaded {len(result)} new {filing_type} filing(s) for {ticker}.")
+    return results
+
+
+def download_filings(ticker, filing_type="10-K", download_details=True, num_years=None, primary_only=SEC_PRIMARY_ONLY):
     """
     Download SEC filings for a given company.
-    
+    Only filings not already on disk are downloaded.
+
     Args:
     ticker (str): The stock ticker symbol of the company.
     filing_type (str): The type of SEC filing to download. Default is "10-K".
     download_details (bool): Whether to download the details of the filings. Default is True.
-    
+    num_years (int): Only download the filings of the most recent fiscal years. Default is None (all of them).
+    primary_only (bool): Skip the full submission when the primary document is downloaded. Default is SEC_PRIMARY_ONLY.
+
     Returns:
     None
     """
-    try:
-        dl.get(filing_type, ticker, download_details=True)
-        print(f"Successfully downloaded {filing_type} filing(s) for {ticker}.")
-    except Exception as e:
-        print(f"Error downloading {filing_type} for {ticker}: {str(e)}")
+    _run(adownload_filings([ticker], filing_type, download_details, num_years, primary_only))
 
 
 def get_recent_folders(symbol, filing_type="10-K", num_years=3):
     """
-    Get the most recent folders for a given company and filing type.
+    Get the most recent folders for a given company and filing type, most recent first.
+    Folders are looked up in the filings catalog, the directory is only scanned for filings not catalogued yet.
     """
+    filings = filings_catalog.get_recent(symbol, filing_type, num_years)
+    if filings:
+        return [filing["accession"] for filing in filings]
+
     dir_path = os.path.join(SOURCE_SEC_DIRECTORY, symbol, filing_type)
     if not os.path.exists(dir_path):
         raise ValueError(f"Directory {dir_path} does not exist")
-    all_entries = os.listdir(dir_path)
-
-    # Filter out only the folders after the year 2000
-    # "0000320193-98-000105" -> not a valid year
-    # "0000320193-21-000105" -> valid year
-    all_folders = [entry for entry in all_entries if os.path.isdir(os.path.join(dir_path, entry)) and int(entry.split('-')[1]) < 25]
-
-    # Extract years and sort them, assuming the folder format includes the year as shown
-    # Folder format example: "0000320193-21-000105"
-    # Extracts the '21' part as the year
-    sorted_folders = sorted(all_folders, key=lambda x: int('20' + x.split('-')[1]), reverse=True)
-
-    # Get the most recent 'num_years' folders
-    recent_folders = sorted_folders[:num_years]
-    return recent_folders
-
+    all_folders = [entry for entry in os.listdir(dir_path) if os.path.isdir(os.path.join(dir_path, entry))]
 
+    # Folder format example: "0000320193-21-000105", sorted by the year encoded in the accession number
+    sorted_folders = sorted(all_folders, key=get_accession_year, reverse=True)
+    return sorted_folders[:num_years]
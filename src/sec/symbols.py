@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import threading
+import httpx
+from ..utils.files import atomic_write
+from ..config import SEC_WWW_URL, SEC_USER_AGENT, SYMBOLS_PATH, SYMBOLS_REFRESH_SECONDS
+
+# Retry delay of the scheduled refresh when SEC can't be reached
+REFRESH_RETRY_SECONDS = 300
+
+
+class SymbolMaster:
+    """
+    Ticker -> CIK mapping of SEC's company_tickers.json, held in memory.
+
+    The file is cached on disk and refreshed every `refresh_interval` seconds, in a background thread,
+    so lookups never wait for EDGAR once the symbols are loaded.
+    Tickers are normalized as SEC writes them: "brk.b" -> "BRK-B".
+    """
+    def __init__(self, path=SYMBOLS_PATH, url=f"{SEC_WWW_URL}/files/company_tickers.json",
+                 refresh_interval=SYMBOLS_REFRESH_SECONDS):
+        self.path = path
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self._symbols = None
+        self._updated = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+
+    @staticmethod
+    def normalize(ticker):
+        return ticker.strip().upper().replace('.', '-')
+
+
+    def _parse(self, data):
+        return {
+            self.normalize(entry["ticker"]): {"cik": int(entry["cik_str"]), "title": entry["title"]}
+            for entry in data.values()
+        }
+
+
+    def _load_file(self):
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._symbols = self._parse(json.load(f))
+            self._updated = os.path.getmtime(self.path)
+            return True
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring corrupted symbols file {self.path}: {str(e)}")
+            return False
+
+
+    def refresh(self):
+        """
+        Download company_tickers.json from SEC and replace the symbols in memory and on disk.
+        Errors are reported and the current symbols are kept.
+
+        Returns:
+            bool: whether the symbols were refreshed
+        """
+        try:
+            response = httpx.get(self.url, headers={"User-Agent": SEC_USER_AGENT}, timeout=30.0, follow_redirects=True)
+            response.raise_for_status()
+            data = response.json()
+            symbols = self._parse(data)
+        except Exception as e:
+            print(f"Error refreshing the SEC symbols: {str(e)}")
+            return False
+
+        with atomic_write(self.path) as f:
+            json.dump(data, f)
+        self._symbols = symbols
+        self._updated = time.time()
+        return True
+
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+
+    def is_loaded(self):
+        return self._symbols is not None
+
+
+    def is_stale(self):
+        return time.time() - self._updated > self.refresh_interval
+
+
+    def load(self, download=True):
+        """
+        Load the symbols from disk, or from SEC when they were never downloaded (unless `download` is False).
+        Blocks on the disk and the network, async code runs it in a thread (see api/main.py).
+        """
+        with self._lock:
+            if self._symbols is None:
+                self._load_file()
+        # the lock is not held on the network, lookups keep answering meanwhile
+        if self._symbols is None and download:
+            self.refresh()
+        return self.is_loaded()
+
+
+    def _get_symbols(self):
+        # never blocks on the network: missing or stale symbols are refreshed in the background,
+        # except in the tests, which run offline
+        if self._symbols is None:
+            with self._lock:
+                if self._symbols is None:
+                    self._load_file()
+        if (self._symbols is None or self.is_stale()) and not os.getenv("TESTING"):
+            self._refresh_in_background()
+        return self._symbols
+
+
+    def is_available(self):
+        return self._get_symbols() is not None
+
+
+    def lookup(self, ticker):
+        """
+        Returns {"cik", "title"} of a ticker, None if unknown or if the symbols are not available yet.
+        """
+        symbols = self._get_symbols()
+        return symbols.get(self.normalize(ticker)) if symbols else None
+
+
+    def get_cik(self, ticker):
+        entry = self.lookup(ticker)
+        return entry["cik"] if entry else None
+
+
+    def start_refresh(self):
+        """
+        Refresh the symbols on schedule, in a daemon thread.
+        """
+        def run():
+            while True:
+                if self._symbols is None:
+                    self.load()
+                elif self.is_stale():
+                    self.refresh()
+                if self.is_loaded() and not self.is_stale():
+                    delay = self._updated + self.refresh_interval - time.time()
+                else:
+                    delay = REFRESH_RETRY_SECONDS
+                time.sleep(max(delay, 1))
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+
+symbol_master = SymbolMaster()
@@ -0,0 +1,303 @@
+"""
+Inline XBRL fact extraction from 10-K primary documents.
+
+Every ix:nonFraction fact of a filing is stored as columnar NumPy arrays
+(concept, period, unit, scale, value) in XBRL_DIRECTORY/{symbol}/{filing_type}/{accession}.npz,
+and financial statements are served from these local facts.
+
+Usage:
+    python -m src.sec.xbrl AAPL MSFT
+"""
+import os
+import sys
+import argparse
+import numpy as np
+from lxml import etree
+from .sec import PRIMARY_DOCUMENT
+from ..config import SOURCE_SEC_DIRECTORY, XBRL_DIRECTORY
+from ..utils.files import atomic_write
+
+# Columns of the fact arrays
+FACT_FIELDS = ("concept", "period_start", "period_end", "unit", "scale", "dimensional", "value")
+
+# Elements whose content is read when they end, nothing inside them is freed before
+COLLECTED_ELEMENTS = ("nonfraction", "context", "unit")
+
+# us-gaap concepts of each statement, mapped to their labels.
+# Concepts sharing a label are alternatives, the first one found in a period wins.
+STATEMENT_CONCEPTS = {
+    "balance": {
+        "Assets": "Total Assets",
+        "AssetsCurrent": "Current Assets",
+        "CashAndCashEquivalentsAtCarryingValue": "Cash And Cash Equivalents",
+        "AccountsReceivableNetCurrent": "Accounts Receivable",
+        "InventoryNet": "Inventory",
+        "PropertyPlantAndEquipmentNet": "Net PPE",
+        "Goodwill": "Goodwill",
+        "Liabilities": "Total Liabilities",
+        "LiabilitiesCurrent": "Current Liabilities",
+        "AccountsPayableCurrent": "Accounts Payable",
+        "LongTermDebtNoncurrent": "Long Term Debt",
+        "StockholdersEquity": "Stockholders Equity",
+        "LiabilitiesAndStockholdersEquity": "Total Liabilities And Equity",
+    },
+    "income": {
+        "Revenues": "Total Revenue",
+        "RevenueFromContractWithCustomerExcludingAssessedTax": "Total Revenue",
+        "CostOfRevenue": "Cost Of Revenue",
+        "CostOfGoodsAndServicesSold": "Cost Of Revenue",
+        "GrossProfit": "Gross Profit",
+        "ResearchAndDevelopmentExpense": "Research And Development",
+        "OperatingExpenses": "Operating Expense",
+        "OperatingIncomeLoss": "Operating Income",
+        "IncomeTaxExpenseBenefit": "Tax Provision",
+        "NetIncomeLoss": "Net Income",
+        "EarningsPerShareBasic": "Basic EPS",
+        "EarningsPerShareDiluted": "Diluted EPS",
+        "WeightedAverageNumberOfSharesOutstandingBasic": "Basic Average Shares",
+        "WeightedAverageNumberOfDilutedSharesOutstanding": "Diluted Average Shares",
+    },
+    "cashflow": {
+        "NetCashProvidedByUsedInOperatingActivities": "Operating Cash Flow",
+        "NetCashProvidedByUsedInInvestingActivities": "Investing Cash Flow",
+        "NetCashProvidedByUsedInFinancingActivities": "Financing Cash Flow",
+        "PaymentsToAcquirePropertyPlantAndEquipment": "Capital Expenditure",
+        "DepreciationDepletionAndAmortization": "Depreciation And Amortization",
+        "DepreciationAndAmortization": "Depreciation And Amortization",
+        "ShareBasedCompensation": "Stock Based Compensation",
+        "PaymentsForRepurchaseOfCommonStock": "Repurchase Of Capital Stock",
+        "PaymentsOfDividends": "Cash Dividends Paid",
+    },
+}
+
+# Length in days of the periods of annual and quarterly facts
+ANNUAL_PERIOD_DAYS = (350, 380)
+QUARTERLY_PERIOD_DAYS = (80, 100)
+
+
+def _local_name(tag):
+    # "ix:nonfraction" -> "nonfraction", comments and PIs have no name
+    return tag.split(':')[-1] if isinstance(tag, str) else None
+
+
+def _parse_value(text, number_format, sign):
+    """
+    Returns the numeric value of a fact text according to its ixt format, NaN if unreadable.
+    """
+    text = text.strip()
+    number_format = (number_format or "").lower()
+    if number_format.endswith(("zerodash", "fixed-zero")) or text in ("", "-", "—", "–"):
+        value = 0.0
+    else:
+        if "comma-decimal" in number_format or "numcommadecimal" in number_format:
+            text = text.replace(".", "").replace(" ", "").replace(",", ".")
+        else:
+            text = text.replace(",", "").replace(" ", "")
+        try:
+            value = float(text)
+        except ValueError:
+            return float("nan")
+    return -value if sign == "-" else value
+
+
+def extract_facts(doc_path):
+    """
+    Stream a 10-K primary document and extract its inline XBRL numeric facts.
+
+    Returns:
+        dict: one NumPy array per field of FACT_FIELDS, periods as datetime64[D]
+              (period_start is NaT for instant facts)
+    """
+    contexts = {}
+    units = {}
+    facts = []
+    collecting = 0
+
+    for event, elem in etree.iterparse(doc_path, events=("start", "end"), html=True, encoding="utf-8", huge_tree=True):
+        name = _local_name(elem.tag)
+        if event == "start":
+            if name in COLLECTED_ELEMENTS:
+                collecting += 1
+            continue
+
+        if name == "context":
+            period = {}
+            dimensional = False
+            for child in elem.iter():
+                child_name = _local_name(child.tag)
+                if child_name in ("startdate", "enddate", "instant"):
+                    # dates may carry a time, "2023-09-30T00:00:00"
+                    period[child_name] = (child.text or "").strip()[:10]
+                elif child_name in ("explicitmember", "typedmember"):
+                    dimensional = True
+            start = period.get("startdate", "")
+            end = period.get("enddate", period.get("instant", ""))
+            contexts[elem.get("id")] = (start, end, dimensional)
+        elif name == "unit":
+            measures = [(child.text or "").strip() for child in elem.iter() if _local_name(child.tag) == "measure"]
+            units[elem.get("id")] = "/".join(measures)
+        elif name == "nonfraction":
+            if elem.get("xsi:nil") != "true":
+                value = _parse_value("".join(elem.itertext()), elem.get("format"), elem.get("sign"))
+                scale = int(elem.get("scale") or 0)
+                facts.append((elem.get("name", ""), elem.get("contextref"), elem.get("unitref"), scale, value * 10 ** scale))
+
+        if name in COLLECTED_ELEMENTS:
+            collecting -= 1
+        if not collecting:
+            elem.clear(keep_tail=True)
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+    # Facts may come before the ix:header holding their contexts, resolve them at the end
+    columns = {field: [] for field in FACT_FIELDS}
+    for concept, context_ref, unit_ref, scale, value in facts:
+        if context_ref not in contexts or np.isnan(value):
+            continue
+        start, end, dimensional = contexts[context_ref]
+        columns["concept"].append(concept)
+        columns["period_start"].append(start or "NaT")
+        columns["period_end"].append(end or "NaT")
+        columns["unit"].append(units.get(unit_ref, ""))
+        columns["scale"].append(scale)
+        columns["dimensional"].append(dimensional)
+        columns["value"].append(value)
+
+    return {
+        "concept": np.array(columns["concept"], dtype=str),
+        "period_start": np.array(columns["period_start"], dtype="datetime64[D]"),
+        "period_end": np.array(columns["period_end"], dtype="datetime64[D]"),
+        "unit": np.array(columns["unit"], dtype=str),
+        "scale": np.array(columns["scale"], dtype=np.int16),
+        "dimensional": np.array(columns["dimensional"], dtype=bool),
+        "value": np.array(columns["value"], dtype=np.float64),
+    }
+
+
+def get_facts_path(symbol, accession, filing_type="10-K", directory=XBRL_DIRECTORY):
+    return os.path.join(directory, symbol, filing_type, f"{accession}.npz")
+
+
+def save_facts(facts, path):
+    with atomic_write(path, 'wb') as f:
+        np.savez_compressed(f, **facts)
+
+
+def load_facts(path):
+    with np.load(path, allow_pickle=False) as data:
+        return {field: data[field] for field in FACT_FIELDS}
+
+
+def build_facts(symbol, filing_type="10-K", directory=XBRL_DIRECTORY):
+    """
+    Extract the facts of every downloaded filing of a symbol not extracted yet.
+
+    Returns:
+        int: number of filings extracted
+    """
+    dir_path = os.path.join(SOURCE_SEC_DIRECTORY, symbol, filing_type)
+    if not os.path.exists(dir_path):
+        return 0
+
+    extracted = 0
+    for accession in sorted(os.listdir(dir_path)):
+        doc_path = os.path.join(dir_path, accession, PRIMARY_DOCUMENT)
+        path = get_facts_path(symbol, accession, filing_type, directory)
+        if os.path.exists(doc_path) and not os.path.exists(path):
+            try:
+                save_facts(extract_facts(doc_path), path)
+                extracted += 1
+            except Exception as e:
+                print(f"Error extracting XBRL facts from {doc_path}: {str(e)}")
+    return extracted
+
+
+def load_symbol_facts(symbol, filing_type="10-K", directory=XBRL_DIRECTORY):
+    """
+    Returns the facts of all the filings of a symbol, oldest filing first, None if there are none.
+    """
+    dir_path = os.path.join(directory, symbol, filing_type)
+    if not os.path.exists(dir_path):
+        return None
+
+    filings = [load_facts(os.path.join(dir_path, name)) for name in os.listdir(dir_path) if name.endswith(".npz")]
+    filings = [facts for facts in filings if len(facts["value"])]
+    if not filings:
+        return None
+
+    # Later filings restate earlier periods, keep them last so their values win
+    filings.sort(key=lambda facts: facts["period_end"].max())
+    return {field: np.concatenate([facts[field] for facts in filings]) for field in FACT_FIELDS}
+
+
+def get_statement(symbol, statement, quarterly=False, filing_type="10-K", build=True, directory=XBRL_DIRECTORY):
+    """
+    Build a financial statement from the local XBRL facts of a symbol.
+
+    Args:
+        symbol (str): ticker symbol
+        statement (str): "balance", "income" or "cashflow"
+        quarterly (bool): quarterly instead of annual periods (balance sheets are annual only)
+        filing_type (str): filing type the facts come from
+        build (bool): extract the facts of downloaded filings not extracted yet
+        directory (str): root directory of the facts
+
+    Returns:
+        dict: {period end "YYYY-MM-DD": {label: value}}, most recent period first
+    """
+    if statement not in STATEMENT_CONCEPTS:
+        raise ValueError(f"Invalid statement: {statement}")
+    if build:
+        build_facts(symbol, filing_type, directory)
+
+    facts = load_symbol_facts(symbol, filing_type, directory)
+    if facts is None:
+        return {}
+
+    concepts = STATEMENT_CONCEPTS[statement]
+    local_concepts = np.array([concept.split(':')[-1] for concept in facts["concept"]], dtype=str)
+    mask = np.isin(local_concepts, list(concepts)) & ~facts["dimensional"]
+
+    if statement == "balance":
+        if quarterly:
+            return {}
+        mask &= np.isnat(facts["period_start"])
+    else:
+        days = (facts["period_end"] - facts["period_start"]).astype("timedelta64[D]").astype(np.int64)
+        low, high = QUARTERLY_PERIOD_DAYS if quarterly else ANNUAL_PERIOD_DAYS
+        mask &= ~np.isnat(facts["period_start"]) & (days >= low) & (days <= high)
+
+    # Rank of each concept among the alternatives of its label
+    priority = {concept: index for index, concept in enumerate(concepts)}
+    values = {}
+    for index in np.flatnonzero(mask):
+        concept = local_concepts[index]
+        label = concepts[concept]
+        period = str(facts["period_end"][index])
+        current = values.setdefault(period, {}).get(label)
+        if current is None or priority[concept] <= current[0]:
+            values[period][label] = (priority[concept], facts["value"][index])
+
+    result = {}
+    for period in sorted(values, reverse=True):
+        result[period] = {
+            label: int(value) if float(value).is_integer() else float(value)
+            for label, (_, value) in values[period].items()
+        }
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract inline XBRL facts from downloaded 10-K filings.")
+    parser.add_argument("symbols", nargs="+", help="ticker symbols, e.g. AAPL MSFT")
+    parser.add_argument("--filing-type", default="10-K")
+    args = parser.parse_args(argv)
+
+    for symbol in args.symbols:
+        extracted = build_facts(symbol.upper(), args.filing_type)
+        print(f"{symbol.upper()}: {extracted} filings extracted")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,24 @@
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(path, mode='w', encoding='utf-8', opener=open):
+    """
+    Write a file atomically: the content goes to a temporary file next to `path`, which replaces it once
+    written, so readers never see a partial file. `opener` opens the temporary file (e.g. gzip.open).
+
+    Usage:
+        with atomic_write(path) as f:
+            json.dump(data, f)
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with opener(tmp_path, mode, encoding=None if 'b' in mode else encoding) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
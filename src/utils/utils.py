@@ -2,16 +2,25 @@
 import re
 import pandas as pd
 from fastapi import HTTPException
+from ..sec.symbols import symbol_master
 # Regex pattern for valid ticker symbols
 # Allows comma-separated list of tickers, each 1-5 uppercase letters/numbers, optionally followed by a dot and more letters
 TICKER_PATTERN = re.compile(r'^[A-Z0-9]{1,5}(\.[A-Z]{1,2})?(?:\s*,\s*[A-Z0-9]{1,5}(\.[A-Z]{1,2})?)*$')
 
-def validate_ticker(ticker):
+def validate_ticker(ticker, check_sec=False):
     if not TICKER_PATTERN.match(ticker):
         raise HTTPException(
             status_code=400,
             detail="Invalid ticker format. Ticker should be 1-5 characters, uppercase letters/numbers only."
         )
+    # Tickers filing with SEC, checked in memory (skipped while the SEC symbols are not available)
+    if check_sec and symbol_master.is_available():
+        unknown = [symbol.strip() for symbol in ticker.split(',') if symbol_master.lookup(symbol) is None]
+        if unknown:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Unknown ticker: {', '.join(unknown)}. No SEC filer has this ticker."
+            )
 
 def validate_str_key(key):
     if not isinstance(key, str):
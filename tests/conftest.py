@@ -2,7 +2,7 @@ import pytest
 from fastapi.testclient import TestClient
 import os
 import sys
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 # Add the src directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -70,8 +70,18 @@ def mock_query_engine():
         instance.query.return_value = {
             "sample": "query result"
         }
+        instance.aquery = AsyncMock(return_value=instance.query.return_value)
+        mock.acreate = AsyncMock(return_value=instance)
+        mock.is_ready.return_value = True
+        mock.is_stale.return_value = False
         instance.get_all_queries.return_value = ["risk_factors", "business_description"]
         instance.get_query.return_value = "Sample query text"
+
+        async def astream_query():
+            yield "context", []
+            yield "token", "query result"
+            yield "complete", {"sample": "query result"}
+        instance.astream_query.side_effect = astream_query
         yield mock
 
 @pytest.fixture
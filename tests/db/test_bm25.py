@@ -0,0 +1,94 @@
+import unittest
+import tempfile
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+from langchain_community.query_constructors.chroma import ChromaTranslator
+from src.db.bm25 import BM25Index, tokenize
+from src.db.hybrid import HybridSelfQueryRetriever, reciprocal_rank_fusion
+from src.db.numpy_store import NumpyVectorStore
+from src.models.embeddings import DeterministicEmbeddings
+
+DOCUMENTS = [
+    Document(page_content="Item 7A. Quantitative and qualitative disclosures about market risk: interest rate risk.",
+             metadata={"year": "2023", "type": "item_7a"}),
+    Document(page_content="Net sales increased due to higher iPhone and services sales.", metadata={"year": "2023", "type": "item_7"}),
+    Document(page_content="The company designs smartphones, computers and tablets.", metadata={"year": "2023", "type": "item_1"}),
+    Document(page_content="Item 7A. Market risk: foreign currency and interest rate risk.", metadata={"year": "2022", "type": "item_7a"}),
+]
+IDS = ["2023-item_7a-0", "2023-item_7-0", "2023-item_1-0", "2022-item_7a-0"]
+
+
+class TestBM25Index(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index = BM25Index(self.tmp_dir.name)
+        self.index.add(IDS, [doc.page_content for doc in DOCUMENTS], [doc.metadata for doc in DOCUMENTS])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("Item 7A. Market-risk"), ["item", "7a", "market", "risk"])
+
+    def test_search_ranks_exact_terms_first(self):
+        results = self.index.search("Item 7A market risk interest rate", k=10)
+        self.assertEqual({id for id, _ in results[:2]}, {"2023-item_7a-0", "2022-item_7a-0"})
+        self.assertNotIn("2023-item_1-0", [id for id, _ in results])
+        self.assertEqual([id for id, _ in self.index.search("iphone", k=10)], ["2023-item_7-0"])
+        self.assertEqual(self.index.search("unknown terms"), [])
+
+    def test_search_with_filter(self):
+        results = self.index.search("market risk", k=10, filter={"$and": [{"year": "2022"}, {"type": {"$in": ["item_7a"]}}]})
+        self.assertEqual([id for id, _ in results], ["2022-item_7a-0"])
+
+    def test_delete_save_and_reload(self):
+        self.index.delete(["2022-item_7a-0"])
+        self.index.add(["2023-item_1-0"], ["The company designs wearables."], [{"year": "2023", "type": "item_1"}])
+        self.index.save()
+
+        reloaded = BM25Index(self.tmp_dir.name)
+        self.assertEqual(sorted(reloaded.documents), ["2023-item_1-0", "2023-item_7-0", "2023-item_7a-0"])
+        self.assertEqual(reloaded.total_length, self.index.total_length)
+        self.assertEqual([id for id, _ in reloaded.search("foreign currency tablets wearables", k=10)], ["2023-item_1-0"])
+        self.assertEqual(reloaded.search("market risk"), self.index.search("market risk"))
+
+
+class TestHybridRetriever(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = NumpyVectorStore(self.tmp_dir.name, DeterministicEmbeddings(16))
+        self.store.add_documents(DOCUMENTS, ids=IDS)
+        self.index = BM25Index(self.tmp_dir.name)
+        self.index.add(IDS, [doc.page_content for doc in DOCUMENTS], [doc.metadata for doc in DOCUMENTS])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _get_retriever(self, lexical_index):
+        return HybridSelfQueryRetriever(
+            structured_query_translator=ChromaTranslator(),
+            query_constructor=RunnableLambda(lambda _: None),
+            vectorstore=self.store,
+            lexical_index=lexical_index,
+        )
+
+    def test_reciprocal_rank_fusion(self):
+        self.assertEqual(reciprocal_rank_fusion([["a", "b", "c"], ["b"]], k=60), ["b", "a", "c"])
+        self.assertEqual(reciprocal_rank_fusion([["a"], []]), ["a"])
+
+    def test_lexical_matches_are_fused_in(self):
+        search_kwargs = {"k": 2, "filter": {"year": "2023"}}
+        query = "Item 7A market risk interest rate"
+        docs = self._get_retriever(self.index)._get_docs_with_query(query, search_kwargs)
+        self.assertEqual(len(docs), 2)
+        self.assertIn("2023-item_7a-0", [doc.id for doc in docs])
+        self.assertTrue(all(doc.metadata["year"] == "2023" for doc in docs))
+        self.assertEqual(next(doc for doc in docs if doc.id == "2023-item_7a-0").page_content, DOCUMENTS[0].page_content)
+
+        # without a lexical index the vector search is returned as is
+        self.assertEqual([doc.id for doc in self._get_retriever(None)._get_docs_with_query(query, search_kwargs)],
+                         [doc.id for doc in self.store.similarity_search(query, **search_kwargs)])
+
+
+if __name__ == '__main__':
+    unittest.main()
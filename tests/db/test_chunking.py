@@ -0,0 +1,44 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import Mock, patch
+from langchain_core.documents import Document
+from src.db.K10 import K10_DB
+from src.db.manifest import build_manifest, count_chunks, write_manifest
+from src.models.embeddings import count_tokens
+
+
+class TestChunking(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        # an existing collection, so that K10_DB builds nothing
+        write_manifest(self.tmp_dir.name, build_manifest("AAPL", {"2023": {"item_1": 1}}, {}, "model"))
+        with patch('src.db.K10.Chroma'):
+            self.db = K10_DB(self.tmp_dir.name, "AAPL", Mock(), save_to_txt_files=False, num_years=1)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @patch('src.db.K10.CHUNK_OVERLAP_TOKENS', 10)
+    @patch('src.db.K10.CHUNK_SIZE_TOKENS', 100)
+    def test_items_are_split_with_offsets(self):
+        risk = " ".join(f"Risk paragraph {index} about supply chains and competition." for index in range(200))
+        docs = [
+            Document(page_content=risk, metadata={"year": "2023", "type": "item_1A"}),
+            Document(page_content="Short item.", metadata={"year": "2023", "type": "item_9"}),
+        ]
+        chunks = self.db._chunck_data(docs)
+
+        risk_chunks = [chunk for chunk in chunks if chunk.metadata["type"] == "item_1A"]
+        self.assertGreater(len(risk_chunks), 10)
+        self.assertEqual([chunk.metadata["chunk"] for chunk in risk_chunks], list(range(len(risk_chunks))))
+        for chunk in risk_chunks:
+            self.assertLessEqual(count_tokens(chunk.page_content), 100)
+            self.assertEqual(risk[chunk.metadata["start"]:chunk.metadata["end"]], chunk.page_content)
+            self.assertEqual(chunk.metadata["year"], "2023")
+
+        self.assertEqual(chunks[-1].metadata, {"year": "2023", "type": "item_9", "chunk": 0, "start": 0, "end": 11})
+
+
+if __name__ == '__main__':
+    unittest.main()
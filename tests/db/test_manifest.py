@@ -0,0 +1,53 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import Mock, patch
+from src.db.manifest import build_manifest, count_chunks, read_manifest, write_manifest, get_manifest_path
+from src.db.K10 import K10_DB
+
+METADATAS = [
+    {"year": "2023", "type": "item_1"},
+    {"year": "2023", "type": "item_7"},
+    {"year": "2023", "type": "item_7"},
+    {"year": "2022", "type": "item_1"},
+]
+FILINGS = {"0000320193-23-000106": {"year": "2023", "content_hash": "a" * 64}}
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.persist_directory = os.path.join(self.tmp_dir.name, "AAPL")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_build_and_read(self):
+        manifest = build_manifest("AAPL", count_chunks(METADATAS), FILINGS, "text-embedding-ada-002")
+        self.assertEqual(manifest["years"], ["2022", "2023"])
+        self.assertEqual(manifest["items"], ["item_1", "item_7"])
+        self.assertEqual(manifest["chunks"]["2023"], {"item_1": 1, "item_7": 2})
+        self.assertEqual(manifest["filings"], FILINGS)
+
+        write_manifest(self.persist_directory, manifest)
+        self.assertEqual(read_manifest(self.persist_directory), manifest)
+
+    def test_missing_or_corrupted(self):
+        self.assertIsNone(read_manifest(self.persist_directory))
+        os.makedirs(self.persist_directory)
+        with open(get_manifest_path(self.persist_directory), 'w') as f:
+            f.write("{not json")
+        self.assertIsNone(read_manifest(self.persist_directory))
+
+    @patch('src.db.K10.Chroma')
+    def test_k10_db_reads_manifest_without_opening_the_collection(self, mock_chroma):
+        write_manifest(self.persist_directory, build_manifest("AAPL", count_chunks(METADATAS), FILINGS, "model"))
+        db = K10_DB(self.persist_directory, "AAPL", Mock(), save_to_txt_files=False, num_years=2)
+
+        self.assertEqual(db.get_available_years(), ["2022", "2023"])
+        self.assertIn({"year": "2023", "type": "item_7", "chunks": 2}, db.get_available_documents())
+        mock_chroma.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
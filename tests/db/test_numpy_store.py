@@ -0,0 +1,176 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from unittest.mock import patch
+from langchain_core.documents import Document
+from langchain_core.structured_query import Comparator, Comparison, Operation, Operator, StructuredQuery
+from src.db.K10 import K10_DB, ScopedChromaTranslator
+from src.db.numpy_store import NumpyVectorStore, matches
+from src.models.embeddings import DeterministicEmbeddings
+from src.sec.catalog import FilingsCatalog
+
+DOCUMENTS = [
+    Document(page_content="Apple designs smartphones and computers.", metadata={"year": "2023", "type": "item_1"}),
+    Document(page_content="Net sales of smartphones grew.", metadata={"year": "2023", "type": "item_7"}),
+    Document(page_content="Apple designs tablets.", metadata={"year": "2022", "type": "item_1"}),
+    Document(page_content="Net sales of tablets declined.", metadata={"year": "2022", "type": "item_7"}),
+]
+IDS = ["2023-item_1-0", "2023-item_7-0", "2022-item_1-0", "2022-item_7-0"]
+
+
+class TestNumpyVectorStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.embeddings = DeterministicEmbeddings(64)
+        self.store = NumpyVectorStore(self.tmp_dir.name, self.embeddings)
+        self.store.add_documents(DOCUMENTS, ids=IDS)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_matches_chroma_filters(self):
+        metadata = {"year": "2023", "type": "item_7"}
+        self.assertTrue(matches(metadata, None))
+        self.assertTrue(matches(metadata, {"year": "2023"}))
+        self.assertTrue(matches(metadata, {"$and": [{"year": {"$gte": "2022"}}, {"type": {"$in": ["item_1", "item_7"]}}]}))
+        self.assertTrue(matches(metadata, {"$or": [{"year": {"$eq": "2021"}}, {"type": {"$ne": "item_1"}}]}))
+        self.assertFalse(matches(metadata, {"$and": [{"year": "2023"}, {"type": {"$nin": ["item_7"]}}]}))
+        self.assertFalse(matches(metadata, {"year": {"$lt": "2023"}}))
+        with self.assertRaises(ValueError):
+            matches(metadata, {"year": {"$like": "20%"}})
+
+    def test_search_is_exact_and_filtered(self):
+        docs = self.store.similarity_search("Apple designs tablets.", k=2)
+        self.assertEqual(docs[0].page_content, "Apple designs tablets.")
+        self.assertEqual(len(docs), 2)
+
+        scored = self.store.similarity_search_with_score("sales", k=10, filter={"type": "item_7"})
+        self.assertEqual({doc.metadata["type"] for doc, _ in scored}, {"item_7"})
+        self.assertEqual([score for _, score in scored], sorted((score for _, score in scored), reverse=True))
+        self.assertEqual(self.store.similarity_search("sales", filter={"year": "2021"}), [])
+
+    def test_get_delete_and_reload(self):
+        self.assertEqual(self.store.get(where={"year": "2022"}, include=[])["ids"], ["2022-item_1-0", "2022-item_7-0"])
+        self.store.delete(ids=["2022-item_1-0"])
+        # adding an existing id replaces it
+        self.store.add_texts(["Net sales of smartphones grew again."], [{"year": "2023", "type": "item_7"}], ["2023-item_7-0"])
+
+        reloaded = NumpyVectorStore(self.tmp_dir.name, self.embeddings)
+        self.assertEqual(sorted(reloaded.get(include=[])["ids"]), ["2022-item_7-0", "2023-item_1-0", "2023-item_7-0"])
+        self.assertEqual(reloaded.get(ids=["2023-item_7-0"])["documents"], ["Net sales of smartphones grew again."])
+        self.assertEqual(reloaded.vectors.shape, (3, 64))
+
+        reloaded.delete_collection()
+        self.assertEqual(NumpyVectorStore(self.tmp_dir.name, self.embeddings).get()["ids"], [])
+
+
+class TestQuantizedStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.embeddings = DeterministicEmbeddings(64)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _get_store(self, dtype):
+        return NumpyVectorStore(self.tmp_dir.name, self.embeddings, dtype=dtype)
+
+    def test_quantized_vectors_keep_the_ranking(self):
+        expected = [doc.id for doc in self._get_reference().similarity_search("Apple designs tablets", k=4)]
+        for dtype, itemsize in (("float16", 2), ("int8", 1)):
+            store = self._get_store(dtype)
+            self.assertEqual(store.vectors.dtype, np.dtype(dtype))
+            self.assertEqual(store.vectors.nbytes, len(DOCUMENTS) * 64 * itemsize)
+            self.assertEqual([doc.id for doc in store.similarity_search("Apple designs tablets", k=4)], expected)
+            reference = np.asarray(self._get_reference().get(include=["embeddings"])["embeddings"])
+            np.testing.assert_allclose(store.get(include=["embeddings"])["embeddings"], reference, atol=0.01)
+
+    def test_int8_add_and_delete(self):
+        self._get_reference()
+        store = self._get_store("int8")
+        self.assertEqual(store.scales.shape, (len(DOCUMENTS),))
+        store.delete(ids=["2022-item_1-0"])
+        store.add_texts(["Apple designs wearables."], [{"year": "2023", "type": "item_1"}], ["2023-item_1-1"])
+
+        reloaded = self._get_store("int8")
+        self.assertEqual(reloaded.vectors.shape, (4, 64))
+        self.assertEqual(reloaded.scales.shape, (4,))
+        self.assertEqual(reloaded.similarity_search("Apple designs wearables.", k=1)[0].id, "2023-item_1-1")
+
+    def test_invalid_dtype(self):
+        with self.assertRaises(ValueError):
+            self._get_store("int4")
+
+    def _get_reference(self):
+        # float32 store, the other dtypes convert it when opened
+        store = self._get_store("float32")
+        if not store.ids:
+            store.add_documents(DOCUMENTS, ids=IDS)
+        return store
+
+
+class TestK10NumpyBackend(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        source_directory = os.path.join(self.tmp_dir.name, "filings")
+        self.items = {
+            "0000320193-23-000106": {"item_1": "Apple designs smartphones.", "item_7": "Net sales grew in 2023."},
+            "0000320193-22-000108": {"item_1": "Apple designs computers.", "item_7": "Net sales grew in 2022."},
+        }
+        for accession, items in self.items.items():
+            folder = os.path.join(source_directory, "AAPL", "10-K", accession)
+            os.makedirs(folder, exist_ok=True)
+            with open(os.path.join(folder, "primary-document.html"), 'w') as f:
+                f.write(repr(items))
+
+        patches = [
+            patch('src.db.K10.SOURCE_SEC_DIRECTORY', source_directory),
+            patch('src.db.K10.filings_catalog', FilingsCatalog(os.path.join(self.tmp_dir.name, "missing", "filings.db"))),
+            patch('src.db.K10.get_recent_folders', side_effect=lambda symbol, num_years: list(self.items)[:num_years]),
+            patch('src.db.K10.extract_filing', side_effect=self._extract_filing),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _extract_filing(self, symbol, doc_path, save_to_txt_files=False, cache=None, document_hash=None, year=None):
+        accession = os.path.basename(os.path.dirname(doc_path))
+        year = "20" + accession.split('-')[1]
+        return {key: {"year": year, "content": content} for key, content in self.items[accession].items()}, False
+
+    def _get_db(self, vector_store):
+        return K10_DB(os.path.join(self.tmp_dir.name, "db"), "AAPL", DeterministicEmbeddings(32),
+                      save_to_txt_files=False, num_years=2, vector_store=vector_store)
+
+    def test_k10_db_on_numpy_store(self):
+        db = self._get_db("numpy")
+        self.assertIsInstance(db.db, NumpyVectorStore)
+        self.assertEqual(db.get_available_years(), ["2022", "2023"])
+        self.assertEqual(db.manifest["vector_store"], "numpy")
+        self.assertEqual(len(db.db.get(include=[])["ids"]), 4)
+
+        # the filters built by the Chroma translator work on the numpy store
+        query = StructuredQuery(query="net sales", limit=None, filter=Operation(operator=Operator.AND, arguments=[
+            Comparison(comparator=Comparator.EQ, attribute="year", value="2023"),
+            Comparison(comparator=Comparator.EQ, attribute="type", value="item_7"),
+        ]))
+        query, kwargs = ScopedChromaTranslator().visit_structured_query(query)
+        docs = db.db.similarity_search(query, k=5, **kwargs)
+        self.assertEqual([doc.page_content for doc in docs], ["Net sales grew in 2023."])
+
+        # switching the vector store rebuilds the db
+        db = self._get_db("chroma")
+        self.assertEqual(db.refresh()["added"], list(self.items))
+        self.assertEqual(db.manifest["vector_store"], "chroma")
+
+    def test_invalid_vector_store(self):
+        with self.assertRaises(ValueError):
+            self._get_db("faiss")
+
+
+if __name__ == '__main__':
+    unittest.main()
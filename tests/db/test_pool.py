@@ -0,0 +1,60 @@
+import unittest
+import time
+import threading
+from src.db.pool import LRUPool
+
+
+class TestLRUPool(unittest.TestCase):
+    def test_hits_and_misses(self):
+        pool = LRUPool(max_entries=2, max_bytes=1000)
+        self.assertEqual(pool.get("AAPL", lambda: "aapl db"), "aapl db")
+        self.assertEqual(pool.get("AAPL", lambda: "other"), "aapl db")
+        stats = pool.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+
+    def test_least_recently_used_is_evicted(self):
+        pool = LRUPool(max_entries=2, max_bytes=1000)
+        pool.get("AAPL", lambda: "aapl")
+        pool.get("MSFT", lambda: "msft")
+        pool.get("AAPL", lambda: "aapl")
+        pool.get("TROW", lambda: "trow")
+        self.assertEqual(pool.get("AAPL", lambda: "rebuilt"), "aapl")
+        self.assertEqual(pool.get("MSFT", lambda: "rebuilt"), "rebuilt")
+        self.assertEqual(pool.stats()["evictions"], 2)
+
+    def test_memory_budget(self):
+        pool = LRUPool(max_entries=10, max_bytes=100, sizeof=len)
+        pool.get("AAPL", lambda: "a" * 60)
+        pool.get("MSFT", lambda: "m" * 60)
+        self.assertEqual(pool.stats()["entries"], 1)
+        self.assertEqual(pool.stats()["bytes"], 60)
+        # a single entry over the budget is still pooled
+        pool.get("TROW", lambda: "t" * 200)
+        self.assertEqual(pool.stats()["entries"], 1)
+
+    def test_expired_entries_are_rebuilt(self):
+        pool = LRUPool(ttl=0.01)
+        pool.get("AAPL", lambda: "old")
+        time.sleep(0.02)
+        self.assertEqual(pool.get("AAPL", lambda: "new"), "new")
+
+    def test_concurrent_gets_build_once(self):
+        pool = LRUPool()
+        builds = []
+
+        def factory():
+            builds.append(1)
+            time.sleep(0.05)
+            return "db"
+
+        threads = [threading.Thread(target=pool.get, args=("AAPL", factory)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(pool.stats()["hits"], 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
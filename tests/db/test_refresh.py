@@ -0,0 +1,142 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import patch
+from src.db.K10 import K10_DB
+from src.models.embeddings import DeterministicEmbeddings
+from src.sec.catalog import FilingsCatalog
+
+ITEMS = {
+    "0000320193-23-000106": {"item_1": "Apple designs smartphones.", "item_7": "Net sales grew in 2023."},
+    "0000320193-22-000108": {"item_1": "Apple designs computers.", "item_7": "Net sales grew in 2022."},
+    "0000320193-21-000105": {"item_1": "Apple designs tablets.", "item_7": "Net sales grew in 2021."},
+}
+
+
+class TestRefresh(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.source_directory = os.path.join(self.tmp_dir.name, "filings")
+        self.persist_directory = os.path.join(self.tmp_dir.name, "db")
+        self.items = {accession: dict(items) for accession, items in ITEMS.items()}
+        self.recent = ["0000320193-22-000108", "0000320193-21-000105"]
+        self.extracted = []
+        for accession in ITEMS:
+            self._write_filing(accession)
+
+        patches = [
+            patch('src.db.K10.SOURCE_SEC_DIRECTORY', self.source_directory),
+            patch('src.db.K10.filings_catalog', FilingsCatalog(os.path.join(self.tmp_dir.name, "missing", "filings.db"))),
+            patch('src.db.K10.get_recent_folders', side_effect=lambda symbol, num_years: self.recent[:num_years]),
+            patch('src.db.K10.extract_filing', side_effect=self._extract_filing),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write_filing(self, accession):
+        folder = os.path.join(self.source_directory, "AAPL", "10-K", accession)
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, "primary-document.html"), 'w') as f:
+            f.write(repr(self.items[accession]))
+
+    def _extract_filing(self, symbol, doc_path, save_to_txt_files=False, cache=None, document_hash=None, year=None):
+        accession = os.path.basename(os.path.dirname(doc_path))
+        self.extracted.append(accession)
+        year = str(year) if year else "20" + accession.split('-')[1]
+        return {key: {"year": year, "content": content} for key, content in self.items[accession].items()}, False
+
+    def _get_db(self):
+        return K10_DB(self.persist_directory, "AAPL", DeterministicEmbeddings(32), save_to_txt_files=False, num_years=2)
+
+    def _get_stored(self, db):
+        return sorted((metadata["year"], metadata["type"]) for metadata in db.db.get(include=["metadatas"])["metadatas"])
+
+    def test_build_then_refresh_incrementally(self):
+        db = self._get_db()
+        self.assertEqual(db.get_available_years(), ["2021", "2022"])
+        self.assertEqual(len(self._get_stored(db)), 4)
+        # the manifest keeps the most years refreshed for
+        self.assertEqual(db.manifest["num_years"], 2)
+
+        # nothing changed: nothing is extracted again
+        self.extracted = []
+        self.assertEqual(self._get_db().refresh(), {"added": [], "updated": [], "removed": []})
+        self.assertEqual(self.extracted, [])
+
+        # a new fiscal year: one filing added, the oldest year is removed
+        self.recent = ["0000320193-23-000106", "0000320193-22-000108", "0000320193-21-000105"]
+        db = self._get_db()
+        self.assertEqual(db.refresh(), {"added": ["0000320193-23-000106"], "updated": [], "removed": ["0000320193-21-000105"]})
+        self.assertEqual(self.extracted, ["0000320193-23-000106"])
+        self.assertEqual(db.get_available_years(), ["2022", "2023"])
+        self.assertEqual(sorted(db.manifest["filings"]), ["0000320193-22-000108", "0000320193-23-000106"])
+        self.assertEqual(self._get_stored(db), [("2022", "item_1"), ("2022", "item_7"), ("2023", "item_1"), ("2023", "item_7")])
+        # the lexical index follows the vector store
+        self.assertEqual(sorted(db.lexical_index.documents), sorted(db.db.get(include=[])["ids"]))
+        self.assertEqual(sorted(self._get_db().lexical_index.documents), sorted(db.db.get(include=[])["ids"]))
+
+    def test_only_changed_items_are_embedded_again(self):
+        self._get_db()
+        self.items["0000320193-22-000108"]["item_7"] = "Net sales were restated."
+        self._write_filing("0000320193-22-000108")
+
+        db = self._get_db()
+        self.assertEqual(db.refresh()["updated"], ["0000320193-22-000108"])
+        self.assertEqual([doc.metadata["type"] for doc in db.docs], ["item_7"])
+        self.assertEqual(len(self._get_stored(db)), 4)
+        stored = db.db.get(where={"$and": [{"year": "2022"}, {"type": "item_7"}]})["documents"]
+        self.assertEqual(stored, ["Net sales were restated."])
+
+    def test_fewer_years_keep_the_other_years(self):
+        self._get_db()
+        db = K10_DB(self.persist_directory, "AAPL", DeterministicEmbeddings(32), save_to_txt_files=False, num_years=1)
+        self.assertEqual(db.refresh(), {"added": [], "updated": [], "removed": []})
+        self.assertEqual(db.get_available_years(), ["2021", "2022"])
+        self.assertEqual(len(self._get_stored(db)), 4)
+        # the manifest keeps the most years refreshed for
+        self.assertEqual(db.manifest["num_years"], 2)
+
+        # a new fiscal year: the db still keeps the 2 most recent years, older ones are removed
+        self.recent = ["0000320193-23-000106", "0000320193-22-000108", "0000320193-21-000105"]
+        self.assertEqual(db.refresh(), {"added": ["0000320193-23-000106"], "updated": [], "removed": ["0000320193-21-000105"]})
+        self.assertEqual(db.get_available_years(), ["2022", "2023"])
+        self.assertEqual(len(self._get_stored(db)), 4)
+        self.assertNotIn("2021", {document["metadata"]["year"] for document in db.lexical_index.documents.values()})
+
+    def test_amended_filing_replaces_the_year(self):
+        self._get_db()
+        self.items["0000320193-22-000200"] = {"item_1": "Apple designs computers.", "item_7": "Net sales were amended."}
+        self._write_filing("0000320193-22-000200")
+        self.recent = ["0000320193-22-000200", "0000320193-21-000105"]
+
+        db = self._get_db()
+        self.assertEqual(db.refresh(), {"added": ["0000320193-22-000200"], "updated": [], "removed": ["0000320193-22-000108"]})
+        self.assertEqual(sorted(db.manifest["filings"]), ["0000320193-21-000105", "0000320193-22-000200"])
+        self.assertEqual(len(self._get_stored(db)), 4)
+        stored = db.db.get(where={"$and": [{"year": "2022"}, {"type": "item_7"}]})["documents"]
+        self.assertEqual(stored, ["Net sales were amended."])
+
+    def test_fiscal_years_come_from_the_catalog(self):
+        # a late filer: the 10-K of fiscal 2022 is filed in 2023, like the one of fiscal 2023
+        self.items["0000320193-23-000050"] = {"item_1": "Apple designs computers.", "item_7": "Net sales grew in 2022."}
+        self._write_filing("0000320193-23-000050")
+        self.recent = ["0000320193-23-000106", "0000320193-23-000050"]
+        catalog = FilingsCatalog(os.path.join(self.tmp_dir.name, "filings.db"))
+        for accession, fiscal_year, filing_date in (("0000320193-23-000106", 2023, "2023-11-03"),
+                                                    ("0000320193-23-000050", 2022, "2023-02-15")):
+            path = os.path.join(self.source_directory, "AAPL", "10-K", accession, "primary-document.html")
+            catalog.upsert("AAPL", 320193, "10-K", accession, fiscal_year, filing_date, path, os.path.getsize(path), accession)
+
+        with patch('src.db.K10.filings_catalog', catalog):
+            db = self._get_db()
+        self.assertEqual(db.get_available_years(), ["2022", "2023"])
+        self.assertEqual(sorted(db.manifest["filings"]), ["0000320193-23-000050", "0000320193-23-000106"])
+        self.assertEqual(db.manifest["filings"]["0000320193-23-000050"]["year"], "2022")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import patch
+from langchain_core.structured_query import Comparator, Comparison, StructuredQuery
+from src.db.K10 import K10_DB, ScopedChromaTranslator
+from src.db.migrate import migrate
+from src.models.embeddings import DeterministicEmbeddings
+from src.sec.catalog import FilingsCatalog
+
+ITEMS = {
+    "AAPL": {
+        "0000320193-23-000106": {"item_1": "Apple designs smartphones.", "item_7": "Net sales grew in 2023."},
+        "0000320193-22-000108": {"item_1": "Apple designs computers.", "item_7": "Net sales grew in 2022."},
+    },
+    "MSFT": {
+        "0000789019-23-000095": {"item_1": "Microsoft develops software.", "item_7": "Cloud revenue grew in 2023."},
+    },
+}
+
+
+class TestSharedLayout(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.source_directory = os.path.join(self.tmp_dir.name, "filings")
+        self.shared_directory = os.path.join(self.tmp_dir.name, "shared")
+        self.per_symbol_directory = os.path.join(self.tmp_dir.name, "dbs")
+        for symbol, filings in ITEMS.items():
+            for accession, items in filings.items():
+                folder = os.path.join(self.source_directory, symbol, "10-K", accession)
+                os.makedirs(folder, exist_ok=True)
+                with open(os.path.join(folder, "primary-document.html"), 'w') as f:
+                    f.write(repr(items))
+
+        patches = [
+            patch('src.db.K10.SOURCE_SEC_DIRECTORY', self.source_directory),
+            patch('src.db.K10.filings_catalog', FilingsCatalog(os.path.join(self.tmp_dir.name, "missing", "filings.db"))),
+            patch('src.db.K10.get_recent_folders', side_effect=lambda symbol, num_years: list(ITEMS[symbol])[:num_years]),
+            patch('src.db.K10.extract_filing', side_effect=self._extract_filing),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _extract_filing(self, symbol, doc_path, save_to_txt_files=False, cache=None, document_hash=None, year=None):
+        accession = os.path.basename(os.path.dirname(doc_path))
+        year = "20" + accession.split('-')[1]
+        return {key: {"year": year, "content": content} for key, content in ITEMS[symbol][accession].items()}, False
+
+    def _get_db(self, symbol, persist_directory=None, layout="shared"):
+        return K10_DB(persist_directory or self.shared_directory, symbol, DeterministicEmbeddings(32),
+                      save_to_txt_files=False, num_years=2, layout=layout)
+
+    def _get_stored(self, db, symbol):
+        metadatas = db.db.get(where={"symbol": symbol}, include=["metadatas"])["metadatas"]
+        return sorted((metadata["year"], metadata["type"]) for metadata in metadatas)
+
+    def test_symbols_share_one_collection(self):
+        aapl = self._get_db("AAPL")
+        msft = self._get_db("MSFT")
+        self.assertEqual(aapl.get_available_years(), ["2022", "2023"])
+        self.assertEqual(msft.get_available_years(), ["2023"])
+        self.assertEqual(len(aapl.db.get(include=[])["ids"]), 6)
+        self.assertEqual(self._get_stored(msft, "MSFT"), [("2023", "item_1"), ("2023", "item_7")])
+        self.assertGreater(aapl.get_size(), msft.get_size())
+
+        # removing the chunks of a symbol leaves the other ones alone
+        aapl._delete_chunks("2023")
+        self.assertEqual(self._get_stored(aapl, "AAPL"), [("2022", "item_1"), ("2022", "item_7")])
+        self.assertEqual(len(self._get_stored(msft, "MSFT")), 2)
+
+    def test_scoped_translator_keeps_the_symbol_filter(self):
+        translator = ScopedChromaTranslator({"symbol": "AAPL"})
+        query = StructuredQuery(query="sales", filter=Comparison(comparator=Comparator.EQ, attribute="year", value="2023"), limit=None)
+        self.assertEqual(translator.visit_structured_query(query)[1],
+                         {"filter": {"$and": [{"symbol": "AAPL"}, {"year": {"$eq": "2023"}}]}})
+        query = StructuredQuery(query="sales", filter=None, limit=None)
+        self.assertEqual(translator.visit_structured_query(query)[1], {"filter": {"symbol": "AAPL"}})
+        self.assertEqual(ScopedChromaTranslator().visit_structured_query(query)[1], {})
+
+        # the scoped filter only returns the documents of the symbol
+        self._get_db("AAPL")
+        msft = self._get_db("MSFT")
+        _, kwargs = ScopedChromaTranslator(msft._get_scope()).visit_structured_query(query)
+        docs = msft.db.similarity_search("Apple designs smartphones", k=10, **kwargs)
+        self.assertEqual({doc.metadata["symbol"] for doc in docs}, {"MSFT"})
+
+    def test_migrate_per_symbol_dbs(self):
+        for symbol in ITEMS:
+            self._get_db(symbol, os.path.join(self.per_symbol_directory, symbol, "10-K_items_1_1a_7_7a_8"), "per_symbol")
+
+        result = migrate(base_directory=self.per_symbol_directory, shared_directory=self.shared_directory)
+        self.assertEqual(result, {"migrated": {"AAPL": 4, "MSFT": 2}, "failed": {}})
+
+        # the migrated manifests are used, nothing is indexed again
+        aapl = self._get_db("AAPL")
+        self.assertEqual(aapl.get_available_years(), ["2022", "2023"])
+        self.assertEqual(aapl.refresh(), {"added": [], "updated": [], "removed": []})
+        self.assertEqual(len(self._get_stored(aapl, "AAPL")), 4)
+        self.assertIn("AAPL-2023-item_1-0", aapl.db.get(include=[])["ids"])
+
+
+if __name__ == '__main__':
+    unittest.main()
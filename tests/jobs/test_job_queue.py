@@ -0,0 +1,118 @@
+import unittest
+import os
+import time
+import tempfile
+from unittest.mock import patch
+from src.jobs.queue import JobQueue, STAGES
+from src.jobs.worker import run_worker
+
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "jobs.db")
+        self.queue = JobQueue(self.path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_submit_deduplicates_active_jobs(self):
+        job = self.queue.submit("AAPL", "10-K", 3)
+        self.assertEqual(job["status"], "pending")
+        self.assertEqual(job["progress"], {stage: {"status": "pending"} for stage in STAGES})
+        self.assertEqual(self.queue.submit("AAPL", "10-K", 3)["id"], job["id"])
+        self.assertNotEqual(self.queue.submit("MSFT", "10-K", 3)["id"], job["id"])
+
+        # a finished job is not active anymore
+        self.queue.finish(job["id"])
+        self.assertIsNone(self.queue.get_active("AAPL", "10-K"))
+        self.assertNotEqual(self.queue.submit("AAPL", "10-K", 3)["id"], job["id"])
+
+    def test_one_job_per_symbol_whatever_the_number_of_years(self):
+        job = self.queue.submit("AAPL", "10-K", 3)
+        # the pending job is extended to the most years asked for
+        self.assertEqual(self.queue.submit("AAPL", "10-K", 5)["id"], job["id"])
+        self.assertEqual(self.queue.submit("AAPL", "10-K", 2)["num_years"], 5)
+        self.assertEqual(self.queue.claim()["num_years"], 5)
+
+        # the running job covers fewer years, more years wait for it
+        self.assertEqual(self.queue.submit("AAPL", "10-K", 4)["id"], job["id"])
+        more = self.queue.submit("AAPL", "10-K", 7)
+        self.assertNotEqual(more["id"], job["id"])
+        self.assertEqual(self.queue.get_active("AAPL", "10-K")["id"], more["id"])
+        self.assertIsNone(self.queue.claim())
+        self.queue.finish(job["id"])
+        self.assertEqual(self.queue.claim()["id"], more["id"])
+
+    def test_claim_and_progress(self):
+        first = self.queue.submit("AAPL")
+        second = self.queue.submit("MSFT")
+        self.assertEqual(self.queue.claim()["id"], first["id"])
+        self.assertEqual(self.queue.claim()["id"], second["id"])
+        self.assertIsNone(self.queue.claim())
+
+        self.queue.set_stage(first["id"], "download")
+        self.queue.set_stage(first["id"], "parse", "0000320193-23-000106")
+        self.queue.set_stage(first["id"], "embed", "0000320193-23-000106")
+        self.queue.set_stage(first["id"], "parse", "0000320193-22-000108")
+        job = self.queue.get(first["id"])
+        self.assertEqual((job["status"], job["stage"]), ("running", "parse"))
+        self.assertEqual(job["progress"], {
+            "download": {"status": "done"},
+            "parse": {"status": "running", "detail": "0000320193-22-000108"},
+            "embed": {"status": "pending", "detail": "0000320193-23-000106"},
+            "index": {"status": "pending"},
+        })
+
+        self.queue.fail(second["id"], ValueError("Unknown ticker"))
+        job = self.queue.get(second["id"])
+        self.assertEqual((job["status"], job["error"]), ("failed", "Unknown ticker"))
+        self.assertIsNone(self.queue.get("missing"))
+
+    def test_jobs_of_stopped_workers_are_requeued(self):
+        queue = JobQueue(self.path, lease_seconds=0.2)
+        job = queue.submit("AAPL")
+        queue.claim()
+        # the job of a live worker is left to it
+        for _ in range(3):
+            time.sleep(0.1)
+            queue.heartbeat(job["id"])
+            self.assertIsNone(queue.claim())
+        # without heartbeats the lease expires
+        time.sleep(0.3)
+        self.assertEqual(queue.claim()["id"], job["id"])
+
+
+class TestWorker(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "jobs.db")
+        self.queue = JobQueue(self.path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _ingest(self, symbol, filing_type, num_years, progress=None):
+        if symbol == "FAIL":
+            raise ValueError("Unknown ticker")
+        for stage in STAGES:
+            progress(stage)
+            self.seen.append(self.queue.get(self.job_id)["stage"])
+
+    def test_jobs_are_run_with_their_progress(self):
+        self.seen = []
+        self.job_id = self.queue.submit("AAPL")["id"]
+        failed_id = self.queue.submit("FAIL")["id"]
+        with patch('src.jobs.worker.ingest', side_effect=self._ingest):
+            run_worker(self.path, poll_seconds=0, max_jobs=2)
+
+        self.assertEqual(self.seen, list(STAGES))
+        job = self.queue.get(self.job_id)
+        self.assertEqual(job["status"], "done")
+        self.assertEqual({stage["status"] for stage in job["progress"].values()}, {"done"})
+        job = self.queue.get(failed_id)
+        self.assertEqual((job["status"], job["error"]), ("failed", "Unknown ticker"))
+
+
+if __name__ == '__main__':
+    unittest.main()
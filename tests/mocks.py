@@ -6,6 +6,18 @@ class MockQueryEngine:
         self.save_to_txt_files = save_to_txt_files
         self.num_years = num_years
 
+    @staticmethod
+    def is_ready(symbol, type="10-K", num_years=3):
+        return True
+
+    @staticmethod
+    def is_stale(symbol, type="10-K"):
+        return False
+
+    @classmethod
+    async def acreate(cls, symbol, type, key, save_to_txt_files=True, num_years=3):
+        return cls(symbol, type, key, save_to_txt_files, num_years)
+
     def query(self):
         if self.key in self.get_all_queries():
             return {
@@ -13,7 +25,18 @@ class MockQueryEngine:
         } 
         else:
             raise ValueError("Invalid query key")
-        
+
+
+    async def aquery(self):
+        return self.query()
+
+
+    async def astream_query(self):
+        result = self.query()
+        yield "context", []
+        yield "token", "query result"
+        yield "complete", result
+
 
     def get_all_queries(self):
         return ["risk_factors", "business_description"]
@@ -0,0 +1,132 @@
+import unittest
+import os
+import sqlite3
+import tempfile
+from langchain_core.embeddings import Embeddings
+import numpy as np
+from src.models.embeddings import CachedEmbeddings, BatchedEmbeddings, DeterministicEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    """Embeds a text as [length, number of spaces, 0.5, ...] and counts the texts embedded."""
+    model = "counting"
+
+    def __init__(self, size=4):
+        self.size = size
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), float(text.count(" "))] + [0.5] * (self.size - 2) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class TestCachedEmbeddings(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "embeddings.db")
+        self.inner = CountingEmbeddings()
+        self.embeddings = CachedEmbeddings(self.inner, path=self.path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_only_new_texts_are_embedded(self):
+        first = self.embeddings.embed_documents(["risk factors", "business", "risk factors"])
+        self.assertEqual(self.inner.embedded, ["risk factors", "business"])
+        self.assertEqual(first[0], [12.0, 1.0, 0.5, 0.5])
+        self.assertEqual(first[0], first[2])
+
+        # a new instance reads the vectors back from disk
+        embeddings = CachedEmbeddings(self.inner, path=self.path)
+        self.assertEqual(embeddings.embed_documents(["business", "md&a"]), [[8.0, 0.0, 0.5, 0.5], [4.0, 0.0, 0.5, 0.5]])
+        self.assertEqual(self.inner.embedded, ["risk factors", "business", "md&a"])
+        self.assertEqual((embeddings.hits, embeddings.misses), (1, 1))
+        self.assertEqual(embeddings.embed_query("md&a"), [4.0, 0.0, 0.5, 0.5])
+
+    def test_model_is_part_of_the_key(self):
+        other = CountingEmbeddings()
+        other.model = "other"
+        self.assertNotEqual(self.embeddings.get_key("text"), CachedEmbeddings(other, path=self.path).get_key("text"))
+
+    def test_least_recently_used_are_evicted(self):
+        # 4 float32 = 16 bytes per vector, room for 3 vectors
+        embeddings = CachedEmbeddings(self.inner, path=self.path, max_bytes=48)
+        embeddings.embed_documents(["a", "b", "c"])
+        embeddings.embed_documents(["a"])
+        embeddings.embed_documents(["d"])
+        self.inner.embedded = []
+        embeddings.embed_documents(["a", "d"])
+        self.assertEqual(self.inner.embedded, [])
+        embeddings.embed_documents(["b"])
+        self.assertEqual(self.inner.embedded, ["b"])
+
+    def test_cache_is_not_locked_while_embedding(self):
+        self.embeddings.embed_documents(["business"])
+        other = CachedEmbeddings(CountingEmbeddings(), path=self.path)
+        conn = sqlite3.connect(self.path, timeout=0)
+
+        class ConcurrentEmbeddings(CountingEmbeddings):
+            # another process writes to the cache while the remote call runs
+            def embed_documents(inner, texts):
+                self.assertEqual(other.embed_query("business"), [8.0, 0.0, 0.5, 0.5])
+                conn.execute("UPDATE embeddings SET last_used = 0")
+                conn.commit()
+                return super().embed_documents(texts)
+
+        embeddings = CachedEmbeddings(ConcurrentEmbeddings(), path=self.path)
+        self.assertEqual(embeddings.embed_documents(["business", "md&a"]), [[8.0, 0.0, 0.5, 0.5], [4.0, 0.0, 0.5, 0.5]])
+        conn.close()
+
+
+class FlakyEmbeddings(CountingEmbeddings):
+    """Fails the first call."""
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.calls == 1:
+            raise ConnectionError("rate limited")
+        return super().embed_documents(texts)
+
+
+class TestBatchedEmbeddings(unittest.TestCase):
+    def test_batches_by_tokens_and_size(self):
+        long_text = "word " * 1000
+        embeddings = BatchedEmbeddings(CountingEmbeddings(), batch_tokens=1500, batch_size=3)
+        batches = embeddings.get_batches([long_text, long_text, "a", "b", "c", "d"])
+        self.assertEqual([(start, len(texts)) for start, texts, _ in batches], [(0, 1), (1, 3), (4, 2)])
+
+    def test_concurrent_batches_keep_the_order(self):
+        texts = [f"text {'x' * index}" for index in range(50)]
+        embeddings = BatchedEmbeddings(CountingEmbeddings(), batch_size=4, max_concurrency=4)
+        self.assertEqual(embeddings.embed_documents(texts), CountingEmbeddings().embed_documents(texts))
+
+    def test_failed_batches_are_retried(self):
+        inner = FlakyEmbeddings()
+        embeddings = BatchedEmbeddings(inner, backoff=0.01)
+        self.assertEqual(embeddings.embed_documents(["a b"]), [[3.0, 1.0, 0.5, 0.5]])
+        self.assertEqual(inner.calls, 2)
+
+        embeddings = BatchedEmbeddings(FlakyEmbeddings(), max_retries=0)
+        with self.assertRaises(ConnectionError):
+            embeddings.embed_documents(["a b"])
+
+
+class TestDeterministicEmbeddings(unittest.TestCase):
+    def test_vectors_are_deterministic_and_similar_for_similar_texts(self):
+        embeddings = DeterministicEmbeddings(size=64)
+        risk, risk_again, revenue = embeddings.embed_documents([
+            "supply chain risk factors", "risk factors of the supply chain", "net revenue by segment"
+        ])
+        self.assertEqual(len(risk), 64)
+        self.assertEqual(risk, DeterministicEmbeddings(size=64).embed_query("supply chain risk factors"))
+        self.assertGreater(np.dot(risk, risk_again), np.dot(risk, revenue))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import asyncio
+import os
+import time
+import tempfile
+from unittest.mock import patch
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda, RunnableParallel, RunnablePassthrough
+from src.db.manifest import build_manifest
+from src.queries.cache import ResultCache
+from src.queries.K10 import K10Query
+from src.queries.QueryEngine import QueryEngine
+
+DOCS = [Document(id="AAPL-2023-Item 1-0", page_content="Apple designs smartphones.", metadata={"year": "2023", "type": "Item 1"})]
+SLOW_SECONDS = 0.2
+
+
+async def slow_answer(inputs):
+    # an LLM call, awaited without blocking the event loop
+    await asyncio.sleep(SLOW_SECONDS)
+    return "Doing fine."
+
+
+def open_db(engine):
+    # stands for the download, parsing and indexing of the filings, all blocking
+    time.sleep(SLOW_SECONDS)
+    engine.db = None
+    engine.manifest = build_manifest(engine.symbol, {"2023": {"Item 1": 1}}, {}, "model")
+    engine.available_docs = [{"year": "2023", "type": "Item 1", "chunks": 1}]
+    engine.available_years = ["2023"]
+    engine.retriever = RunnableParallel(
+        {"context": RunnableLambda(lambda query: DOCS), "question": RunnablePassthrough()}
+    ).assign(answer=RunnableLambda(slow_answer))
+
+
+class TestAsyncQueryEngine(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        patches = [
+            patch('src.queries.QueryEngine.result_cache', ResultCache(os.path.join(self.tmp_dir.name, "results.db"))),
+            patch.object(QueryEngine, '_init_db', open_db),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_acreate_does_not_block_the_event_loop(self):
+        async def run():
+            ticks = 0
+
+            async def tick():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            ticker = asyncio.create_task(tick())
+            engine = await QueryEngine.acreate("AAPL", key="Overview")
+            ticker.cancel()
+            return engine, ticks
+
+        engine, ticks = asyncio.run(run())
+        self.assertGreater(ticks, 5)
+        self.assertIsInstance(engine.queryInstance, K10Query)
+        self.assertEqual(engine.available_years, ["2023"])
+
+    def test_concurrent_aquery(self):
+        async def run():
+            engines = [await QueryEngine.acreate(symbol, key="Overview") for symbol in ("AAPL", "MSFT")]
+            start = time.perf_counter()
+            results = await asyncio.gather(*(engine.aquery() for engine in engines))
+            return results, time.perf_counter() - start
+
+        results, elapsed = asyncio.run(run())
+        self.assertEqual([result["answer"] for result in results], ["Doing fine.", "Doing fine."])
+        self.assertEqual(results[0]["context"], DOCS)
+        # both LLM calls ran at the same time
+        self.assertLess(elapsed, 2 * SLOW_SECONDS)
+
+    def test_aquery_uses_the_result_cache(self):
+        async def run():
+            engine = await QueryEngine.acreate("AAPL", key="Overview")
+            first = await engine.aquery()
+            engine = await QueryEngine.acreate("AAPL", key="Overview")
+            engine.retriever = RunnableLambda(lambda query: self.fail("the cached result should be used"))
+            return first, await engine.aquery()
+
+        first, second = asyncio.run(run())
+        self.assertEqual(first, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock, patch
+from src.db.manifest import build_manifest
+from src.db.pool import LRUPool
+from src.queries.QueryEngine import QueryEngine
+
+CHUNKS = {"2021": {"Item 1": 1}, "2022": {"Item 1": 1}, "2023": {"Item 1": 1}}
+
+
+class TestQueryEnginePool(unittest.TestCase):
+    def setUp(self):
+        self.manifest = build_manifest("AAPL", CHUNKS, {}, "model", num_years=3)
+        self.opened = []
+        patches = [
+            patch('src.queries.QueryEngine.db_pool', LRUPool()),
+            patch('src.queries.QueryEngine.K10_DB', side_effect=self._open),
+            patch('src.queries.QueryEngine.get_embeddings', Mock()),
+            patch('src.queries.QueryEngine.ingest', side_effect=AssertionError("the engine should not ingest the filings")),
+            patch('src.queries.QueryEngine.read_manifest', side_effect=lambda directory: self.manifest),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _open(self, persist_directory, symbol, embeddings, save_to_txt_files, num_years):
+        # a db holding the years of the current manifest
+        db = Mock()
+        db.manifest = self.manifest
+        db.get_available_years.return_value = list(self.manifest["years"])
+        db.get_available_documents.return_value = [
+            {"year": year, "type": "Item 1", "chunks": 1} for year in self.manifest["years"]
+        ]
+        db.get_retriever_chain.side_effect = lambda years, static_queries: f"chain {years}"
+        self.opened.append(db)
+        return db
+
+    def test_engines_share_the_db_of_a_symbol(self):
+        recent = QueryEngine("AAPL", key="Overview", num_years=1)
+        older = QueryEngine("AAPL", key="Overview", num_years=2)
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(recent.available_years, ["2023"])
+        self.assertEqual(older.available_years, ["2022", "2023"])
+        self.assertEqual([doc["year"] for doc in older.available_docs], ["2022", "2023"])
+        # each engine searches its own years
+        self.assertEqual(recent.retriever, "chain ['2023']")
+        self.assertEqual(older.retriever, "chain ['2022', '2023']")
+        self.assertEqual(QueryEngine("AAPL", key="Overview", num_years=1).retriever, recent.retriever)
+        self.assertEqual(self.opened[0].get_retriever_chain.call_count, 2)
+
+    def test_db_is_opened_again_when_its_manifest_changes(self):
+        QueryEngine("AAPL", key="Overview", num_years=3)
+        self.manifest = build_manifest("AAPL", {**CHUNKS, "2024": {"Item 1": 1}}, {}, "model", num_years=3)
+        engine = QueryEngine("AAPL", key="Overview", num_years=3)
+        self.assertEqual(len(self.opened), 2)
+        self.assertEqual(engine.available_years, ["2022", "2023", "2024"])
+
+    def test_ready_when_the_years_were_ingested(self):
+        self.assertTrue(QueryEngine.is_ready("AAPL", num_years=3))
+        self.assertFalse(QueryEngine.is_ready("AAPL", num_years=5))
+        # a symbol with fewer filings than the years asked for
+        self.manifest = build_manifest("AAPL", {"2023": {"Item 1": 1}}, {}, "model", num_years=5)
+        self.assertTrue(QueryEngine.is_ready("AAPL", num_years=5))
+        # manifests without num_years count their years
+        self.manifest = build_manifest("AAPL", CHUNKS, {}, "model")
+        self.assertTrue(QueryEngine.is_ready("AAPL", num_years=3))
+        self.assertFalse(QueryEngine.is_ready("AAPL", num_years=4))
+        self.manifest = None
+        self.assertFalse(QueryEngine.is_ready("AAPL", num_years=1))
+        self.assertFalse(QueryEngine.is_stale("AAPL"))
+
+    def test_missing_years_are_left_to_the_ingestion_jobs(self):
+        with self.assertRaises(ValueError):
+            QueryEngine("AAPL", key="Overview", num_years=5)
+        self.assertEqual(self.opened, [])
+
+    def test_stale_after_the_refresh_period(self):
+        self.assertFalse(QueryEngine.is_stale("AAPL"))
+        self.manifest["built_at"] = (datetime.now(timezone.utc) - timedelta(days=2)).isoformat(timespec="seconds")
+        self.assertTrue(QueryEngine.is_stale("AAPL"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import tempfile
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+from src.db.K10 import ScopedChromaTranslator
+from src.db.hybrid import HybridSelfQueryRetriever
+from src.db.numpy_store import NumpyVectorStore
+from src.models.embeddings import DeterministicEmbeddings
+from src.queries.K10 import K10Query, allowed_comparators
+from src.sec.K10 import RELEVANT_ITEMS
+
+
+class TestK10QueryFilters(unittest.TestCase):
+    def setUp(self):
+        self.k10_query = K10Query("AAPL", ["2021", "2022", "2023"])
+        self.translator = ScopedChromaTranslator()
+        self.translator.allowed_comparators = allowed_comparators
+
+    def _translate(self, key):
+        return self.translator.visit_structured_query(self.k10_query.get_structured_queries()[self.k10_query.get_query(key)])[1]
+
+    def test_every_query_has_a_filter(self):
+        self.assertEqual(set(self.k10_query.filters), set(self.k10_query.get_all_queries()))
+        self.assertEqual(self._translate("Overview"), {"filter": {"year": {"$eq": "2023"}}})
+        self.assertEqual(self._translate("SWOT"), {"filter": {"$and": [
+            {"year": {"$eq": "2023"}},
+            {"type": {"$in": ["Item 1", "Item 1A", "Item 7", "Item 7A", "Item 8"]}},
+        ]}})
+        self.assertEqual(self._translate("Risk Factors Years"), {"filter": {"$and": [
+            {"year": {"$in": ["2021", "2022", "2023"]}},
+            {"type": {"$in": ["Item 1A", "Item 7A"]}},
+        ]}})
+        with self.assertRaises(AttributeError):
+            self.k10_query.get_filter("Invalid")
+
+    def test_queries_retrieve_the_chunks_of_their_items(self):
+        queries = self.k10_query.get_structured_queries(chunks_per_item=2)
+        self.assertEqual(queries[self.k10_query.get_query("Overview")].limit, 2 * len(RELEVANT_ITEMS))
+        self.assertEqual(queries[self.k10_query.get_query("SWOT")].limit, 2 * 5)
+        # 2 items in each of the 3 years
+        self.assertEqual(queries[self.k10_query.get_query("Risk Factors Years")].limit, 2 * 6)
+
+    def test_queries_search_a_short_text(self):
+        for key, structured_query in zip(self.k10_query.filters, self.k10_query.get_structured_queries().values()):
+            self.assertEqual(structured_query.query, self.k10_query.search_queries[key])
+            self.assertNotIn("analysis", structured_query.query)
+            self.assertLess(len(structured_query.query), 100)
+
+    def test_no_filters_without_available_years(self):
+        k10_query = K10Query("AAPL")
+        self.assertIsNone(k10_query.get_filter("Overview"))
+        self.assertEqual(k10_query.get_structured_queries(), {})
+
+
+class TestStaticQueries(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = NumpyVectorStore(self.tmp_dir.name, DeterministicEmbeddings(16))
+        self.store.add_documents([
+            Document(page_content="Risks of the company.", metadata={"year": year, "type": item_type})
+            for year in ("2022", "2023") for item_type in ("Item 1", "Item 1A", "Item 9")
+        ])
+        self.k10_query = K10Query("AAPL", ["2022", "2023"])
+        self.constructor_calls = []
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _query_constructor(self, inputs):
+        self.constructor_calls.append(inputs["query"])
+        raise RuntimeError("the LLM query constructor should not be called")
+
+    def test_static_queries_skip_the_query_constructor(self):
+        translator = ScopedChromaTranslator()
+        translator.allowed_comparators = allowed_comparators
+        retriever = HybridSelfQueryRetriever(
+            structured_query_translator=translator,
+            query_constructor=RunnableLambda(self._query_constructor),
+            vectorstore=self.store,
+            search_kwargs={"k": 10},
+            static_queries=self.k10_query.get_structured_queries(),
+        )
+        docs = retriever.invoke(self.k10_query.get_query("SWOT"))
+        self.assertEqual(sorted((doc.metadata["year"], doc.metadata["type"]) for doc in docs),
+                         [("2023", "Item 1"), ("2023", "Item 1A")])
+        docs = retriever.invoke(self.k10_query.get_query("Risk Factors Years"))
+        self.assertEqual(sorted((doc.metadata["year"], doc.metadata["type"]) for doc in docs),
+                         [("2022", "Item 1A"), ("2023", "Item 1A")])
+        self.assertEqual(self.constructor_calls, [])
+        # the limit of the query replaces the k of free-form questions
+        query = self.k10_query.get_query("SWOT")
+        self.assertEqual(retriever._prepare_query(query, retriever.static_queries[query])[1]["k"], 4 * 5)
+
+        # free-form questions still go through the query constructor
+        with self.assertRaises(RuntimeError):
+            retriever.invoke("What are the risks?")
+        self.assertEqual(self.constructor_calls, ["What are the risks?"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import Mock, patch
+from langchain_core.documents import Document
+from src.db.manifest import build_manifest, get_fingerprint
+from src.queries.cache import ResultCache
+from src.queries.K10 import K10Query
+from src.queries.QueryEngine import QueryEngine
+
+RESULT = {
+    "context": [Document(id="AAPL-2023-Item 1-0", page_content="Apple designs smartphones.", metadata={"year": "2023", "type": "Item 1"})],
+    "question": "Overview",
+    "answer": "Apple is doing fine.",
+}
+FILINGS = {"0000320193-23-000106": {"year": "2023", "content_hash": "abc", "items": {"Item 1": "def"}}}
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(os.path.join(self.tmp_dir.name, "results.db"), max_entries=2)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_set_and_get(self):
+        key = ResultCache.get_key(symbol="AAPL", key="Overview")
+        self.assertEqual(key, ResultCache.get_key(key="Overview", symbol="AAPL"))
+        self.assertIsNone(self.cache.get(key))
+        self.cache.set(key, RESULT)
+        self.assertEqual(self.cache.get(key), RESULT)
+        self.assertIsInstance(self.cache.get(key)["context"][0], Document)
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 1))
+
+    def test_least_recently_used_are_evicted(self):
+        for name in ("a", "b"):
+            self.cache.set(name, {"answer": name})
+        self.cache.get("a")
+        self.cache.set("c", {"answer": "c"})
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), {"answer": "a"})
+        self.assertEqual(self.cache.get("c"), {"answer": "c"})
+
+    def test_fingerprint_follows_the_content(self):
+        manifest = build_manifest("AAPL", {"2023": {"Item 1": 1}}, FILINGS, "model")
+        rebuilt = dict(build_manifest("AAPL", {"2023": {"Item 1": 1}}, FILINGS, "model"), built_at="later")
+        self.assertEqual(get_fingerprint(manifest), get_fingerprint(rebuilt))
+        changed = {"0000320193-23-000106": dict(FILINGS["0000320193-23-000106"], content_hash="xyz")}
+        self.assertNotEqual(get_fingerprint(manifest), get_fingerprint(build_manifest("AAPL", {"2023": {"Item 1": 1}}, changed, "model")))
+
+
+class TestQueryEngineResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        cache_patch = patch('src.queries.QueryEngine.result_cache', ResultCache(os.path.join(self.tmp_dir.name, "results.db")))
+        cache_patch.start()
+        self.addCleanup(cache_patch.stop)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _get_engine(self, filings):
+        # engine over an already opened db, the retriever chain is the only LLM caller
+        engine = QueryEngine.__new__(QueryEngine)
+        engine.symbol, engine.type, engine.key = "AAPL", "10-K", "Overview"
+        engine.available_docs = [{"year": "2023", "type": "Item 1", "chunks": 1}]
+        engine.manifest = build_manifest("AAPL", {"2023": {"Item 1": 1}}, filings, "model")
+        engine.queryInstance = K10Query("AAPL", ["2023"])
+        engine.retriever = Mock()
+        engine.retriever.invoke.return_value = RESULT
+        return engine
+
+    def test_identical_queries_are_served_from_the_cache(self):
+        engine = self._get_engine(FILINGS)
+        self.assertEqual(engine.query(), RESULT)
+        engine = self._get_engine(FILINGS)
+        self.assertEqual(engine.query(), RESULT)
+        engine.retriever.invoke.assert_not_called()
+
+    def test_changed_content_is_queried_again(self):
+        self._get_engine(FILINGS).query()
+        changed = {"0000320193-23-000106": dict(FILINGS["0000320193-23-000106"], content_hash="xyz")}
+        engine = self._get_engine(changed)
+        engine.query()
+        engine.retriever.invoke.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
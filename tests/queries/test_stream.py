@@ -0,0 +1,72 @@
+import unittest
+import asyncio
+import os
+import tempfile
+from unittest.mock import patch
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda, RunnableParallel, RunnablePassthrough
+from src.db.manifest import build_manifest
+from src.queries.cache import ResultCache
+from src.queries.K10 import K10Query
+from src.queries.QueryEngine import QueryEngine
+
+DOCS = [Document(id="AAPL-2023-Item 1-0", page_content="Apple designs smartphones.", metadata={"year": "2023", "type": "Item 1"})]
+
+
+class TestStreamQuery(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(os.path.join(self.tmp_dir.name, "results.db"))
+        cache_patch = patch('src.queries.QueryEngine.result_cache', self.cache)
+        cache_patch.start()
+        self.addCleanup(cache_patch.stop)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _get_engine(self):
+        # same shape as the retriever chain of K10_DB, with a fake LLM streaming its answer
+        engine = QueryEngine.__new__(QueryEngine)
+        engine.symbol, engine.type, engine.key = "AAPL", "10-K", "Overview"
+        engine.available_docs = [{"year": "2023", "type": "Item 1", "chunks": 1}]
+        engine.manifest = build_manifest("AAPL", {"2023": {"Item 1": 1}}, {}, "model")
+        engine.queryInstance = K10Query("AAPL", ["2023"])
+        engine.retriever = RunnableParallel(
+            {"context": RunnableLambda(lambda query: DOCS), "question": RunnablePassthrough()}
+        ).assign(answer=RunnableLambda(lambda x: "prompt") | FakeListChatModel(responses=["Doing fine."]) | StrOutputParser())
+        return engine
+
+    def _collect(self, engine):
+        async def collect():
+            return [event async for event in engine.astream_query()]
+        return asyncio.run(collect())
+
+    def test_context_then_tokens_then_result(self):
+        events = self._collect(self._get_engine())
+        self.assertEqual(events[0], ("context", DOCS))
+        tokens = [value for event, value in events if event == "token"]
+        self.assertGreater(len(tokens), 1)
+        self.assertEqual("".join(tokens), "Doing fine.")
+        self.assertEqual(events[-1][0], "complete")
+        result = events[-1][1]
+        self.assertEqual(result["answer"], "Doing fine.")
+        self.assertEqual(result["context"], DOCS)
+        self.assertEqual(result["question"], K10Query("AAPL", ["2023"]).get_query("Overview"))
+
+    def test_cached_result_is_streamed_at_once(self):
+        result = self._collect(self._get_engine())[-1][1]
+        self.assertEqual(self._collect(self._get_engine()), [("context", DOCS), ("token", "Doing fine."), ("complete", result)])
+        self.assertEqual(self._get_engine().query(), result)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_invalid_key(self):
+        engine = self._get_engine()
+        engine.key = "Invalid"
+        with self.assertRaises(ValueError):
+            self._collect(engine)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import os
+import tempfile
+from src.sec.cache import ItemCache
+
+
+class TestItemCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = ItemCache(self.tmp_dir.name)
+        self.doc_path = os.path.join(self.tmp_dir.name, "primary-document.html")
+        with open(self.doc_path, "w") as f:
+            f.write("<html></html>")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_document_hash(self):
+        self.assertEqual(
+            ItemCache.get_document_hash(self.doc_path),
+            "b633a587c652d02386c4f16f8c6f6aab7352d97f16367c3c40576214372dd628"
+        )
+
+    def test_put_and_get(self):
+        items = {"Item 1": {"content": "Business text", "year": "2023"}}
+        document_hash = ItemCache.get_document_hash(self.doc_path)
+        self.assertIsNone(self.cache.get(document_hash))
+
+        path = self.cache.put(document_hash, items, symbol="AAPL")
+        self.assertTrue(path.endswith(".json.gz"))
+        self.assertEqual(self.cache.get(document_hash), items)
+
+    def test_parser_version_is_part_of_the_key(self):
+        document_hash = ItemCache.get_document_hash(self.doc_path)
+        self.cache.put(document_hash, {"Item 1": {"content": "old"}})
+        newer = ItemCache(self.tmp_dir.name, parser_version=self.cache.parser_version + 1)
+        self.assertIsNone(newer.get(document_hash))
+
+    def test_corrupted_entry(self):
+        document_hash = ItemCache.get_document_hash(self.doc_path)
+        path = self.cache.get_path(document_hash)
+        os.makedirs(os.path.dirname(path))
+        with open(path, "wb") as f:
+            f.write(b"not gzip")
+        self.assertIsNone(self.cache.get(document_hash))
+
+
+if __name__ == '__main__':
+    unittest.main()
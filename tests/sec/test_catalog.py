@@ -0,0 +1,72 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import patch
+from src.sec.catalog import FilingsCatalog
+from src.sec.sec import get_recent_folders, get_accession_year
+
+
+class TestFilingsCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.catalog = FilingsCatalog(os.path.join(self.tmp_dir.name, "filings.db"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _add(self, accession, fiscal_year, filing_date, symbol="AAPL"):
+        self.catalog.upsert(symbol, 320193, "10-K", accession, fiscal_year, filing_date,
+                            f"/data/{accession}/primary-document.html", 100, "0" * 64)
+
+    def test_missing_catalog_is_not_created(self):
+        self.assertEqual(self.catalog.get_recent("AAPL"), [])
+        self.assertFalse(os.path.exists(self.catalog.path))
+
+    def test_get_recent_orders_by_fiscal_year(self):
+        self._add("0000320193-24-000123", 2024, "2024-11-01")
+        self._add("0000320193-99-000105", 1999, "1999-12-10")
+        self._add("0000320193-23-000106", 2023, "2023-11-03")
+        self._add("0000789019-24-000001", 2024, "2024-07-30", symbol="MSFT")
+
+        filings = self.catalog.get_recent("AAPL", "10-K", num_years=2)
+        self.assertEqual([filing["accession"] for filing in filings], ["0000320193-24-000123", "0000320193-23-000106"])
+        self.assertEqual(len(self.catalog.get_all("AAPL")), 3)
+
+    def test_upsert_replaces_and_remove(self):
+        self._add("0000320193-23-000106", 2023, "2023-11-03")
+        self.catalog.upsert("AAPL", 320193, "10-K", "0000320193-23-000106", 2023, "2023-11-03", "/other", 200, "1" * 64)
+        filings = self.catalog.get_all("AAPL", "10-K")
+        self.assertEqual(len(filings), 1)
+        self.assertEqual(filings[0]["size"], 200)
+
+        self.catalog.remove("AAPL", "10-K", "0000320193-23-000106")
+        self.assertEqual(self.catalog.get_all("AAPL"), [])
+
+
+class TestGetRecentFolders(unittest.TestCase):
+    def test_accession_year(self):
+        self.assertEqual(get_accession_year("0000320193-98-000105"), 1998)
+        self.assertEqual(get_accession_year("0000320193-25-000079"), 2025)
+
+    def test_uses_catalog(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            catalog = FilingsCatalog(os.path.join(tmp_dir, "filings.db"))
+            catalog.upsert("AAPL", 320193, "10-K", "0000320193-25-000079", 2025, "2025-10-31", "/path", 1, "0" * 64)
+            with patch('src.sec.sec.filings_catalog', catalog), patch('os.listdir') as mock_listdir:
+                self.assertEqual(get_recent_folders("AAPL"), ["0000320193-25-000079"])
+                mock_listdir.assert_not_called()
+
+    @patch('os.path.exists')
+    @patch('os.listdir')
+    @patch('os.path.isdir')
+    def test_directory_scan_keeps_recent_years(self, mock_isdir, mock_listdir, mock_exists):
+        mock_exists.return_value = True
+        mock_isdir.return_value = True
+        mock_listdir.return_value = ['0000320193-98-000105', '0000320193-24-000123', '0000320193-25-000079']
+        with patch('src.sec.sec.filings_catalog', FilingsCatalog("/nonexistent/filings.db")):
+            folders = get_recent_folders("AAPL", num_years=3)
+        self.assertEqual(folders, ['0000320193-25-000079', '0000320193-24-000123', '0000320193-98-000105'])
+
+
+if __name__ == '__main__':
+    unittest.main()
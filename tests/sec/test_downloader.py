@@ -0,0 +1,152 @@
+import unittest
+import os
+import json
+import time
+import asyncio
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from src.sec.catalog import FilingsCatalog
+from src.sec.symbols import SymbolMaster
+from src.sec.sec import FilingsDownloader, RateLimiter, PRIMARY_DOCUMENT, FULL_SUBMISSION
+
+TICKERS = {"0": {"cik_str": 320193, "ticker": "AAPL", "title": "Apple Inc."}}
+
+SUBMISSIONS = {
+    "cik": "320193",
+    "filings": {
+        "recent": {
+            "accessionNumber": ["0000320193-23-000106", "0000320193-23-000077", "0000320193-22-000108"],
+            "form": ["10-K", "10-Q", "10-K"],
+            "filingDate": ["2023-11-03", "2023-08-04", "2022-10-28"],
+            "reportDate": ["2023-09-30", "2023-07-01", "2022-09-24"],
+            "primaryDocument": ["aapl-20230930.htm", "aapl-20230701.htm", "aapl-20220924.htm"],
+        },
+        "files": []
+    }
+}
+
+ETAG = '"submissions-v1"'
+
+
+class StubSECHandler(BaseHTTPRequestHandler):
+    """Serves a minimal EDGAR: company tickers, submissions (with ETag) and filing archives."""
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        if self.path == "/files/company_tickers.json":
+            return self._send(json.dumps(TICKERS).encode())
+        if self.path == "/submissions/CIK0000320193.json":
+            if self.headers.get("If-None-Match") == ETAG:
+                self.send_response(304)
+                self.end_headers()
+                return
+            return self._send(json.dumps(SUBMISSIONS).encode(), {"ETag": ETAG})
+        if self.path.startswith("/Archives/edgar/data/320193/"):
+            return self._send(f"document {self.path}".encode())
+        self.send_response(404)
+        self.end_headers()
+
+    def _send(self, body, headers=None):
+        self.send_response(200)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestFilingsDownloader(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubSECHandler)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubSECHandler.requests = []
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.catalog = FilingsCatalog(os.path.join(self.tmp_dir.name, "filings.db"))
+        self.downloader = FilingsDownloader(self.tmp_dir.name, www_url=self.url, data_url=self.url,
+                                            rate_limiter=RateLimiter(1000), catalog=self.catalog,
+                                            symbols=SymbolMaster(os.path.join(self.tmp_dir.name, "company_tickers.json"),
+                                                                 url=f"{self.url}/files/company_tickers.json"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_download_only_new_filings(self):
+        results = asyncio.run(self.downloader.download_many(["AAPL"]))
+        self.assertEqual(sorted(results["AAPL"]), ["0000320193-22-000108", "0000320193-23-000106"])
+
+        folder = os.path.join(self.tmp_dir.name, "AAPL", "10-K", "0000320193-23-000106")
+        with open(os.path.join(folder, PRIMARY_DOCUMENT)) as f:
+            self.assertEqual(f.read(), "document /Archives/edgar/data/320193/000032019323000106/aapl-20230930.htm")
+        self.assertTrue(os.path.exists(os.path.join(folder, FULL_SUBMISSION)))
+
+        manifest = self.downloader.load_manifest("AAPL")
+        self.assertEqual(manifest["cik"], 320193)
+        self.assertEqual(manifest["etag"], ETAG)
+        self.assertEqual(sorted(manifest["filings"]), ["0000320193-22-000108", "0000320193-23-000106"])
+
+        filings = self.catalog.get_recent("AAPL", "10-K", num_years=5)
+        self.assertEqual([filing["accession"] for filing in filings], ["0000320193-23-000106", "0000320193-22-000108"])
+        self.assertEqual(filings[0]["fiscal_year"], 2023)
+        self.assertEqual(filings[0]["cik"], 320193)
+        self.assertEqual(filings[0]["path"], os.path.join(folder, PRIMARY_DOCUMENT))
+
+        # the second call only asks for the submissions, which did not change
+        StubSECHandler.requests = []
+        results = asyncio.run(self.downloader.download_many(["AAPL"]))
+        self.assertEqual(results["AAPL"], [])
+        self.assertEqual(StubSECHandler.requests, ["/submissions/CIK0000320193.json"])
+
+    def test_download_without_details(self):
+        asyncio.run(self.downloader.download_many(["AAPL"], download_details=False))
+        folder = os.path.join(self.tmp_dir.name, "AAPL", "10-K", "0000320193-23-000106")
+        self.assertTrue(os.path.exists(os.path.join(folder, FULL_SUBMISSION)))
+        self.assertFalse(os.path.exists(os.path.join(folder, PRIMARY_DOCUMENT)))
+
+    def test_download_recent_primary_documents(self):
+        results = asyncio.run(self.downloader.download_many(["AAPL"], num_years=1, primary_only=True))
+        self.assertEqual(results["AAPL"], ["0000320193-23-000106"])
+        folder = os.path.join(self.tmp_dir.name, "AAPL", "10-K", "0000320193-23-000106")
+        self.assertTrue(os.path.exists(os.path.join(folder, PRIMARY_DOCUMENT)))
+        self.assertFalse(os.path.exists(os.path.join(folder, FULL_SUBMISSION)))
+        self.assertEqual(self.downloader.load_manifest("AAPL")["num_years"], 1)
+
+        # more years than the ones synced: the submissions are fetched again despite the ETag
+        results = asyncio.run(self.downloader.download_many(["AAPL"], num_years=2, primary_only=True))
+        self.assertEqual(results["AAPL"], ["0000320193-22-000108"])
+
+    def test_unknown_ticker_is_isolated(self):
+        results = asyncio.run(self.downloader.download_many(["ZZZZ", "AAPL"]))
+        self.assertIsInstance(results["ZZZZ"], ValueError)
+        self.assertEqual(len(results["AAPL"]), 2)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_rate_limiter_spaces_requests(self):
+        limiter = RateLimiter(20)
+
+        async def wait_many():
+            await asyncio.gather(*(limiter.wait() for _ in range(5)))
+
+        start = time.monotonic()
+        asyncio.run(wait_many())
+        # 5 requests at 20/s: the last one waits 4 intervals of 50ms
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+
+if __name__ == '__main__':
+    unittest.main()
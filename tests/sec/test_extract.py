@@ -0,0 +1,48 @@
+import unittest
+import os
+import tempfile
+from src.sec.cache import ItemCache
+from src.sec.extract import run_batch, extract_filing
+from tests.sec.test_k10_items import write_sample_filing
+
+
+class TestExtract(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = ItemCache(os.path.join(self.tmp_dir.name, "extracted"))
+        self.doc_path = write_sample_filing(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_extract_filing_uses_cache(self):
+        items, cached = extract_filing("AAPL", self.doc_path, cache=self.cache)
+        self.assertFalse(cached)
+        self.assertIn("Competition is intense.", items["Item 1A"]["content"])
+
+        cached_items, cached = extract_filing("AAPL", self.doc_path, cache=self.cache)
+        self.assertTrue(cached)
+        self.assertEqual(cached_items, items)
+
+    def test_run_batch(self):
+        lines = []
+        tasks = [
+            ("AAPL", "0000320193-23-000106", self.doc_path),
+            ("AAPL", "0000320193-22-000108", os.path.join(self.tmp_dir.name, "missing.html")),
+        ]
+        results = run_batch(tasks, workers=2, cache_directory=self.cache.directory, progress=lines.append)
+
+        # the missing filing fails alone, the other one is extracted
+        self.assertEqual(results["completed"], [("AAPL", "0000320193-23-000106")])
+        self.assertEqual(len(results["failed"]), 1)
+        self.assertEqual(results["failed"][0][:2], ("AAPL", "0000320193-22-000108"))
+        self.assertEqual(len(lines), 2)
+        self.assertIsNotNone(self.cache.get(self.cache.get_document_hash(self.doc_path)))
+
+        # a second run is served from the cache
+        results = run_batch(tasks[:1], workers=1, cache_directory=self.cache.directory, progress=lines.append)
+        self.assertEqual(results["cached"], [("AAPL", "0000320193-23-000106")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+import os
+import tempfile
+from src.sec.K10 import K10, RELEVANT_ITEMS
+
+SAMPLE_10K = """<html><body>
+<div><table>
+<tr><td><a href="#toc_1">Item 1.</a></td><td>Business</td><td>3</td></tr>
+<tr><td><a href="#toc_1a">Item 1A.</a></td><td>Risk Factors</td><td>5</td></tr>
+<tr><td><a href="#toc_2">Item 2.</a></td><td>Properties</td><td>9</td></tr>
+<tr><td><a href="#toc_7">Item 7.</a></td><td>Management's Discussion and Analysis</td><td>10</td></tr>
+<tr><td><a href="#toc_7a">Item 7A.</a></td><td>Quantitative and Qualitative Disclosures about Market Risk</td><td>12</td></tr>
+<tr><td><a href="#toc_8">Item 8.</a></td><td>Financial Statements and Supplementary Data</td><td>13</td></tr>
+<tr><td><a href="#toc_9">Item 9.</a></td><td>Changes in and Disagreements with Accountants on Accounting and Financial Disclosure</td><td>20</td></tr>
+<tr><td><a href="#toc_9a">Item 9A.</a></td><td>Controls and Procedures</td><td>21</td></tr>
+</table></div>
+<div id="toc_1"><span>Item 1. Business</span></div>
+<div>The Company designs <b>smartphones</b>.<div>Nested segment.</div>Trailing text.</div>
+<div>3</div>
+<div>Table of Contents</div>
+<div id="toc_1a">Item 1A. Risk Factors</div>
+<div>Competition is intense.</div>
+<!-- a comment that must be skipped -->
+<div id="toc_2">Item 2. Properties</div>
+<div>Headquarters in Cupertino.</div>
+<div id="toc_7">Item 7. MD&amp;A</div>
+<div>Net sales increased.</div>
+<div id="toc_7a">Item 7A. Market Risk</div>
+<div>Interest rate risk.</div>
+<div id="toc_8">Item 8. Financial Statements</div>
+<div><table><tr><td>Total net sales</td><td>383,285</td></tr></table></div>
+<div id="toc_9">Item 9. Changes in Accountants</div>
+<div>None.</div>
+<div id="toc_9a">Item 9A. Controls</div>
+<div>Controls are effective.</div>
+</body></html>
+"""
+
+
+def write_sample_filing(root, html=SAMPLE_10K, folder="0000320193-23-000106"):
+    folder_path = os.path.join(root, folder)
+    os.makedirs(folder_path, exist_ok=True)
+    doc_path = os.path.join(folder_path, "primary-document.html")
+    with open(doc_path, "w", encoding="utf-8") as f:
+        f.write(html)
+    return doc_path
+
+
+class TestK10(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.doc_path = write_sample_filing(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_extract_item_contents(self):
+        items = K10("AAPL", self.doc_path).extract_item_contents(save_to_txt_files=False)
+
+        self.assertEqual(list(items.keys()), list(RELEVANT_ITEMS.keys()))
+        self.assertEqual(items["Item 1"]["year"], "2023")
+        self.assertEqual(
+            items["Item 1"]["content"],
+            "Item 1. Business The Company designssmartphones. Nested segment. Trailing text."
+        )
+        self.assertEqual(items["Item 1A"]["content"], "Item 1A. Risk Factors Competition is intense.")
+        self.assertEqual(items["Item 7"]["content"], "Item 7. MD&A Net sales increased.")
+        self.assertEqual(items["Item 7A"]["content"], "Item 7A. Market Risk Interest rate risk.")
+        self.assertEqual(items["Item 8"]["content"], "Item 8. Financial Statements Total net sales383,285")
+        self.assertEqual(items["Item 9"]["content"], "Item 9. Changes in Accountants None.")
+
+    def test_extract_without_summary_table(self):
+        doc_path = write_sample_filing(self.tmp_dir.name, "<html><body><div>No table</div></body></html>",
+                                       folder="0000320193-22-000108")
+        items = K10("AAPL", doc_path).extract_item_contents(save_to_txt_files=False)
+
+        self.assertTrue(all(item["content"] == "" for item in items.values()))
+        self.assertEqual(items["Item 1"]["year"], "2022")
+
+    def test_lxml_engine_matches_bs4(self):
+        expected = K10("AAPL", self.doc_path).extract_item_contents(save_to_txt_files=False)
+        items = K10("AAPL", self.doc_path, engine="lxml").extract_item_contents(save_to_txt_files=False)
+        self.assertEqual(items, expected)
+
+    def test_prescan_matches_full_parse(self):
+        expected = K10("AAPL", self.doc_path).extract_item_contents(save_to_txt_files=False)
+        for engine in ("bs4", "lxml"):
+            extractor = K10("AAPL", self.doc_path, engine=engine, prescan=True)
+            self.assertIsNone(extractor.soup)
+            self.assertEqual(extractor.extract_item_contents(save_to_txt_files=False), expected)
+
+    def test_prescan_keeps_the_divs_spanning_an_anchor(self):
+        # the div of Item 1 runs past the anchor of Item 1A, and past the anchor of Item 2 for Item 1A
+        html = (SAMPLE_10K
+                .replace('<div id="toc_1a">Item 1A. Risk Factors</div>',
+                         '<div>Last words of Item 1. <span id="toc_1a">Item 1A. Risk Factors</span> Tail of the div.</div>')
+                .replace('<div>Competition is intense.</div>',
+                         '<div>Competition is intense.<div><p id="toc_2">Item 2. Properties</p>Nested tail.</div>Outer tail.</div>'))
+        doc_path = write_sample_filing(self.tmp_dir.name, html, folder="0000320193-24-000123")
+        expected = K10("AAPL", doc_path).extract_item_contents(save_to_txt_files=False)
+        self.assertIn("Tail of the div.", expected["Item 1"]["content"])
+        for engine in ("bs4", "lxml"):
+            items = K10("AAPL", doc_path, engine=engine, prescan=True).extract_item_contents(save_to_txt_files=False)
+            self.assertEqual(items, expected)
+
+    def test_prescan_reads_the_tables_nested_in_the_table_of_contents(self):
+        # a layout table nested in the table of contents, before its rows
+        html = SAMPLE_10K.replace('<div><table>\n', '<div><table>\n<tr><td><table><tr><td>Page</td></tr></table></td></tr>\n', 1)
+        doc_path = write_sample_filing(self.tmp_dir.name, html, folder="0000320193-24-000123")
+        expected = K10("AAPL", doc_path).extract_item_contents(save_to_txt_files=False)
+        self.assertEqual(expected["Item 1A"]["content"], "Item 1A. Risk Factors Competition is intense.")
+        for engine in ("bs4", "lxml"):
+            items = K10("AAPL", doc_path, engine=engine, prescan=True).extract_item_contents(save_to_txt_files=False)
+            self.assertEqual(items, expected)
+
+    def test_year_of_the_filing(self):
+        self.assertEqual(K10("AAPL", self.doc_path, year=2022).year, "2022")
+        doc_path = write_sample_filing(self.tmp_dir.name, folder="0000320193-98-000105")
+        self.assertEqual(K10("AAPL", doc_path).year, "1998")
+
+    def test_invalid_engine(self):
+        with self.assertRaises(ValueError):
+            K10("AAPL", self.doc_path, engine="invalid")
+
+    def test_instances_do_not_share_items(self):
+        K10("AAPL", self.doc_path).extract_item_contents(save_to_txt_files=False)
+        self.assertNotIn("content", RELEVANT_ITEMS["Item 1"])
+
+
+if __name__ == '__main__':
+    unittest.main()
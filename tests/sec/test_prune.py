@@ -0,0 +1,134 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import patch
+from src.db.K10 import K10_DB, get_persist_directory
+from src.db.manifest import build_manifest, write_manifest
+from src.db.pool import LRUPool
+from src.models.embeddings import DeterministicEmbeddings
+from src.sec.cache import ItemCache
+from src.sec.catalog import FilingsCatalog
+from src.sec.prune import prune
+from src.sec.sec import FilingsDownloader, PRIMARY_DOCUMENT, FULL_SUBMISSION
+from src.sec.xbrl import get_facts_path
+
+FILINGS = [
+    ("0000320193-23-000106", 2023, "2023-11-03"),
+    ("0000320193-22-000108", 2022, "2022-10-28"),
+    ("0000320193-21-000105", 2021, "2021-10-29"),
+]
+
+
+class TestPrune(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.base_directory = os.path.join(self.tmp_dir.name, "filings")
+        self.xbrl_directory = os.path.join(self.tmp_dir.name, "xbrl")
+        self.catalog = FilingsCatalog(os.path.join(self.tmp_dir.name, "filings.db"))
+        self.item_cache = ItemCache(os.path.join(self.tmp_dir.name, "extracted"))
+        downloader = FilingsDownloader(self.base_directory, catalog=self.catalog)
+
+        manifest = {"cik": 320193, "filings": {}}
+        for accession, fiscal_year, filing_date in FILINGS:
+            folder = self._get_folder(accession)
+            os.makedirs(folder)
+            doc_path = os.path.join(folder, PRIMARY_DOCUMENT)
+            with open(doc_path, 'w') as f:
+                f.write(f"<html>{accession}</html>" + " " * 1024 * 1024)
+            with open(os.path.join(folder, FULL_SUBMISSION), 'w') as f:
+                f.write("submission")
+            document_hash = ItemCache.get_document_hash(doc_path)
+            self.item_cache.put(document_hash, {"item_1": "business"})
+            facts_path = get_facts_path("AAPL", accession, "10-K", self.xbrl_directory)
+            os.makedirs(os.path.dirname(facts_path), exist_ok=True)
+            with open(facts_path, 'wb') as f:
+                f.write(b"facts")
+            self.catalog.upsert("AAPL", 320193, "10-K", accession, fiscal_year, filing_date,
+                                doc_path, os.path.getsize(doc_path), document_hash)
+            manifest["filings"][accession] = {"filing_date": filing_date}
+        downloader.save_manifest("AAPL", "10-K", manifest)
+        self.downloader = downloader
+
+        self.db_pool = LRUPool()
+        patches = [
+            patch('src.db.K10.DB_PERSIST_DIRECTORY', os.path.join(self.tmp_dir.name, "embeddings")),
+            patch('src.db.K10.get_embeddings', side_effect=lambda: DeterministicEmbeddings(32)),
+            patch('src.db.K10.db_pool', self.db_pool),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _get_folder(self, accession):
+        return os.path.join(self.base_directory, "AAPL", "10-K", accession)
+
+    def _prune(self, **kwargs):
+        return prune(base_directory=self.base_directory, catalog=self.catalog, item_cache=self.item_cache,
+                     xbrl_directory=self.xbrl_directory, **kwargs)
+
+    def test_prune_keeps_recent_years(self):
+        document_hash = self.catalog.get_all("AAPL")[-1]["content_hash"]
+        result = self._prune(keep_years=2)
+
+        self.assertEqual(result["evicted"], [("AAPL", "0000320193-21-000105")])
+        self.assertFalse(os.path.exists(self._get_folder("0000320193-21-000105")))
+        self.assertIsNone(self.item_cache.get(document_hash))
+        self.assertFalse(os.path.exists(get_facts_path("AAPL", "0000320193-21-000105", "10-K", self.xbrl_directory)))
+        self.assertEqual([filing["accession"] for filing in self.catalog.get_all("AAPL")],
+                         ["0000320193-23-000106", "0000320193-22-000108"])
+
+        manifest = self.downloader.load_manifest("AAPL")
+        self.assertEqual(sorted(manifest["filings"]), ["0000320193-22-000108", "0000320193-23-000106"])
+        self.assertEqual(manifest["num_years"], 2)
+
+        # the kept filings lose their full submission only
+        folder = self._get_folder("0000320193-23-000106")
+        self.assertTrue(os.path.exists(os.path.join(folder, PRIMARY_DOCUMENT)))
+        self.assertFalse(os.path.exists(os.path.join(folder, FULL_SUBMISSION)))
+
+    def test_prune_under_disk_budget(self):
+        result = self._prune(keep_years=3, disk_budget_mb=1.5)
+        # each filing takes about 1 MB, the two oldest go and the most recent one is kept
+        self.assertEqual(result["evicted"], [("AAPL", "0000320193-21-000105"), ("AAPL", "0000320193-22-000108")])
+        self.assertTrue(os.path.exists(self._get_folder("0000320193-23-000106")))
+
+    def _index_filings(self):
+        # a db holding an item of each filing
+        persist_directory = get_persist_directory("AAPL")
+        write_manifest(persist_directory, build_manifest("AAPL", {}, {}, "DeterministicEmbeddings"))
+        db = K10_DB(persist_directory, "AAPL", DeterministicEmbeddings(32), save_to_txt_files=False)
+        chunks, filings = {}, {}
+        for accession, fiscal_year, _ in FILINGS:
+            year = str(fiscal_year)
+            chunks[year] = db._add_items(year, {"Item 1": {"content": f"Business in {year}."}})
+            filings[accession] = {"year": year, "content_hash": accession, "items": {}}
+        db.lexical_index.save()
+        db._write_manifest(chunks, filings, 3)
+        return db
+
+    def test_prune_removes_the_chunks_of_evicted_filings(self):
+        self._index_filings()
+        self.db_pool.get(("AAPL", "10-K"), lambda: "entry")
+        self._prune(keep_years=2)
+
+        db = K10_DB(get_persist_directory("AAPL"), "AAPL", DeterministicEmbeddings(32), save_to_txt_files=False)
+        self.assertEqual(db.get_available_years(), ["2022", "2023"])
+        self.assertEqual(sorted(db.manifest["filings"]), ["0000320193-22-000108", "0000320193-23-000106"])
+        self.assertEqual(db.manifest["num_years"], 2)
+        self.assertEqual(sorted(metadata["year"] for metadata in db.db.get(include=["metadatas"])["metadatas"]), ["2022", "2023"])
+        self.assertEqual(sorted(document["metadata"]["year"] for document in db.lexical_index.documents.values()), ["2022", "2023"])
+        self.assertEqual(self.db_pool.stats()["entries"], 0)
+
+    def test_dry_run_removes_nothing(self):
+        result = self._prune(keep_years=1, dry_run=True)
+        self.assertEqual(len(result["evicted"]), 2)
+        self.assertGreater(result["freed"], 2 * 1024 * 1024)
+        self.assertTrue(os.path.exists(self._get_folder("0000320193-21-000105")))
+        self.assertEqual(len(self.catalog.get_all("AAPL")), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
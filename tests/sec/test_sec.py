@@ -1,7 +1,7 @@
 import unittest
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, AsyncMock
 import os
-from src.sec.sec import get_recent_folders, download_filings, SOURCE_SEC_DIRECTORY
+from src.sec.sec import get_recent_folders, download_filings, SOURCE_SEC_DIRECTORY, SEC_PRIMARY_ONLY
 
 class TestSEC(unittest.TestCase):
     def setUp(self):
@@ -77,24 +77,29 @@ class TestSEC(unittest.TestCase):
             '0000320193-22-000108'
         ])
 
-    @patch('sec.sec.dl')
-    def test_download_filings(self, mock_dl):
-        mock_dl.get.return_value = True
+    @patch('src.sec.sec.downloader')
+    def test_download_filings(self, mock_downloader):
+        mock_downloader.download_many = AsyncMock(return_value={self.symbol: ["0000320193-23-000106"]})
         download_filings(self.symbol, self.filing_type)
-        mock_dl.get.assert_called_once_with(
-            self.filing_type, 
-            self.symbol, 
-            download_details=True
+        mock_downloader.download_many.assert_awaited_once_with(
+            [self.symbol],
+            self.filing_type,
+            True,
+            None,
+            SEC_PRIMARY_ONLY
         )
 
-    @patch('sec.sec.dl')
-    def test_download_filings_error(self, mock_dl):
-        mock_dl.get.side_effect = Exception("Test error")
+    @patch('src.sec.sec.downloader')
+    def test_download_filings_error(self, mock_downloader):
+        # errors are reported, not raised
+        mock_downloader.download_many = AsyncMock(return_value={self.symbol: Exception("Test error")})
         download_filings(self.symbol, self.filing_type)
-        mock_dl.get.assert_called_once_with(
-            self.filing_type, 
-            self.symbol, 
-            download_details=True
+        mock_downloader.download_many.assert_awaited_once_with(
+            [self.symbol],
+            self.filing_type,
+            True,
+            None,
+            SEC_PRIMARY_ONLY
         )
 
     def tearDown(self):
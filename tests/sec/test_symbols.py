@@ -0,0 +1,71 @@
+import unittest
+import os
+import json
+import time
+import tempfile
+from unittest.mock import patch
+from fastapi import HTTPException
+from src.sec.symbols import SymbolMaster
+from src.utils.utils import validate_ticker
+
+TICKERS = {
+    "0": {"cik_str": 320193, "ticker": "AAPL", "title": "Apple Inc."},
+    "1": {"cik_str": 1067983, "ticker": "BRK-B", "title": "BERKSHIRE HATHAWAY INC"},
+}
+
+
+class TestSymbolMaster(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "company_tickers.json")
+        with open(self.path, 'w') as f:
+            json.dump(TICKERS, f)
+        # SEC is unreachable, refreshes fail and keep the symbols on disk
+        self.symbols = SymbolMaster(self.path, url="http://127.0.0.1:9/company_tickers.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_lookup_from_disk(self):
+        self.assertEqual(self.symbols.get_cik("AAPL"), 320193)
+        self.assertEqual(self.symbols.get_cik("brk.b"), 1067983)
+        self.assertEqual(self.symbols.lookup("AAPL")["title"], "Apple Inc.")
+        self.assertIsNone(self.symbols.get_cik("ZZZZ"))
+
+    def test_failed_refresh_keeps_symbols(self):
+        self.assertTrue(self.symbols.load())
+        self.assertFalse(self.symbols.refresh())
+        self.assertEqual(self.symbols.get_cik("AAPL"), 320193)
+
+    def test_not_available_without_symbols(self):
+        symbols = SymbolMaster(os.path.join(self.tmp_dir.name, "missing.json"), url="http://127.0.0.1:9/company_tickers.json")
+        self.assertFalse(symbols.is_available())
+        self.assertIsNone(symbols.get_cik("AAPL"))
+
+    def test_no_background_refresh_in_tests(self):
+        symbols = SymbolMaster(os.path.join(self.tmp_dir.name, "missing.json"), url="http://127.0.0.1:9/company_tickers.json")
+        with patch.dict(os.environ, {"TESTING": "1"}), patch.object(symbols, '_refresh_in_background') as refresh:
+            self.assertFalse(symbols.is_available())
+        refresh.assert_not_called()
+
+    def test_load_without_download(self):
+        symbols = SymbolMaster(os.path.join(self.tmp_dir.name, "missing.json"), url="http://127.0.0.1:9/company_tickers.json")
+        with patch.object(symbols, 'refresh') as refresh:
+            self.assertFalse(symbols.load(download=False))
+        refresh.assert_not_called()
+        self.assertTrue(self.symbols.load(download=False))
+
+    def test_validate_ticker_checks_sec(self):
+        with patch('src.utils.utils.symbol_master', self.symbols):
+            validate_ticker("AAPL", check_sec=True)
+            validate_ticker("ZZZZ")
+            start = time.perf_counter()
+            with self.assertRaises(HTTPException) as context:
+                validate_ticker("AAPL,ZZZZ", check_sec=True)
+            self.assertLess(time.perf_counter() - start, 0.01)
+        self.assertEqual(context.exception.status_code, 404)
+        self.assertIn("ZZZZ", context.exception.detail)
+
+
+if __name__ == '__main__':
+    unittest.main()
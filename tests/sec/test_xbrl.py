@@ -0,0 +1,84 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from src.sec.xbrl import extract_facts, save_facts, load_facts, get_facts_path, get_statement
+
+SAMPLE_IXBRL = """<html><body>
+<div style="display:none"><ix:header><ix:resources>
+<xbrli:context id="FY2023"><xbrli:entity><xbrli:identifier scheme="http://www.sec.gov/CIK">0000320193</xbrli:identifier></xbrli:entity>
+<xbrli:period><xbrli:startDate>2022-09-25</xbrli:startDate><xbrli:endDate>2023-09-30</xbrli:endDate></xbrli:period></xbrli:context>
+<xbrli:context id="FY2022"><xbrli:entity><xbrli:identifier scheme="http://www.sec.gov/CIK">0000320193</xbrli:identifier></xbrli:entity>
+<xbrli:period><xbrli:startDate>2021-09-26</xbrli:startDate><xbrli:endDate>2022-09-24</xbrli:endDate></xbrli:period></xbrli:context>
+<xbrli:context id="I2023"><xbrli:entity><xbrli:identifier scheme="http://www.sec.gov/CIK">0000320193</xbrli:identifier></xbrli:entity>
+<xbrli:period><xbrli:instant>2023-09-30</xbrli:instant></xbrli:period></xbrli:context>
+<xbrli:context id="FY2023_iphone"><xbrli:entity><xbrli:identifier scheme="http://www.sec.gov/CIK">0000320193</xbrli:identifier>
+<xbrli:segment><xbrldi:explicitMember dimension="srt:ProductOrServiceAxis">us-gaap:IPhoneMember</xbrldi:explicitMember></xbrli:segment></xbrli:entity>
+<xbrli:period><xbrli:startDate>2022-09-25</xbrli:startDate><xbrli:endDate>2023-09-30</xbrli:endDate></xbrli:period></xbrli:context>
+<xbrli:unit id="usd"><xbrli:measure>iso4217:USD</xbrli:measure></xbrli:unit>
+</ix:resources></ix:header></div>
+<table>
+<tr><td>Net sales</td><td><ix:nonFraction name="us-gaap:RevenueFromContractWithCustomerExcludingAssessedTax" contextRef="FY2023" unitRef="usd" scale="6" decimals="-6" format="ixt:num-dot-decimal">383,285</ix:nonFraction></td>
+<td><ix:nonFraction name="us-gaap:RevenueFromContractWithCustomerExcludingAssessedTax" contextRef="FY2022" unitRef="usd" scale="6" decimals="-6" format="ixt:num-dot-decimal">394,328</ix:nonFraction></td></tr>
+<tr><td>iPhone</td><td><ix:nonFraction name="us-gaap:RevenueFromContractWithCustomerExcludingAssessedTax" contextRef="FY2023_iphone" unitRef="usd" scale="6" format="ixt:num-dot-decimal">200,583</ix:nonFraction></td></tr>
+<tr><td>Other income</td><td><ix:nonFraction name="us-gaap:NonoperatingIncomeExpense" contextRef="FY2023" unitRef="usd" scale="6" sign="-" format="ixt:num-dot-decimal">565</ix:nonFraction></td></tr>
+<tr><td>Total assets</td><td><ix:nonFraction name="us-gaap:Assets" contextRef="I2023" unitRef="usd" scale="6" format="ixt:num-dot-decimal"><span>352,583</span></ix:nonFraction></td></tr>
+<tr><td>Goodwill</td><td><ix:nonFraction name="us-gaap:Goodwill" contextRef="I2023" unitRef="usd" scale="6" format="ixt:fixed-zero">—</ix:nonFraction></td></tr>
+</table>
+</body></html>
+"""
+
+
+class TestXBRL(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.doc_path = os.path.join(self.tmp_dir.name, "primary-document.html")
+        with open(self.doc_path, "w", encoding="utf-8") as f:
+            f.write(SAMPLE_IXBRL)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_extract_facts(self):
+        facts = extract_facts(self.doc_path)
+        self.assertEqual(len(facts["value"]), 6)
+
+        revenue = facts["concept"] == "us-gaap:RevenueFromContractWithCustomerExcludingAssessedTax"
+        self.assertEqual(sorted(facts["value"][revenue]), [200583e6, 383285e6, 394328e6])
+        self.assertEqual(facts["dimensional"][revenue].sum(), 1)
+
+        other = facts["concept"] == "us-gaap:NonoperatingIncomeExpense"
+        self.assertEqual(facts["value"][other][0], -565e6)
+
+        assets = facts["concept"] == "us-gaap:Assets"
+        self.assertTrue(np.isnat(facts["period_start"][assets][0]))
+        self.assertEqual(str(facts["period_end"][assets][0]), "2023-09-30")
+        self.assertEqual(facts["unit"][assets][0], "iso4217:USD")
+
+    def test_save_and_load_facts(self):
+        facts = extract_facts(self.doc_path)
+        path = get_facts_path("AAPL", "0000320193-23-000106", directory=self.tmp_dir.name)
+        save_facts(facts, path)
+        loaded = load_facts(path)
+        for field, values in facts.items():
+            np.testing.assert_array_equal(loaded[field], values)
+
+    def test_get_statement(self):
+        path = get_facts_path("AAPL", "0000320193-23-000106", directory=self.tmp_dir.name)
+        save_facts(extract_facts(self.doc_path), path)
+
+        income = get_statement("AAPL", "income", build=False, directory=self.tmp_dir.name)
+        self.assertEqual(list(income.keys()), ["2023-09-30", "2022-09-24"])
+        self.assertEqual(income["2023-09-30"], {"Total Revenue": 383285000000})
+
+        balance = get_statement("AAPL", "balance", build=False, directory=self.tmp_dir.name)
+        self.assertEqual(balance, {"2023-09-30": {"Total Assets": 352583000000, "Goodwill": 0}})
+
+        self.assertEqual(get_statement("AAPL", "income", quarterly=True, build=False, directory=self.tmp_dir.name), {})
+        self.assertEqual(get_statement("MSFT", "income", build=False, directory=self.tmp_dir.name), {})
+        with self.assertRaises(ValueError):
+            get_statement("AAPL", "invalid", build=False, directory=self.tmp_dir.name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,7 @@
 import pytest
+from unittest.mock import patch
 from fastapi.testclient import TestClient
+from src.jobs.queue import JobQueue
 
 def test_execute_query_unauthorized(client):
     response = client.get("/api/v1/queries/execute/", params={
@@ -81,4 +83,48 @@ def test_execute_query_invalid_token(client):
         headers={"Authorization": "Bearer invalid_token"}
     )
     assert response.status_code == 401
-    assert "Could not validate credentials" in response.json()["detail"]
\ No newline at end of file
+    assert "Could not validate credentials" in response.json()["detail"]
+
+
+def test_websocket_streaming(client, test_user_token, mock_query_engine):
+    with client.websocket_connect(
+        f"/api/v1/queries/ws/execute/?token={test_user_token}"
+    ) as websocket:
+        websocket.send_json({
+            "symbol": "AAPL",
+            "key": "risk_factors"
+        })
+        statuses = []
+        while True:
+            data = websocket.receive_json()
+            statuses.append(data["status"])
+            if data["status"] in ["complete", "error"]:
+                break
+        assert statuses == ["processing", "context", "token", "complete"]
+        assert data["data"]["result"] == {"sample": "query result"}
+
+def test_execute_query_pending_ingestion(authorized_client, mock_query_engine, tmp_path):
+    mock_query_engine.is_ready.return_value = False
+    with patch('src.api.routers.queries.job_queue', JobQueue(str(tmp_path / "jobs.db"))):
+        response = authorized_client.get(
+            "/api/v1/queries/execute/",
+            params={"symbol": "AAPL", "key": "risk_factors"}
+        )
+        assert response.status_code == 202
+        job = response.json()["job"]
+        assert job["symbol"] == "AAPL"
+        mock_query_engine.is_ready.assert_called_with("AAPL", "10-K", 3)
+        mock_query_engine.acreate.assert_not_called()
+
+        # the same symbol is ingested once
+        response = authorized_client.get(
+            "/api/v1/queries/available/",
+            params={"symbol": "AAPL"}
+        )
+        assert response.status_code == 202
+        assert response.json()["job"]["id"] == job["id"]
+
+        response = authorized_client.get(f"/api/v1/queries/jobs/{job['id']}")
+        assert response.status_code == 200
+        assert response.json()["progress"]["download"]["status"] == "pending"
+        assert authorized_client.get("/api/v1/queries/jobs/missing").status_code == 404
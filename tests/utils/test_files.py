@@ -0,0 +1,44 @@
+import unittest
+import os
+import json
+import gzip
+import tempfile
+from src.utils.files import atomic_write
+
+
+class TestAtomicWrite(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "nested", "data.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_write_replaces_the_file(self):
+        for value in (1, 2):
+            with atomic_write(self.path) as f:
+                json.dump({"value": value}, f)
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {"value": 2})
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["data.json"])
+
+    def test_failed_write_keeps_the_file(self):
+        with atomic_write(self.path) as f:
+            json.dump({"value": 1}, f)
+        with self.assertRaises(ValueError):
+            with atomic_write(self.path) as f:
+                f.write("partial")
+                raise ValueError("interrupted")
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {"value": 1})
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["data.json"])
+
+    def test_opener(self):
+        with atomic_write(self.path, 'wt', opener=gzip.open) as f:
+            f.write("compressed")
+        with gzip.open(self.path, 'rt') as f:
+            self.assertEqual(f.read(), "compressed")
+
+
+if __name__ == '__main__':
+    unittest.main()